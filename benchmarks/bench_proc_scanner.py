@@ -0,0 +1,155 @@
+"""
+Benchmark: Linux /proc backend vs psutil path của PortDetector
+
+Dựng một cây /proc giả (synthetic) với nhiều processes, rồi so sánh:
+- _detect_from_process_name: psutil.process_iter vs ProcScanner
+- _scan_port_range listening ports: psutil.net_connections vs /proc/net/tcp{,6}
+
+psutil được trỏ vào cùng cây giả qua psutil.PROCFS_PATH nên hai path đọc cùng dữ liệu.
+
+Usage:
+    python benchmarks/bench_proc_scanner.py [--processes 3000] [--fds 20] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil  # noqa: E402
+from src.port_detector import PortDetector  # noqa: E402
+from src.proc_scanner import ProcScanner  # noqa: E402
+
+TCP_HEADER = "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+
+
+def _stat_line(pid: int, comm: str) -> str:
+    """Dòng /proc/<pid>/stat đủ 52 fields cho psutil"""
+    fields = ["S", "1", str(pid), str(pid), "0", "-1", "4194304"] + ["0"] * 12 + [str(1000 + pid)] + ["0"] * 32
+    return f"{pid} ({comm[:15]}) " + " ".join(fields) + "\n"
+
+
+def build_proc_tree(root: str, processes: int, fds_per_process: int) -> int:
+    """
+    Tạo synthetic /proc tại root
+    
+    Returns:
+        PID của fake language_server (PID lớn nhất - worst case cho linear scan)
+    """
+    os.makedirs(os.path.join(root, "net"))
+    with open(os.path.join(root, "stat"), "w") as f:
+        f.write("cpu  0 0 0 0 0 0 0 0 0 0\nbtime 1700000000\n")
+    
+    tcp_lines = [TCP_HEADER]
+    inode = 100000
+    target_pid = processes + 1000
+    
+    for i in range(processes + 1):
+        pid = 1000 + i
+        is_target = pid == target_pid
+        comm = "language_server_linux_x64" if is_target else f"worker-{i % 50}"
+        argv = [comm, "--type=renderer", f"--field-trial-handle={i}", "--lang=en-US"] * 8
+        if is_target:
+            argv = [
+                "/opt/antigravity/language_server_linux_x64",
+                "--extension_server_port", "55556",
+                "--api_server_csrf_token", "0123456789abcdef0123456789abcdef",
+                "--api_server_port", "55555",
+            ]
+        
+        proc_dir = os.path.join(root, str(pid))
+        fd_dir = os.path.join(proc_dir, "fd")
+        os.makedirs(fd_dir)
+        with open(os.path.join(proc_dir, "comm"), "w") as f:
+            f.write(comm[:15] + "\n")
+        with open(os.path.join(proc_dir, "cmdline"), "w") as f:
+            f.write("\0".join(argv) + "\0")
+        with open(os.path.join(proc_dir, "stat"), "w") as f:
+            f.write(_stat_line(pid, comm))
+        
+        for fd in range(fds_per_process):
+            if fd % 4 == 0:
+                inode += 1
+                os.symlink(f"socket:[{inode}]", os.path.join(fd_dir, str(fd)))
+                port = 55555 if is_target and fd == 0 else 30000 + inode % 30000
+                state = "0A" if fd % 8 == 0 else "01"
+                tcp_lines.append(
+                    f"   {len(tcp_lines)}: 0100007F:{port:04X} 00000000:0000 {state} "
+                    f"00000000:00000000 00:00000000 00000000  1000        0 {inode} 1\n"
+                )
+            else:
+                os.symlink("/dev/null", os.path.join(fd_dir, str(fd)))
+    
+    with open(os.path.join(root, "net", "tcp"), "w") as f:
+        f.writelines(tcp_lines)
+    for table in ("tcp6", "udp", "udp6"):
+        with open(os.path.join(root, "net", table), "w") as f:
+            f.write(TCP_HEADER)
+    
+    return target_pid
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ProcScanner vs psutil")
+    parser.add_argument("--processes", type=int, default=3000)
+    parser.add_argument("--fds", type=int, default=20, help="Số fds mỗi process")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    
+    if not sys.platform.startswith("linux"):
+        print("Benchmark này chỉ chạy trên Linux")
+        return 1
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "proc")
+        target_pid = build_proc_tree(root, args.processes, args.fds)
+        psutil.PROCFS_PATH = root
+        
+        psutil_detector = PortDetector(use_cache=False)
+        psutil_detector.proc_scanner = None
+        proc_detector = PortDetector(use_cache=False)
+        proc_detector.proc_scanner = ProcScanner(root)
+        
+        # Sanity check: hai path phải ra cùng kết quả
+        for detector in (psutil_detector, proc_detector):
+            servers = detector._detect_from_process_name()
+            assert servers and servers[0].pid == target_pid and servers[0].port == 55555, "detect mismatch"
+        
+        def psutil_listening():
+            return {
+                c.laddr.port for c in psutil.net_connections(kind="inet")
+                if c.status == "LISTEN" and c.laddr
+            }
+        
+        assert psutil_listening() == set(proc_detector.proc_scanner.listening_ports()), "ports mismatch"
+        
+        rows = [
+            ("detect (process scan)",
+             _best_of(psutil_detector._detect_from_process_name, args.repeat),
+             _best_of(proc_detector._detect_from_process_name, args.repeat)),
+            ("listening ports",
+             _best_of(psutil_listening, args.repeat),
+             _best_of(proc_detector.proc_scanner.listening_ports, args.repeat)),
+        ]
+    
+    print(f"Synthetic /proc: {args.processes} processes, {args.fds} fds/process, best of {args.repeat}")
+    print(f"{'Stage':<24} {'psutil':>10} {'procfs':>10} {'speedup':>8}")
+    for name, slow, fast in rows:
+        print(f"{name:<24} {slow * 1000:>8.1f}ms {fast * 1000:>8.1f}ms {slow / fast:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Benchmark: streaming selective parser vs response.json() cho GetUserStatus
+
+So sánh peak memory (tracemalloc) và thời gian parse giữa:
+- json: gom toàn bộ body (như response.content) + json.loads + _parse_response
+- stream: extract_model_configs trên từng chunk + _build_quota_data
+
+Payloads synthetic có cấu trúc giống GetUserStatus thật (user profile, các configs
+khác, clientModelConfigs nằm sau cùng). Có thể truyền response đã ghi lại bằng --payload.
+
+Usage:
+    python benchmarks/bench_stream_parser.py [--payload FILE ...] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api_client import APIClient  # noqa: E402
+from src.stream_parser import extract_model_configs  # noqa: E402
+from src.utils import STREAM_CHUNK_SIZE  # noqa: E402
+
+# name: (số models, số entries rác mỗi subtree)
+SYNTHETIC_SIZES = {
+    "small": (8, 20),
+    "medium": (30, 2000),
+    "huge": (60, 60000),
+}
+
+
+def build_payload(models: int, filler: int) -> bytes:
+    """GetUserStatus body với các subtrees không dùng tới có kích thước filler"""
+    def junk(prefix):
+        return [
+            {"id": f"{prefix}-{i}", "enabled": i % 2 == 0, "weight": i / 7,
+             "description": f"{prefix} entry {i} with \"quoted\" text and \\ backslash"}
+            for i in range(filler)
+        ]
+    
+    configs = [
+        {
+            "label": f"Model {i} (High)",
+            "modelOrAlias": {"model": f"MODEL_PLACEHOLDER_M{i}"},
+            "supportedMimeTypes": {f"type/{j}": True for j in range(filler // 100 + 1)},
+            "quotaInfo": {"remainingFraction": (i % 10) / 10, "resetTime": "2030-01-01T00:00:00Z"},
+            "tagTitle": "New",
+        }
+        for i in range(models)
+    ]
+    body = {
+        "userStatus": {
+            "name": "Bench User",
+            "email": "bench@example.com",
+            "userTier": {"id": "g1-pro-tier", "features": junk("feature")},
+            "planStatus": {"availablePromptCredits": 500, "history": junk("plan")},
+            "cascadeModelConfigData": {
+                "defaultOverrideModelConfig": {"overrides": junk("override")},
+                "clientModelConfigs": configs,
+                "clientModelSorts": junk("sort"),
+            },
+            "experiments": junk("experiment"),
+        }
+    }
+    return json.dumps(body).encode()
+
+
+def _chunks(payload: bytes):
+    """Giả lập response.iter_content(STREAM_CHUNK_SIZE)"""
+    view = memoryview(payload)
+    for i in range(0, len(payload), STREAM_CHUNK_SIZE):
+        yield bytes(view[i:i + STREAM_CHUNK_SIZE])
+
+
+def parse_json(client: APIClient, payload: bytes):
+    body = b"".join(_chunks(payload))
+    return client._parse_response(json.loads(body))
+
+
+def parse_stream(client: APIClient, payload: bytes):
+    return client._build_quota_data(extract_model_configs(_chunks(payload)))
+
+
+def _measure(func, client, payload: bytes, repeat: int):
+    """(best time, peak bytes)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(client, payload)
+        best = min(best, time.perf_counter() - start)
+    
+    tracemalloc.start()
+    func(client, payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming parser vs response.json()")
+    parser.add_argument("--payload", nargs="*", default=[], help="Recorded GetUserStatus response bodies")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    
+    client = APIClient(port=0)
+    payloads = [(name, build_payload(*size)) for name, size in SYNTHETIC_SIZES.items()]
+    for path in args.payload:
+        with open(path, "rb") as f:
+            payloads.append((os.path.basename(path), f.read()))
+    
+    print(f"Chunk size {STREAM_CHUNK_SIZE // 1024}KB, best of {args.repeat}")
+    print(f"{'Payload':<12} {'size':>9} {'json time':>10} {'stream time':>12} "
+          f"{'json peak':>10} {'stream peak':>12}")
+    for name, payload in payloads:
+        # Sanity check: hai path phải ra cùng models
+        expected = parse_json(client, payload)
+        actual = parse_stream(client, payload)
+        assert (expected is None) == (actual is None), f"{name}: result mismatch"
+        if expected:
+            assert [(m.model_name, m.used) for m in expected.models] == \
+                   [(m.model_name, m.used) for m in actual.models], f"{name}: models mismatch"
+        
+        json_time, json_peak = _measure(parse_json, client, payload, args.repeat)
+        stream_time, stream_peak = _measure(parse_stream, client, payload, args.repeat)
+        print(f"{name:<12} {len(payload) / 1024:>7.0f}KB {json_time * 1000:>8.1f}ms {stream_time * 1000:>10.1f}ms "
+              f"{json_peak / 1024:>8.0f}KB {stream_peak / 1024:>10.0f}KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Check daemon persistence: snapshot do daemon fetch phải vào history + cache.bin
+
+Chạy QuotaDaemon (QuotaService thật, ServerWatcher trỏ vào benchmarks/standin_server.py)
+trên socket tạm, query như thin client với max_age=0 để ép mỗi lần là một refresh,
+rồi kiểm tra history.db có thêm rows và cache.bin (offline fallback của thin
+client sau khi daemon dừng) giữ đúng snapshot vừa serve cho mỗi refresh. HOME được đổi sang thư mục
+tạm trước khi import src, nên ~/.agusage thật không bị đụng tới.
+
+Exit code 1 nếu có refresh không được lưu. Chỉ chạy trên POSIX (Unix socket).
+
+Usage:
+    python benchmarks/check_daemon_history.py [--refreshes 3]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+
+def _history_rows(store) -> int:
+    return sum(len(batch) for batch in store.iter_rows(0))
+
+
+def check(refreshes: int = 3) -> bool:
+    """Chạy daemon trên stand-in, trả về True nếu mọi refresh đều được lưu"""
+    from src.cache_manager import CacheManager
+    from src.daemon import QuotaDaemon, is_supported, query_daemon
+    from src.history_store import HistoryStore
+    from src.port_detector import PortDetector, ServerInfo
+    from src.service import QuotaService, ServerWatcher
+    from src.utils import DAEMON_SOCKET_FILE
+    from standin_server import StandinServer
+    
+    if not is_supported():
+        print("⏭️  Unix sockets không có trên platform này, bỏ qua")
+        return True
+    
+    standin = StandinServer(csrf_token="check").start()
+    service = QuotaService()
+    service.watcher = ServerWatcher(
+        detector=PortDetector(use_cache=False),
+        servers=[ServerInfo(port=standin.port, csrf_token="check", http_port=standin.http_port)],
+    )
+    daemon = QuotaDaemon(service)
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    history = HistoryStore()
+    cache_mgr = CacheManager(keep_history=False)
+    
+    ok = True
+    try:
+        while not os.path.exists(DAEMON_SOCKET_FILE):
+            time.sleep(0.01)
+        
+        for i in range(refreshes):
+            before = _history_rows(history)
+            quota_data = query_daemon(max_age=0)
+            added = _history_rows(history) - before
+            cached = cache_mgr.load()
+            if quota_data is None:
+                print(f"❌ refresh {i + 1}: daemon không trả về data")
+                ok = False
+            elif added != len(quota_data.models):
+                print(f"❌ refresh {i + 1}: history thêm {added} rows, cần {len(quota_data.models)}")
+                ok = False
+            elif cached is None or abs(cached.timestamp - quota_data.timestamp) > 0.01:
+                print(f"❌ refresh {i + 1}: cache.bin không có snapshot vừa serve")
+                ok = False
+            else:
+                print(f"✅ refresh {i + 1}: history +{added} rows, cache.bin cập nhật")
+    finally:
+        daemon.server.shutdown()
+        thread.join()
+        history.close()
+        standin.stop()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--refreshes", type=int, default=3)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as home:
+        os.environ["HOME"] = os.environ["USERPROFILE"] = home
+        ok = check(args.refreshes)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
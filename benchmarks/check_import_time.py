@@ -0,0 +1,99 @@
+"""
+Import-time budget check cho CLI entry point
+
+Chạy `python -X importtime -c "import src.cli"` trong một process mới (cold start),
+đo cumulative import time của src.cli và kiểm tra các dependencies nặng
+(requests/urllib3/ssl, psutil, colorama, sqlite3) không bị import lúc load module.
+
+Exit code 1 nếu vượt budget hoặc có heavy module bị import - dùng làm regression gate.
+run_benchmarks.py gọi check() sau các stages nên budget được enforce cùng suite.
+
+Usage:
+    python benchmarks/check_import_time.py [--budget-ms 40] [--runs 5]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MODULE = "src.cli"
+DEFAULT_BUDGET_MS = 40.0
+
+# Những modules chỉ được import trên code path cần đến chúng
+HEAVY_MODULES = ("requests", "urllib3", "ssl", "psutil", "colorama", "sqlite3")
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(\s*)(\S+)")
+
+
+def measure_import(module: str):
+    """
+    Import module trong process mới với -X importtime
+    
+    Returns:
+        (cumulative_us của module, set các top-level modules đã import)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    cumulative_us = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        imported.add(name.split(".")[0])
+        if name == module:
+            cumulative_us = int(match.group(2))
+    return cumulative_us, imported
+
+
+def check(module: str = DEFAULT_MODULE, budget_ms: float = DEFAULT_BUDGET_MS, runs: int = 5) -> bool:
+    """
+    Đo median import time của module qua N cold starts và in kết quả
+    
+    Returns:
+        True nếu trong budget và không có heavy module bị import
+    """
+    timings = []
+    heavy = set()
+    for _ in range(runs):
+        cumulative_us, imported = measure_import(module)
+        if cumulative_us is None:
+            print(f"❌ Không đo được import time của {module}")
+            return False
+        timings.append(cumulative_us / 1000)
+        heavy |= imported.intersection(HEAVY_MODULES)
+    
+    median_ms = sorted(timings)[len(timings) // 2]
+    print(f"{module}: median {median_ms:.1f}ms over {runs} runs (budget {budget_ms:.0f}ms)")
+    
+    failed = False
+    if median_ms > budget_ms:
+        print(f"❌ Import time vượt budget: {median_ms:.1f}ms > {budget_ms:.0f}ms")
+        failed = True
+    if heavy:
+        print(f"❌ Heavy modules bị import lúc load: {', '.join(sorted(heavy))}")
+        failed = True
+    
+    if not failed:
+        print("✅ OK")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check CLI cold-start import budget")
+    parser.add_argument("--module", default=DEFAULT_MODULE)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5, help="Lấy median của N runs")
+    args = parser.parse_args()
+    return 0 if check(args.module, args.budget_ms, args.runs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
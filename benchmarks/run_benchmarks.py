@@ -0,0 +1,313 @@
+"""
+Benchmark suite: đo từng stage của agcheck riêng biệt, lưu/so sánh JSON baselines
+
+Stages:
+- detect:            PortDetector.detect() trên một /proc giả (Linux)
+- fetch:             APIClient.fetch_quota() tới benchmarks/standin_server.py (HTTPS, 1MB payload)
+- fetch_async:       AsyncAPIClient.fetch_quota() tới cùng stand-in (keep-alive pool)
+- parse_json_*:      _parse_response(json.loads(body)) với payload small/medium/huge
+- parse_stream_*:    streaming parser trên cùng payloads
+- cache_save/load/age: CacheManager trên file tạm
+- calculate_totals:  QuotaData._calculate_totals với nhiều models
+- render:            QuotaFormatter.format_and_print vào null sink
+- import_time:       cold-start import budget của src.cli (check_import_time.check)
+
+Mỗi stage được calibrate như timeit.autorange (mỗi round >= --min-time), kết quả
+là thời gian / call của --rounds rounds. --save ghi JSON baseline, --compare so với
+baseline trước đó và exit 1 nếu median của stage nào chậm hơn --threshold.
+Import time được check với budget tuyệt đối (--import-budget-ms), exit 1 nếu vượt.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--filter parse] [--save baselines/main.json]
+    python benchmarks/run_benchmarks.py --compare baselines/main.json [--threshold 0.2]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+import check_import_time  # noqa: E402
+from bench_stream_parser import SYNTHETIC_SIZES, build_payload, parse_json, parse_stream  # noqa: E402
+from src.api_client import APIClient, QuotaData, QuotaModel  # noqa: E402
+from src.cache_manager import CacheManager  # noqa: E402
+from src.formatter import QuotaFormatter  # noqa: E402
+
+STAGES = {}
+
+
+def stage(name):
+    """
+    Đăng ký một stage
+    
+    Function nhận tmp dir và trả về (callable cần đo, cleanup hoặc None),
+    hoặc None nếu stage không chạy được trên platform này.
+    """
+    def register(setup):
+        STAGES[name] = setup
+        return setup
+    return register
+
+
+@stage("detect")
+def _setup_detect(tmp):
+    if not sys.platform.startswith("linux"):
+        return None
+    from bench_proc_scanner import build_proc_tree
+    from src.port_detector import PortDetector
+    from src.proc_scanner import ProcScanner
+    
+    root = os.path.join(tmp, "proc")
+    build_proc_tree(root, processes=1000, fds_per_process=8)
+    detector = PortDetector(use_cache=False)
+    detector.proc_scanner = ProcScanner(root)
+    assert detector.detect(), "detect failed on fake process table"
+    return detector.detect, None
+
+
+@stage("fetch")
+def _setup_fetch(tmp):
+    from standin_server import StandinServer
+    
+    standin = StandinServer(csrf_token="bench", payload_size=1024 * 1024).start()
+    client = APIClient(port=standin.port, csrf_token="bench", http_port=standin.http_port)
+    assert client.fetch_quota(), "fetch failed against stand-in"
+    
+    def cleanup():
+        client.close()
+        standin.stop()
+    
+    return client.fetch_quota, cleanup
+
+
+@stage("fetch_async")
+def _setup_fetch_async(tmp):
+    import asyncio
+    from src.async_client import AsyncAPIClient
+    from standin_server import StandinServer
+    
+    standin = StandinServer(csrf_token="bench", payload_size=1024 * 1024).start()
+    client = AsyncAPIClient(port=standin.port, csrf_token="bench", http_port=standin.http_port)
+    loop = asyncio.new_event_loop()
+    
+    def fetch():
+        return loop.run_until_complete(client.fetch_quota())
+    
+    assert fetch(), "async fetch failed against stand-in"
+    
+    def cleanup():
+        loop.run_until_complete(client.aclose())
+        loop.close()
+        standin.stop()
+    
+    return fetch, cleanup
+
+
+def _register_parse_stages():
+    for size in SYNTHETIC_SIZES:
+        def setup_json(tmp, size=size):
+            payload, client = build_payload(*SYNTHETIC_SIZES[size]), APIClient(port=0)
+            return (lambda: parse_json(client, payload)), None
+        
+        def setup_stream(tmp, size=size):
+            payload, client = build_payload(*SYNTHETIC_SIZES[size]), APIClient(port=0)
+            return (lambda: parse_stream(client, payload)), None
+        
+        stage(f"parse_json_{size}")(setup_json)
+        stage(f"parse_stream_{size}")(setup_stream)
+
+
+_register_parse_stages()
+
+
+def _sample_quota_data(models: int = 20) -> QuotaData:
+    """QuotaData với pools cỡ 1-4 models"""
+    return QuotaData(
+        models=[
+            QuotaModel(f"Model {i}", i % 100, 100, 100 - i % 100, 3600 + (i // 4) * 60)
+            for i in range(models)
+        ],
+        timestamp=time.time()
+    )
+
+
+@stage("cache_save")
+def _setup_cache_save(tmp):
+    cache_mgr = CacheManager(keep_history=False, cache_file=os.path.join(tmp, "cache.bin"))
+    quota_data = _sample_quota_data()
+    return (lambda: cache_mgr.save(quota_data)), None
+
+
+@stage("cache_load")
+def _setup_cache_load(tmp):
+    cache_mgr = CacheManager(keep_history=False, cache_file=os.path.join(tmp, "cache.bin"))
+    cache_mgr.save(_sample_quota_data())
+    assert cache_mgr.load(), "cache load failed"
+    return cache_mgr.load, None
+
+
+@stage("cache_age")
+def _setup_cache_age(tmp):
+    cache_mgr = CacheManager(keep_history=False, cache_file=os.path.join(tmp, "cache.bin"))
+    cache_mgr.save(_sample_quota_data())
+    return cache_mgr.get_cache_age, None
+
+
+@stage("calculate_totals")
+def _setup_calculate_totals(tmp):
+    models = _sample_quota_data(models=5000).models
+    return (lambda: QuotaData(models=models, timestamp=0)), None
+
+
+@stage("render")
+def _setup_render(tmp):
+    formatter = QuotaFormatter()
+    quota_data = _sample_quota_data()
+    sink = open(os.devnull, "w", encoding="utf-8")
+    
+    def render():
+        with contextlib.redirect_stdout(sink):
+            formatter.format_and_print(quota_data)
+    
+    return render, sink.close
+
+
+def measure(func, rounds: int, min_time: float) -> dict:
+    """Calibrate số calls mỗi round rồi đo rounds rounds (giây / call)"""
+    func()  # warmup
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": rounds,
+        "number": number,
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """In bảng so sánh median, trả về False nếu có stage chậm hơn threshold"""
+    ok = True
+    print()
+    print(f"{'Stage':<22} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"{name:<22} {'-':>10} {_format_time(result['median']):>10} {'new':>8}")
+            continue
+        change = result["median"] / base["median"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"{name:<22} {_format_time(base['median']):>10} {_format_time(result['median']):>10} "
+              f"{change:>+7.1%}{flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="agcheck benchmark suite")
+    parser.add_argument("--filter", default="", help="Chỉ chạy stages có tên chứa chuỗi này")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.1, help="Thời gian tối thiểu mỗi round (giây)")
+    parser.add_argument("--save", metavar="FILE", help="Ghi kết quả thành JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="So sánh với JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Median chậm hơn bao nhiêu thì fail (0.2 = 20%%)")
+    parser.add_argument("--import-budget-ms", type=float, default=check_import_time.DEFAULT_BUDGET_MS,
+                        help="Budget cold-start import của src.cli")
+    args = parser.parse_args()
+    
+    results = {}
+    print(f"{'Stage':<22} {'median':>10} {'min':>10} {'stdev':>10}  calls/round")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, setup in STAGES.items():
+            if args.filter not in name:
+                continue
+            prepared = setup(tmp)
+            if prepared is None:
+                print(f"{name:<22} {'skipped':>10}")
+                continue
+            func, cleanup = prepared
+            try:
+                result = results[name] = measure(func, args.rounds, args.min_time)
+            finally:
+                if cleanup:
+                    cleanup()
+            print(f"{name:<22} {_format_time(result['median']):>10} {_format_time(result['min']):>10} "
+                  f"{_format_time(result['stdev']):>10}  {result['number']}")
+    
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+    
+    failed = False
+    if args.filter in "import_time":
+        print()
+        failed = not check_import_time.check(budget_ms=args.import_budget_ms)
+    
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.threshold):
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""
+Stand-in Server - Giả lập LanguageServerService/GetUserStatus để test local
+
+Nói Connect protocol (JSON) giống language_server của Antigravity:
+- HTTPS với self-signed cert tạo mới mỗi lần start (openssl CLI, thư mục tạm
+  bị xóa ngay sau khi load) + HTTP fallback port
+- Kiểm tra header X-Codeium-Csrf-Token
+- Cấu hình được latency, error rate, kích thước payload và số models
+
+Dùng cho load/fault testing APIClient và PortDetector._test_api_port mà không cần IDE.
+Chỉ là test/benchmark helper, không nằm trong package src.
+
+Usage:
+    python benchmarks/standin_server.py [--port 0] [--http-port 0] [--csrf-token TOKEN]
+                                 [--latency 0.05] [--error-rate 0.1] [--payload-size 1000000] [--models 7]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+GET_USER_STATUS_PATH = "/exa.language_server_pb.LanguageServerService/GetUserStatus"
+
+# Labels theo models thật của Antigravity (lặp lại kèm số thứ tự nếu cần nhiều hơn)
+_MODEL_LABELS = [
+    "Gemini 3 Pro (High)", "Gemini 3 Pro (Low)", "Gemini 3 Flash",
+    "Claude Sonnet 4.5", "Claude Sonnet 4.5 (Thinking)", "Claude Opus 4.5 (Thinking)",
+    "GPT-OSS 120B (Medium)",
+]
+
+# Connect error code -> HTTP status
+_CONNECT_STATUS = {
+    "unauthenticated": 401,
+    "permission_denied": 403,
+    "not_found": 404,
+    "unavailable": 503,
+}
+
+
+def build_user_status(models: int = len(_MODEL_LABELS), payload_size: int = 0,
+                      now: Optional[datetime] = None) -> bytes:
+    """
+    Tạo GetUserStatus response body
+    
+    Models được chia thành pools 2-3 models dùng chung resetTime như server thật.
+    
+    Args:
+        models: Số clientModelConfigs
+        payload_size: Kích thước body tối thiểu (bytes), phần thêm là user data không liên quan
+        now: Thời điểm tính resetTime (default: now UTC)
+    """
+    now = now or datetime.now(timezone.utc)
+    configs = []
+    for i in range(models):
+        label = _MODEL_LABELS[i % len(_MODEL_LABELS)]
+        if i >= len(_MODEL_LABELS):
+            label = f"{label} #{i // len(_MODEL_LABELS)}"
+        pool = i // 3
+        reset = now + timedelta(hours=1 + pool % 5, minutes=7 * pool % 60)
+        configs.append({
+            "label": label,
+            "modelOrAlias": {"model": f"MODEL_PLACEHOLDER_M{i}"},
+            "quotaInfo": {
+                "remainingFraction": round(1 - (pool * 0.13) % 1, 2),
+                "resetTime": reset.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            },
+        })
+    
+    body = {
+        "userStatus": {
+            "name": "Stand-in User",
+            "email": "standin@example.com",
+            "cascadeModelConfigData": {"clientModelConfigs": configs},
+            "experiments": [],
+        }
+    }
+    encoded = json.dumps(body).encode()
+    
+    if payload_size > len(encoded):
+        entry = {"key": "experiment-000000", "enabled": True, "value": "x" * 64}
+        entry_size = len(json.dumps(entry)) + 2
+        count = (payload_size - len(encoded)) // entry_size + 1
+        body["userStatus"]["experiments"] = [
+            dict(entry, key=f"experiment-{i:06d}") for i in range(count)
+        ]
+        encoded = json.dumps(body).encode()
+    return encoded
+
+
+def _server_ssl_context() -> ssl.SSLContext:
+    """
+    SSLContext với cert + key self-signed tạo mới (EC P-256, hạn 1 ngày)
+    
+    Key chỉ tồn tại trong thư mục tạm cho đến khi load_cert_chain đọc xong.
+    
+    Raises:
+        RuntimeError: Nếu không có openssl CLI
+    """
+    openssl = shutil.which("openssl")
+    if openssl is None:
+        raise RuntimeError("Stand-in server cần openssl CLI để tạo self-signed cert")
+    
+    with tempfile.TemporaryDirectory(prefix="standin-") as tmp:
+        cert_file = os.path.join(tmp, "cert.pem")
+        key_file = os.path.join(tmp, "key.pem")
+        subprocess.run(
+            [openssl, "req", "-x509", "-nodes", "-newkey", "ec", "-pkeyopt", "ec_paramgen_curve:prime256v1",
+             "-keyout", key_file, "-out", cert_file, "-days", "1", "-subj", "/CN=127.0.0.1"],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_file, key_file)
+    return context
+
+
+class _StandinHandler(BaseHTTPRequestHandler):
+    """Handler Connect unary JSON (chỉ POST)"""
+    protocol_version = "HTTP/1.1"
+    # Headers và body là hai lần write: tắt Nagle để client không đợi delayed ACK (~40ms)
+    disable_nagle_algorithm = True
+    
+    def do_POST(self):
+        standin = self.server.standin
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        
+        delay = standin.latency + (standin.jitter * standin.random() if standin.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+        
+        if self.path != GET_USER_STATUS_PATH:
+            return self._send_error("not_found", f"unknown procedure {self.path}")
+        if standin.csrf_token and self.headers.get("X-Codeium-Csrf-Token") != standin.csrf_token:
+            return self._send_error("unauthenticated", "invalid CSRF token")
+        if standin.error_rate and standin.random() < standin.error_rate:
+            return self._send_error("unavailable", "injected failure")
+        
+        standin.count("ok")
+        self._send(200, standin.payload)
+    
+    def _send_error(self, code: str, message: str):
+        self.server.standin.count(code)
+        self._send(_CONNECT_STATUS[code], json.dumps({"code": code, "message": message}).encode())
+    
+    def _send(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        if self.server.standin.verbose:
+            print(f"[DEBUG STANDIN] {self.address_string()} {format % args}")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def handle_error(self, request, client_address):
+        # Client đóng connection / handshake sai protocol là bình thường khi test fault
+        if self.standin.verbose:
+            super().handle_error(request, client_address)
+
+
+class StandinServer:
+    """
+    Stand-in language_server chạy trong background threads
+    
+    Example:
+        with StandinServer(csrf_token="abc", latency=0.05) as standin:
+            client = APIClient(standin.port, "abc", standin.http_port)
+    """
+    
+    def __init__(self, port: int = 0, http_port: Optional[int] = 0, csrf_token: str = "",
+                 latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 payload_size: int = 0, models: int = len(_MODEL_LABELS),
+                 seed: Optional[int] = None, verbose: bool = False):
+        """
+        Args:
+            port: HTTPS port (0 = tự chọn)
+            http_port: HTTP fallback port (0 = tự chọn, None = tắt)
+            csrf_token: Token bắt buộc trong X-Codeium-Csrf-Token ("" = không kiểm tra)
+            latency: Delay mỗi request (giây)
+            jitter: Delay thêm ngẫu nhiên trong [0, jitter)
+            error_rate: Tỉ lệ requests trả về Connect "unavailable" (503)
+            payload_size: Kích thước body tối thiểu (bytes)
+            models: Số models trong response
+            seed: Seed cho random (latency jitter, error injection)
+        """
+        self.csrf_token = csrf_token
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.verbose = verbose
+        self.payload = build_user_status(models, payload_size)
+        self.stats = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._servers = []
+        self._threads = []
+        
+        context = _server_ssl_context()
+        https = self._create_server(port)
+        # Handshake chạy trong handler thread (lần đọc đầu tiên), không block accept loop
+        https.socket = context.wrap_socket(https.socket, server_side=True, do_handshake_on_connect=False)
+        self.port = https.server_address[1]
+        
+        self.http_port = None
+        if http_port is not None:
+            self.http_port = self._create_server(http_port).server_address[1]
+    
+    def _create_server(self, port: int) -> _Server:
+        server = _Server(("127.0.0.1", port), _StandinHandler)
+        server.standin = self
+        self._servers.append(server)
+        return server
+    
+    def random(self) -> float:
+        with self._lock:
+            return self._random.random()
+    
+    def count(self, outcome: str):
+        """Đếm responses theo outcome ("ok" hoặc Connect error code)"""
+        with self._lock:
+            self.stats[outcome] = self.stats.get(outcome, 0) + 1
+    
+    def start(self) -> "StandinServer":
+        """Serve trên background threads"""
+        for server in self._servers:
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+    
+    def stop(self):
+        """Dừng và đóng sockets"""
+        for server in self._servers:
+            if self._threads:
+                server.shutdown()
+            server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+    
+    def __enter__(self) -> "StandinServer":
+        return self.start()
+    
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in GetUserStatus server cho load/fault testing")
+    parser.add_argument("--port", type=int, default=0, help="HTTPS port (default: tự chọn)")
+    parser.add_argument("--http-port", type=int, default=0, help="HTTP fallback port (default: tự chọn)")
+    parser.add_argument("--no-http", action="store_true", help="Tắt HTTP fallback port")
+    parser.add_argument("--csrf-token", default="", help="Bắt buộc X-Codeium-Csrf-Token này")
+    parser.add_argument("--latency", type=float, default=0.0, help="Delay mỗi request (giây)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Delay ngẫu nhiên thêm (giây)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ trả về 503 (0-1)")
+    parser.add_argument("--payload-size", type=int, default=0, help="Kích thước body tối thiểu (bytes)")
+    parser.add_argument("--models", type=int, default=len(_MODEL_LABELS), help="Số models")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args()
+    
+    standin = StandinServer(
+        port=args.port, http_port=None if args.no_http else args.http_port,
+        csrf_token=args.csrf_token, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, payload_size=args.payload_size, models=args.models,
+        seed=args.seed, verbose=args.verbose
+    ).start()
+    
+    print(f"Stand-in GetUserStatus: https://127.0.0.1:{standin.port}{GET_USER_STATUS_PATH}")
+    if standin.http_port:
+        print(f"HTTP fallback:          http://127.0.0.1:{standin.http_port}{GET_USER_STATUS_PATH}")
+    print(f"Payload: {len(standin.payload)} bytes, CSRF: {'required' if args.csrf_token else 'off'}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.stop()
+        print(f"Responses: {standin.stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
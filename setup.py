@@ -13,6 +13,10 @@ setup(
         "requests>=2.31.0",
         "colorama>=0.4.6",
     ],
+    extras_require={
+        "stats": ["numpy>=1.20"],
+        "parquet": ["numpy>=1.20", "pyarrow>=8.0"],
+    },
     entry_points={
         "console_scripts": [
             "agcheck=src.cli:main",
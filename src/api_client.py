@@ -2,12 +2,18 @@
 API Client Module - Communicate với Antigravity server để fetch quota data
 """
 
-import requests
+import copy
 import json
-from typing import Optional, Dict, List
-from dataclasses import dataclass
+import threading
+import time
+from typing import Callable, Optional, Dict, List
+from dataclasses import dataclass, field, replace
 from datetime import datetime
 
+from .timings import NULL_TIMINGS
+from .transport import TransportMemory, is_usable_status, server_transports
+from .utils import API_FETCH_TIMEOUT, AUTH_FAILURE_STATUS_CODES, STREAM_CHUNK_SIZE, STREAM_PARSE_MIN_BYTES
+
 
 @dataclass
 class QuotaModel:
@@ -27,6 +33,46 @@ class QuotaModel:
         return int((self.used / self.limit) * 100)
 
 
+@dataclass
+class QuotaPool:
+    """Nhóm models dùng chung một quota (cùng reset_time)"""
+    models: List[QuotaModel]
+    
+    @property
+    def key(self) -> str:
+        """ID ổn định giữa các snapshots (reset_time thay đổi theo thời gian, tên models thì không)"""
+        return "|".join(sorted(m.model_name for m in self.models))
+    
+    @property
+    def used(self) -> int:
+        return self.models[0].used
+    
+    @property
+    def limit(self) -> int:
+        return self.models[0].limit
+    
+    @property
+    def remaining(self) -> int:
+        return self.models[0].remaining
+    
+    @property
+    def reset_time(self) -> int:
+        return self.models[0].reset_time
+
+
+@dataclass
+class PoolForecast:
+    """Dự báo burn rate và thời điểm hết quota của một pool"""
+    burn_rate: float  # Quota units / giờ (EWMA)
+    eta_seconds: Optional[int]  # Số giây đến khi hết quota, None nếu không tiêu thụ
+    reset_time: int
+    
+    @property
+    def exhausts_before_reset(self) -> bool:
+        """Pool sẽ hết trước khi được reset"""
+        return self.eta_seconds is not None and self.eta_seconds < self.reset_time
+
+
 @dataclass
 class QuotaData:
     """Data class cho toàn bộ quota data"""
@@ -34,11 +80,88 @@ class QuotaData:
     timestamp: float
     total_used: int = 0
     total_limit: int = 0
+    pools: List[QuotaPool] = field(default_factory=list, init=False, repr=False, compare=False)
+    forecasts: Dict[str, PoolForecast] = field(default_factory=dict, init=False, repr=False, compare=False)
     
     def __post_init__(self):
         """Calculate totals với deduplication cho shared pools"""
         self._calculate_totals()
     
+    def to_dict(self) -> Dict:
+        """Serialize thành dict JSON-compatible (cache file, daemon protocol)"""
+        return {
+            "timestamp": self.timestamp,
+            "models": [
+                {
+                    "model_name": m.model_name,
+                    "used": m.used,
+                    "limit": m.limit,
+                    "remaining": m.remaining,
+                    "reset_time": m.reset_time,
+                    "is_shared_pool": m.is_shared_pool,
+                }
+                for m in self.models
+            ],
+            "pools": [
+                self._pool_to_dict(pool)
+                for pool in self.pools
+            ]
+        }
+    
+    def _pool_to_dict(self, pool: QuotaPool) -> Dict:
+        """Serialize pool kèm forecast (nếu có)"""
+        entry = {
+            "key": pool.key,
+            "models": [m.model_name for m in pool.models],
+            "used": pool.used,
+            "limit": pool.limit,
+            "remaining": pool.remaining,
+            "reset_time": pool.reset_time,
+        }
+        forecast = self.forecasts.get(pool.key)
+        if forecast:
+            entry["burn_rate_per_hour"] = round(forecast.burn_rate, 3)
+            entry["eta_seconds"] = forecast.eta_seconds
+        return entry
+    
+    def pool_of(self, model: QuotaModel) -> Optional[QuotaPool]:
+        """Pool chứa model"""
+        for pool in self.pools:
+            if any(m is model for m in pool.models):
+                return pool
+        return None
+    
+    def forecast_for(self, model: QuotaModel) -> Optional[PoolForecast]:
+        """Forecast của pool chứa model, None nếu chưa có"""
+        pool = self.pool_of(model)
+        return self.forecasts.get(pool.key) if pool else None
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "QuotaData":
+        """Tạo QuotaData từ dict đã serialize bằng to_dict()"""
+        models = [
+            QuotaModel(
+                model_name=m["model_name"],
+                used=m["used"],
+                limit=m["limit"],
+                remaining=m["remaining"],
+                reset_time=m["reset_time"],
+                is_shared_pool=m.get("is_shared_pool", False)
+            )
+            for m in data.get("models", [])
+        ]
+        quota_data = cls(models=models, timestamp=data.get("timestamp", 0))
+        
+        # Restore forecasts nếu bên serialize đã tính
+        for pool in data.get("pools", []):
+            if "burn_rate_per_hour" in pool:
+                quota_data.forecasts[pool["key"]] = PoolForecast(
+                    burn_rate=pool["burn_rate_per_hour"],
+                    eta_seconds=pool.get("eta_seconds"),
+                    reset_time=pool.get("reset_time", 0)
+                )
+        return quota_data
+    
     def _calculate_totals(self):
         """Smart calculation - deduplicate shared quota pools based on reset_time"""
         # Track các pools đã count để avoid duplicate
@@ -51,6 +174,8 @@ class QuotaData:
                 reset_time_groups[reset_time] = []
             reset_time_groups[reset_time].append(model)
         
+        self.pools = [QuotaPool(models=group) for group in reset_time_groups.values()]
+        
         # Nếu nhiều models cùng reset_time → shared pool
         for reset_time, models_in_group in reset_time_groups.items():
             if len(models_in_group) > 1:
@@ -69,52 +194,205 @@ class QuotaData:
                 self.total_limit += model.limit
 
 
+class _Flight:
+    """Một lần fetch đang chạy, các callers khác đợi trên event"""
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[QuotaData] = None
+
+
+def _caller_copy(quota_data: Optional[QuotaData]) -> Optional[QuotaData]:
+    """
+    Shallow copy của kết quả memo/singleflight cho một caller
+    
+    Callers gán forecasts (BurnRateEstimator) lên QuotaData nhận được, nên mỗi
+    caller cần object và forecasts dict riêng. Models/pools vẫn dùng chung (read-only).
+    """
+    if quota_data is None:
+        return None
+    own = copy.copy(quota_data)
+    own.forecasts = dict(quota_data.forecasts)
+    return own
+
+
 class APIClient:
-    """Client để communicate với Antigravity server"""
+    """
+    Client để communicate với Antigravity server
+    
+    fetch_quota() thread-safe: các callers gọi cùng lúc join một request đang
+    chạy (singleflight), kết quả thành công được memo trong cache_ttl giây.
+    Callers dùng chung một QuotaData nên coi nó là read-only.
+    """
     
-    def __init__(self, port: int, csrf_token: str = "", http_port: Optional[int] = None, verbose: bool = False):
+    def __init__(self, port: int, csrf_token: str = "", http_port: Optional[int] = None, verbose: bool = False,
+                 timings=NULL_TIMINGS, transport: Optional[TransportMemory] = None,
+                 on_transport_change: Optional[Callable[[], None]] = None, cache_ttl: float = 0.0):
+        """
+        Args:
+            transport: Transport ưu tiên + circuit breakers (thường từ ServerInfo.transport)
+            on_transport_change: Gọi khi transport state thay đổi để persist
+            cache_ttl: Tuổi tối đa (giây) của kết quả memo, default 0 = chỉ singleflight
+        """
         self.port = port
+        self.timings = timings
         self.csrf_token = csrf_token
         self.http_port = http_port or port
         self.verbose = verbose
         self.base_url = f"http://127.0.0.1:{self.http_port}"
+        self.transport = transport or TransportMemory()
+        self.on_transport_change = on_transport_change
+        # HTTP status của fetch gần nhất, None nếu không nhận được response
+        self.last_status_code: Optional[int] = None
+        self.cache_ttl = cache_ttl
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0}
+        self._session = None
+        self._lock = threading.Lock()
+        self._flight: Optional[_Flight] = None
+        self._memo: Optional[QuotaData] = None
+        self._memo_at = 0.0
     
-    def _log(self, message: str):
-        """Log message nếu verbose mode"""
+    @property
+    def session(self):
+        """
+        requests.Session giữ connection (TCP + TLS) giữa các lần fetch
+        
+        Tạo lazy để `import requests` (urllib3, ssl) chỉ xảy ra khi thực sự fetch.
+        """
+        if self._session is None:
+            import requests
+            import urllib3
+            # verify=False là chủ ý (self-signed cert của server local), không spam warning mỗi request
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+            self._session = requests.Session()
+        return self._session
+    
+    @classmethod
+    def from_server_info(cls, server_info, verbose: bool = False, timings=NULL_TIMINGS,
+                         persist_transport: bool = True, **kwargs) -> "APIClient":
+        """
+        Tạo client từ ServerInfo của PortDetector
+        
+        Args:
+            persist_transport: Ghi transport state vào discovery cache khi thay đổi
+                (False khi cache bị tắt, e.g. --no-cache)
+            **kwargs: Options khác của constructor (e.g. cache_ttl)
+        """
+        return cls(
+            port=server_info.port,
+            csrf_token=server_info.csrf_token,
+            http_port=server_info.http_port,
+            verbose=verbose,
+            timings=timings,
+            transport=server_info.transport,
+            on_transport_change=(lambda: _save_transport(server_info)) if persist_transport else None,
+            **kwargs
+        )
+    
+    def _log(self, message: str, *args):
+        """Log message nếu verbose mode (format %-style lazy, chỉ khi verbose)"""
         if self.verbose:
-            print(f"[DEBUG API] {message}")
+            print("[DEBUG API] " + (message % args if args else message))
+    
+    @property
+    def auth_failed(self) -> bool:
+        """Fetch gần nhất bị từ chối vì CSRF token (401/403)"""
+        return self.last_status_code in AUTH_FAILURE_STATUS_CODES
     
-    def fetch_quota(self) -> Optional[QuotaData]:
+    def close(self):
+        """Đóng các connections đang giữ"""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+    
+    def fetch_quota(self, fallback_to_mock: bool = False, max_age: Optional[float] = None) -> Optional[QuotaData]:
         """
         Fetch quota data từ server
         
+        Args:
+            fallback_to_mock: Trả về mock data nếu tất cả endpoints fail (opt-in,
+                mặc định lỗi được trả về dưới dạng None thay vì bị che bởi mock data)
+            max_age: Tuổi tối đa (giây) của kết quả memo được chấp nhận cho call này,
+                default self.cache_ttl. 0 = không dùng memo (vẫn join fetch đang chạy)
+        
         Returns:
             QuotaData nếu thành công, None nếu lỗi
         """
+        data = self._fetch_shared(self.cache_ttl if max_age is None else max_age)
+        if data or not fallback_to_mock:
+            return data
+        
+        # Nếu tất cả endpoints fail, return mock data for development
+        self._log("All endpoints failed, returning mock data")
+        return self._get_mock_data()
+    
+    def _fetch_shared(self, max_age: float) -> Optional[QuotaData]:
+        """Memo hit, join fetch đang chạy, hoặc fetch (leader) - stats được đếm dưới lock"""
+        with self._lock:
+            if self._memo is not None and max_age > 0 and time.monotonic() - self._memo_at <= max_age:
+                self.stats["hits"] += 1
+                return _caller_copy(self._memo)
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+                self.stats["misses"] += 1
+            else:
+                self.stats["coalesced"] += 1
+        
+        if not leader:
+            flight.event.wait()
+            return _caller_copy(flight.result)
+        
+        try:
+            flight.result = self._fetch_uncached()
+        finally:
+            with self._lock:
+                self._flight = None
+                if flight.result is not None:
+                    self._memo, self._memo_at = flight.result, time.monotonic()
+            flight.event.set()
+        return _caller_copy(flight.result)
+    
+    def _fetch_uncached(self) -> Optional[QuotaData]:
+        """Thử lần lượt các endpoints, None nếu tất cả fail"""
         # Exact endpoint từ Antigravity Language Server
         endpoints = [
             "/exa.language_server_pb.LanguageServerService/GetUserStatus",
         ]
+        self.last_status_code = None
         
         for endpoint in endpoints:
             try:
-                self._log(f"Trying endpoint: {endpoint}")
+                self._log("Trying endpoint: %s", endpoint)
                 data = self._fetch_from_endpoint(endpoint)
                 if data:
                     self._log("Successfully fetched real quota data!")
                     return data
             except Exception as e:
-                self._log(f"Failed endpoint {endpoint}: {e}")
+                self._log("Failed endpoint %s: %s", endpoint, e)
                 continue
         
-        # Nếu tất cả endpoints fail, return mock data for development
-        self._log("All endpoints failed, returning mock data")
-        return self._get_mock_data()
+        self._log("All endpoints failed")
+        return None
+    
+    def _transports(self) -> list:
+        """Các transports có thể dùng: HTTPS trên port chính, HTTP trên http_port (nếu khác)"""
+        return server_transports(self.port, self.http_port)
+    
+    def _transport_changed(self):
+        if self.on_transport_change is not None:
+            self.on_transport_change()
     
     def _fetch_from_endpoint(self, endpoint: str) -> Optional[QuotaData]:
-        """Fetch từ một endpoint cụ thể"""
-        # Construct full URL với HTTPS
-        url = f"https://127.0.0.1:{self.port}{endpoint}"
+        """
+        Fetch từ một endpoint cụ thể
+        
+        Thử transport thành công lần trước trước tiên. Lỗi connect/TLS đánh dấu
+        transport đó fail (circuit breaker + backoff) rồi chuyển sang transport
+        kế tiếp, nên một HTTPS port từ chối TLS chỉ tốn handshake thất bại một lần.
+        """
+        with self.timings.span("fetch.import_requests"):
+            import requests
         
         # Prepare headers theo Antigravity API spec
         headers = {
@@ -130,50 +408,84 @@ class APIClient:
         # Prepare request body
         request_body = {}  # Empty body for GetUserStatus
         
-        self._log(f"Making HTTPS request to {url}")
-        self._log(f"Headers: {list(headers.keys())}")
+        self._log("Headers: %s", list(headers.keys()))
         
-        try:
-            # Try HTTPS first
-            response = requests.post(
-                url,
-                headers=headers,
-                json=request_body,
-                timeout=5,
-                verify=False  # Disable SSL verification for local server
-            )
+        for scheme, port in self.transport.order(self._transports()):
+            url = f"{scheme}://127.0.0.1:{port}{endpoint}"
+            self._log("Making %s request to %s", scheme.upper(), url)
             
-            self._log(f"Response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                return self._parse_response(response.json())
-                
-        except requests.exceptions.SSLError as e:
-            # HTTPS failed, try HTTP fallback on httpPort
-            if self.http_port != self.port:
-                self._log(f"HTTPS failed, trying HTTP on port {self.http_port}")
-                url_http = f"http://127.0.0.1:{self.http_port}{endpoint}"
-                
-                try:
-                    response = requests.post(
-                        url_http,
+            try:
+                # Span gồm connect + TLS handshake (HTTPS) + response headers
+                with self.timings.span(f"fetch.{scheme}"):
+                    response = self.session.post(
+                        url,
                         headers=headers,
                         json=request_body,
-                        timeout=5
+                        timeout=API_FETCH_TIMEOUT,
+                        verify=False,  # Disable SSL verification for local server
+                        stream=True
                     )
-                    
-                    if response.status_code == 200:
-                        return self._parse_response(response.json())
-                except Exception as e2:
-                    self._log(f"HTTP fallback also failed: {e2}")
-        except Exception as e:
-            self._log(f"Request failed: {e}")
+            except requests.exceptions.ConnectionError as e:
+                # Gồm SSLError: transport này không dùng được, thử transport kế tiếp
+                self._log("%s transport failed: %s", scheme.upper(), e)
+                self.transport.record_failure((scheme, port))
+                self._transport_changed()
+                continue
+            except Exception as e:
+                self._log("Request failed: %s", e)
+                return None
+            
+            self._log("Response status: %s", response.status_code)
+            self.last_status_code = response.status_code
+            if is_usable_status(response.status_code) and self.transport.record_success((scheme, port)):
+                self._transport_changed()
+            
+            if response.status_code == 200:
+                return self._parse_stream(response)
+            response.close()
+            return None
         
         return None
     
+    def _parse_stream(self, response) -> Optional[QuotaData]:
+        """
+        Parse streamed response mà không load toàn bộ body vào memory
+        
+        Chỉ label và quotaInfo của mỗi model config được materialize, các
+        subtrees khác (user profile, configs khác) bị skip khi scan.
+        Body có Content-Length dưới STREAM_PARSE_MIN_BYTES (trường hợp thường
+        gặp) được đọc hết và json.loads, vì scanner chỉ có lợi với payload lớn.
+        """
+        length = response.headers.get("Content-Length", "")
+        if length.isdigit() and int(length) < STREAM_PARSE_MIN_BYTES:
+            with response, self.timings.span("fetch.read_and_parse"):
+                return self._parse_body(response.content)
+        
+        from .stream_parser import extract_model_configs
+        
+        with response, self.timings.span("fetch.read_and_parse"):
+            try:
+                model_configs = extract_model_configs(response.iter_content(STREAM_CHUNK_SIZE))
+            except ValueError as e:
+                self._log("Parse error: %s", e)
+                return None
+        return self._build_quota_data(model_configs)
+    
+    def _parse_body(self, body: bytes) -> Optional[QuotaData]:
+        """json.loads toàn bộ body (payload nhỏ)"""
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            self._log("Parse error: %s", e)
+            return None
+        if not isinstance(data, dict):
+            self._log("Parse error: response không phải JSON object")
+            return None
+        return self._parse_response(data)
+    
     def _parse_response(self, data: Dict) -> Optional[QuotaData]:
         """
-        Parse API response thành QuotaData
+        Parse API response (đã decode thành dict) thành QuotaData
         
         Antigravity response format:
         {
@@ -192,15 +504,17 @@ class APIClient:
           }
         }
         """
+        # Extract từ UserStatusResponse format
+        user_status = data.get('userStatus', {})
+        cascade_data = user_status.get('cascadeModelConfigData', {})
+        return self._build_quota_data(cascade_data.get('clientModelConfigs', []))
+    
+    def _build_quota_data(self, model_configs: List[Dict]) -> Optional[QuotaData]:
+        """Tạo QuotaData từ list clientModelConfigs ({label, quotaInfo})"""
         try:
             models = []
             
-            # Extract từ UserStatusResponse format
-            user_status = data.get('userStatus', {})
-            cascade_data = user_status.get('cascadeModelConfigData', {})
-            model_configs = cascade_data.get('clientModelConfigs', [])
-            
-            self._log(f"Found {len(model_configs)} model configs in response")
+            self._log("Found %s model configs in response", len(model_configs))
             
             for config in model_configs:
                 label = config.get('label', 'Unknown')
@@ -254,9 +568,10 @@ class APIClient:
                 return None
             
         except Exception as e:
-            self._log(f"Parse error: {e}")
-            import traceback
-            self._log(f"Traceback: {traceback.format_exc()}")
+            self._log("Parse error: %s", e)
+            if self.verbose:
+                import traceback
+                self._log("Traceback: %s", traceback.format_exc())
             return None
     
     def _get_mock_data(self) -> QuotaData:
@@ -280,3 +595,115 @@ class APIClient:
             models=models,
             timestamp=datetime.now().timestamp()
         )
+
+
+def _save_transport(server_info):
+    """Persist transport state của server_info vào discovery cache"""
+    from .port_detector import DiscoveryCache
+    DiscoveryCache().update(server_info)
+
+
+def create_client(servers: list, verbose: bool = False, timings=NULL_TIMINGS, cache_ttl: float = 0.0,
+                  persist_transport: bool = True):
+    """
+    Tạo client phù hợp cho danh sách servers từ PortDetector.detect_all()
+    
+    Returns:
+        APIClient nếu chỉ có một instance, MultiInstanceClient nếu nhiều
+    """
+    if len(servers) == 1:
+        return APIClient.from_server_info(servers[0], verbose=verbose, timings=timings, cache_ttl=cache_ttl,
+                                          persist_transport=persist_transport)
+    return MultiInstanceClient(servers, verbose=verbose, timings=timings, cache_ttl=cache_ttl,
+                               persist_transport=persist_transport)
+
+
+class MultiInstanceClient:
+    """
+    Fan-out fetch_quota tới nhiều language_server instances cùng lúc
+    
+    Latency tổng bằng instance chậm nhất thay vì tổng các instances.
+    """
+    
+    def __init__(self, servers: list, verbose: bool = False, timings=NULL_TIMINGS, cache_ttl: float = 0.0,
+                 persist_transport: bool = True):
+        self.verbose = verbose
+        self.clients = [
+            APIClient.from_server_info(s, verbose=verbose, timings=timings, cache_ttl=cache_ttl,
+                                       persist_transport=persist_transport)
+            for s in servers
+        ]
+    
+    def fetch_quota(self, fallback_to_mock: bool = False, max_age: Optional[float] = None) -> Optional[QuotaData]:
+        """
+        Fetch quota từ tất cả instances và merge thành một QuotaData
+        
+        Args:
+            fallback_to_mock: Trả về mock data nếu tất cả instances fail
+            max_age: Tuổi tối đa của kết quả memo của mỗi instance (xem APIClient.fetch_quota)
+        
+        Returns:
+            QuotaData đã merge, None nếu không instance nào thành công
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        
+        with ThreadPoolExecutor(max_workers=max(1, len(self.clients))) as executor:
+            results = list(executor.map(
+                lambda client: client.fetch_quota(fallback_to_mock=False, max_age=max_age),
+                self.clients
+            ))
+        
+        merged = merge_quota_data([r for r in results if r])
+        if merged or not fallback_to_mock or not self.clients:
+            return merged
+        return self.clients[0]._get_mock_data()
+    
+    @property
+    def auth_failed(self) -> bool:
+        """Có instance bị từ chối vì CSRF token ở lần fetch gần nhất"""
+        return any(client.auth_failed for client in self.clients)
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Tổng memo/singleflight stats của các instances"""
+        return {key: sum(client.stats[key] for client in self.clients) for key in ("hits", "misses", "coalesced")}
+    
+    def close(self):
+        """Đóng connections của tất cả clients"""
+        for client in self.clients:
+            client.close()
+
+
+def merge_quota_data(snapshots: List[QuotaData]) -> Optional[QuotaData]:
+    """
+    Merge QuotaData từ nhiều instances, deduplicate theo model + pool
+    
+    Pool được nhận diện bằng thời điểm reset tuyệt đối (làm tròn phút) nên
+    cùng account thấy từ nhiều IDE windows chỉ tính một lần. Nếu trùng,
+    giữ bản có used cao nhất (số liệu mới nhất).
+    
+    Models được copy trước khi tính lại pools: snapshots đầu vào có thể là
+    kết quả memo của APIClient đang được callers khác dùng.
+    
+    Args:
+        snapshots: List QuotaData
+        
+    Returns:
+        QuotaData mới (kể cả khi chỉ có một snapshot), None nếu list rỗng
+    """
+    if not snapshots:
+        return None
+    
+    merged = {}
+    for snapshot in snapshots:
+        for model in snapshot.models:
+            reset_at_minute = round((snapshot.timestamp + model.reset_time) / 60)
+            key = (model.model_name, reset_at_minute)
+            existing = merged.get(key)
+            if existing is None or model.used > existing.used:
+                merged[key] = model
+    
+    return QuotaData(
+        models=[replace(model) for model in merged.values()],
+        timestamp=max(s.timestamp for s in snapshots)
+    )
@@ -0,0 +1,344 @@
+"""
+Async Client Module - AsyncAPIClient cho asyncio services
+
+Cùng semantics với APIClient.fetch_quota() (QuotaData hoặc None, transport
+memory + circuit breaker, opt-in mock fallback) nhưng không block thread:
+HTTP/1.1 được nói trực tiếp trên asyncio streams (không thêm dependency),
+connections được giữ keep-alive trong pool theo transport.
+
+- Deadline mỗi call: fetch_quota(timeout=...) bao trùm connect + TLS + response
+- Cancellation: task bị cancel thì connection đang dùng bị đóng (không quay
+  lại pool với response đọc dở), CancelledError được propagate
+
+Example:
+    async with AsyncAPIClient.from_server_info(server) as client:
+        quota_data = await client.fetch_quota(timeout=2)
+"""
+
+import asyncio
+import socket
+import ssl
+from typing import Dict, List, Optional, Tuple
+
+from .api_client import APIClient, QuotaData, merge_quota_data
+from .transport import is_usable_status
+from .timings import NULL_TIMINGS
+from .utils import API_FETCH_TIMEOUT, ASYNC_POOL_MAX_IDLE, STREAM_PARSE_MIN_BYTES
+
+GET_USER_STATUS_ENDPOINT = "/exa.language_server_pb.LanguageServerService/GetUserStatus"
+
+_Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class _StaleConnection(Exception):
+    """Connection keep-alive đã bị server đóng trước khi gửi response"""
+
+
+def _ssl_context() -> ssl.SSLContext:
+    # Self-signed cert của server local, giống verify=False của APIClient
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def _close_quietly(writer: asyncio.StreamWriter):
+    try:
+        writer.close()
+    except RuntimeError:
+        # Loop tạo connection đã đóng: không close qua transport được nữa, chỉ
+        # shutdown socket để server không giữ connection (fd đóng khi GC)
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+    except OSError:
+        pass
+
+
+async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, bytes, bool]:
+    """
+    Đọc một HTTP/1.1 response
+    
+    Returns:
+        (status, body, keep_alive)
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise _StaleConnection()
+    version, status = status_line.split(None, 2)[:2]
+    
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    
+    keep_alive = version == b"HTTP/1.1" and headers.get("connection", "").lower() != "close"
+    
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";", 1)[0], 16)
+            if size == 0:
+                # Trailers (thường rỗng) kết thúc bằng dòng trống
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    
+    return int(status), body, keep_alive
+
+
+class AsyncAPIClient(APIClient):
+    """APIClient trên asyncio: fetch_quota() là coroutine, connections keep-alive trong pool"""
+    
+    def __init__(self, port: int, csrf_token: str = "", http_port: Optional[int] = None, verbose: bool = False,
+                 timings=NULL_TIMINGS, transport=None, on_transport_change=None,
+                 timeout: float = API_FETCH_TIMEOUT):
+        """
+        Args:
+            timeout: Deadline mặc định của mỗi fetch_quota() (giây)
+        """
+        super().__init__(port, csrf_token, http_port, verbose, timings, transport, on_transport_change)
+        self.timeout = timeout
+        self._pool: Dict[Tuple[str, int], List[_Connection]] = {}
+        self._loop = None
+        self._ssl = None
+    
+    def _log(self, message: str, *args):
+        """Log message nếu verbose mode (format %-style lazy, chỉ khi verbose)"""
+        if self.verbose:
+            print("[DEBUG ASYNC API] " + (message % args if args else message))
+    
+    async def __aenter__(self) -> "AsyncAPIClient":
+        return self
+    
+    async def __aexit__(self, *exc):
+        await self.aclose()
+    
+    def close(self):
+        """Đóng các connections trong pool (không đợi, dùng aclose() trong coroutine)"""
+        pool, self._pool = self._pool, {}
+        for connections in pool.values():
+            for _, writer in connections:
+                _close_quietly(writer)
+    
+    async def aclose(self):
+        """Đóng các connections trong pool và đợi chúng đóng xong"""
+        writers = [writer for connections in self._pool.values() for _, writer in connections]
+        self.close()
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+    
+    async def fetch_quota(self, fallback_to_mock: bool = False, timeout: Optional[float] = None) -> Optional[QuotaData]:
+        """
+        Fetch quota data từ server
+        
+        Args:
+            fallback_to_mock: Trả về mock data nếu fetch fail
+            timeout: Deadline cho cả call (giây), default self.timeout
+        
+        Returns:
+            QuotaData nếu thành công, None nếu lỗi hoặc quá deadline
+        """
+        self.last_status_code = None
+        try:
+            data = await asyncio.wait_for(
+                self._fetch_from_endpoint(GET_USER_STATUS_ENDPOINT),
+                self.timeout if timeout is None else timeout
+            )
+        except asyncio.TimeoutError:
+            self._log("Deadline exceeded")
+            data = None
+        except Exception as e:
+            self._log("Failed endpoint %s: %s", GET_USER_STATUS_ENDPOINT, e)
+            data = None
+        
+        if data:
+            self._log("Successfully fetched real quota data!")
+            return data
+        if not fallback_to_mock:
+            return None
+        self._log("Fetch failed, returning mock data")
+        return self._get_mock_data()
+    
+    async def _fetch_from_endpoint(self, endpoint: str) -> Optional[QuotaData]:
+        """Thử các transports theo TransportMemory, giống APIClient._fetch_from_endpoint"""
+        if not self.csrf_token:
+            self._log("WARNING: No CSRF token available")
+        
+        for scheme, port in self.transport.order(self._transports()):
+            self._log("Making %s request to %s://127.0.0.1:%s%s", scheme.upper(), scheme, port, endpoint)
+            try:
+                with self.timings.span(f"fetch.{scheme}"):
+                    status, body = await self._request((scheme, port), endpoint)
+            except (OSError, EOFError, _StaleConnection) as e:
+                # Gồm ssl.SSLError, connection refused/reset
+                self._log("%s transport failed: %s", scheme.upper(), e or type(e).__name__)
+                self.transport.record_failure((scheme, port))
+                self._transport_changed()
+                continue
+            
+            self._log("Response status: %s", status)
+            self.last_status_code = status
+            if is_usable_status(status) and self.transport.record_success((scheme, port)):
+                self._transport_changed()
+            if status != 200:
+                return None
+            return self._parse_body(body)
+        
+        return None
+    
+    def _parse_body(self, body: bytes) -> Optional[QuotaData]:
+        """Body nhỏ: json.loads như APIClient, body lớn: scanner (không build cả document)"""
+        if len(body) < STREAM_PARSE_MIN_BYTES:
+            with self.timings.span("fetch.read_and_parse"):
+                return super()._parse_body(body)
+        
+        from .stream_parser import extract_model_configs
+        
+        with self.timings.span("fetch.read_and_parse"):
+            try:
+                model_configs = extract_model_configs((body,))
+            except ValueError as e:
+                self._log("Parse error: %s", e)
+                return None
+        return self._build_quota_data(model_configs)
+    
+    async def _request(self, transport: Tuple[str, int], endpoint: str) -> Tuple[int, bytes]:
+        """
+        POST endpoint qua một connection từ pool (hoặc connection mới)
+        
+        Connection keep-alive bị server đóng trong lúc idle được thay bằng
+        connection mới một lần, không tính là transport fail.
+        """
+        payload = b"{}"  # Empty body for GetUserStatus
+        head = [
+            f"POST {endpoint} HTTP/1.1",
+            f"Host: 127.0.0.1:{transport[1]}",
+            "Content-Type: application/json",
+            "Connect-Protocol-Version: 1",
+            f"Content-Length: {len(payload)}",
+            "Connection: keep-alive",
+        ]
+        if self.csrf_token:
+            head.append(f"X-Codeium-Csrf-Token: {self.csrf_token}")
+        request = ("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload
+        
+        while True:
+            connection, reused = await self._acquire(transport)
+            reader, writer = connection
+            done = False
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, body, keep_alive = await _read_response(reader)
+                done = keep_alive
+                return status, body
+            except (OSError, EOFError, _StaleConnection):
+                if not reused:
+                    raise
+                self._log("Pooled connection to %s:%s closed, reconnecting", *transport)
+            finally:
+                # Cancel / lỗi giữa chừng: response đọc dở, không trả về pool
+                if done:
+                    self._release(transport, connection)
+                else:
+                    _close_quietly(writer)
+    
+    async def _acquire(self, transport: Tuple[str, int]) -> Tuple[_Connection, bool]:
+        """Lấy connection idle còn sống, hoặc mở connection mới"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Connections gắn với event loop tạo ra chúng (e.g. nhiều lần asyncio.run)
+            self.close()
+            self._loop = loop
+        
+        idle = self._pool.get(transport, [])
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return (reader, writer), True
+            _close_quietly(writer)
+        
+        scheme, port = transport
+        if scheme == "https" and self._ssl is None:
+            self._ssl = _ssl_context()
+        connection = await asyncio.open_connection(
+            "127.0.0.1", port, ssl=self._ssl if scheme == "https" else None
+        )
+        return connection, False
+    
+    def _release(self, transport: Tuple[str, int], connection: _Connection):
+        idle = self._pool.setdefault(transport, [])
+        if len(idle) < ASYNC_POOL_MAX_IDLE:
+            idle.append(connection)
+        else:
+            _close_quietly(connection[1])
+
+
+def create_async_client(servers: list, verbose: bool = False, timings=NULL_TIMINGS):
+    """
+    Async counterpart của create_client()
+    
+    Returns:
+        AsyncAPIClient nếu chỉ có một instance, AsyncMultiInstanceClient nếu nhiều
+    """
+    if len(servers) == 1:
+        return AsyncAPIClient.from_server_info(servers[0], verbose=verbose, timings=timings)
+    return AsyncMultiInstanceClient(servers, verbose=verbose, timings=timings)
+
+
+class AsyncMultiInstanceClient:
+    """Fetch tất cả instances đồng thời trên event loop và merge kết quả"""
+    
+    def __init__(self, servers: list, verbose: bool = False, timings=NULL_TIMINGS):
+        self.verbose = verbose
+        self.clients = [AsyncAPIClient.from_server_info(s, verbose=verbose, timings=timings) for s in servers]
+    
+    async def __aenter__(self) -> "AsyncMultiInstanceClient":
+        return self
+    
+    async def __aexit__(self, *exc):
+        await self.aclose()
+    
+    async def fetch_quota(self, fallback_to_mock: bool = False, timeout: Optional[float] = None) -> Optional[QuotaData]:
+        """
+        Fetch từ tất cả instances, deadline áp dụng cho từng instance (chạy song song)
+        
+        Returns:
+            QuotaData đã merge, None nếu không instance nào thành công
+        """
+        results = await asyncio.gather(*(
+            client.fetch_quota(fallback_to_mock=False, timeout=timeout) for client in self.clients
+        ))
+        merged = merge_quota_data([r for r in results if r])
+        if merged or not fallback_to_mock or not self.clients:
+            return merged
+        return self.clients[0]._get_mock_data()
+    
+    @property
+    def auth_failed(self) -> bool:
+        return any(client.auth_failed for client in self.clients)
+    
+    def close(self):
+        for client in self.clients:
+            client.close()
+    
+    async def aclose(self):
+        await asyncio.gather(*(client.aclose() for client in self.clients))
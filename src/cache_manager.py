@@ -1,49 +1,134 @@
 """
 Cache Manager Module - Quản lý offline cache
+
+Cache là binary snapshot (src/snapshot.py): header có version + crc32 nên file
+hỏng được phát hiện (last_error) thay vì parse lỗi âm thầm, và tuổi của cache
+được kiểm tra trước khi decode models.
+
+Nhiều agcheck processes (tmux panes, status bars) có thể chạy cùng lúc:
+- save() ghi vào file tạm + fsync + os.replace nên load() luôn thấy bản
+  hoàn chỉnh cũ hoặc mới, không bao giờ thấy file ghi dở
+- refresh_lock() là advisory lock (flock / msvcrt) để chỉ một process
+  fetch tại một thời điểm, các process khác đợi rồi đọc kết quả của nó
 """
 
 import json
-from typing import Optional
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Tuple
 from datetime import datetime, timedelta
-from .utils import CACHE_FILE, CACHE_MAX_AGE_HOURS, ensure_cache_dir
-from .api_client import QuotaData, QuotaModel
+from .utils import CACHE_FILE, CACHE_MAX_AGE_HOURS, CACHE_LOCK_TIMEOUT, ensure_cache_dir, write_atomic
+from .api_client import QuotaData
+from .snapshot import Snapshot, SnapshotError, encode
+
+
+def _try_lock(fd: int) -> bool:
+    """Lấy exclusive lock không block, False nếu process khác đang giữ"""
+    try:
+        if sys.platform == 'win32':
+            import msvcrt
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd: int):
+    try:
+        if sys.platform == 'win32':
+            import msvcrt
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    except OSError:
+        pass
 
 
 class CacheManager:
     """Manager để lưu và load cache"""
     
-    def __init__(self):
+    def __init__(self, keep_history: bool = True, cache_file: Path = CACHE_FILE):
         ensure_cache_dir()
+        self.cache_file = Path(cache_file)
+        self.lock_file = self.cache_file.with_suffix(".lock")
+        # cache.json của các version trước, chỉ đọc khi chưa có snapshot
+        self.legacy_file = self.cache_file.with_suffix(".json")
+        self.keep_history = keep_history
+        # Lý do lần load gần nhất bỏ qua cache file (corrupt, version lạ), None nếu OK
+        self.last_error: Optional[str] = None
+        self._history = None
+    
+    @property
+    def history(self):
+        """HistoryStore, tạo lazy để cache-only path không phải import sqlite3"""
+        if self._history is None and self.keep_history:
+            from .history_store import HistoryStore
+            self._history = HistoryStore()
+        return self._history
     
     def save(self, quota_data: QuotaData):
         """
-        Lưu quota data vào cache
+        Lưu quota data vào cache (binary snapshot, atomic: file tạm + fsync + rename)
         
         Args:
             quota_data: QuotaData object để save
         """
         try:
-            cache_obj = {
-                "timestamp": quota_data.timestamp,
-                "models": [
-                    {
-                        "model_name": m.model_name,
-                        "used": m.used,
-                        "limit": m.limit,
-                        "remaining": m.remaining,
-                        "reset_time": m.reset_time,
-                        "is_shared_pool": m.is_shared_pool,
-                    }
-                    for m in quota_data.models
-                ]
-            }
-            
-            with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(cache_obj, f, indent=2)
-                
-        except Exception as e:
+            write_atomic(self.cache_file, encode(quota_data))
+        except Exception:
             # Silent fail - không critical nếu cache fail
             pass
+        
+        if self.history is not None:
+            try:
+                self.history.append(quota_data)
+            except Exception:
+                # History chỉ là bonus, không block việc hiển thị
+                pass
+    
+    @contextmanager
+    def refresh_lock(self, timeout: float = CACHE_LOCK_TIMEOUT):
+        """
+        Advisory lock để chỉ một process refresh cache tại một thời điểm
+        
+        Readers không cần lock (save() là atomic). Không lấy được lock trong
+        timeout thì vẫn chạy tiếp không lock - lock chỉ để tránh fetch trùng.
+        
+        Yields:
+            contended: True nếu process khác đang giữ lock lúc bắt đầu (đã đợi);
+            caller nên load() lại cache trước khi tự fetch
+        """
+        try:
+            ensure_cache_dir()
+            fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError:
+            fd = None
+        
+        locked = contended = False
+        try:
+            if fd is not None:
+                deadline = time.monotonic() + timeout
+                while not _try_lock(fd):
+                    contended = True
+                    if time.monotonic() >= deadline:
+                        break
+                    time.sleep(0.05)
+                else:
+                    locked = True
+            yield contended
+        finally:
+            if locked:
+                _unlock(fd)
+            if fd is not None:
+                os.close(fd)
     
     def load(self) -> Optional[QuotaData]:
         """
@@ -52,70 +137,113 @@ class CacheManager:
         Returns:
             QuotaData nếu cache valid, None nếu không có hoặc expired
         """
+        return self.load_with_age()[0]
+    
+    def load_with_age(self, max_age: Optional[float] = None) -> Tuple[Optional[QuotaData], Optional[float]]:
+        """
+        Load quota data và tuổi của nó (giây) trong một lần đọc file
+        
+        Args:
+            max_age: Nếu snapshot cũ hơn max_age giây thì không decode models,
+                trả về (None, age)
+        
+        Returns:
+            (QuotaData, age_seconds), (None, None) nếu không có hoặc expired
+        """
+        self.last_error = None
+        try:
+            with open(self.cache_file, 'rb') as f:
+                snapshot = Snapshot(f.read())
+        except FileNotFoundError:
+            return self._with_age(self._load_legacy() or self._load_from_history(), max_age)
+        except OSError as e:
+            self.last_error = str(e)
+            return self._with_age(self._load_from_history(), max_age)
+        except SnapshotError as e:
+            self.last_error = f"{self.cache_file}: {e}"
+            return self._with_age(self._load_from_history(), max_age)
+        
+        # Check cache age trước khi decode
+        age = time.time() - snapshot.timestamp
+        if age / 3600 > CACHE_MAX_AGE_HOURS:
+            # Cache quá cũ
+            return None, None
+        if max_age is not None and age > max_age:
+            return None, age
         try:
-            if not CACHE_FILE.exists():
-                return None
-            
-            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                cache_obj = json.load(f)
-            
-            # Check cache age
-            cache_timestamp = cache_obj.get("timestamp", 0)
-            cache_age_hours = (datetime.now().timestamp() - cache_timestamp) / 3600
-            
-            if cache_age_hours > CACHE_MAX_AGE_HOURS:
-                # Cache quá cũ
-                return None
-            
-            # Parse models
-            models = []
-            for m in cache_obj.get("models", []):
-                model = QuotaModel(
-                    model_name=m["model_name"],
-                    used=m["used"],
-                    limit=m["limit"],
-                    remaining=m["remaining"],
-                    reset_time=m["reset_time"],
-                    is_shared_pool=m.get("is_shared_pool", False)
-                )
-                models.append(model)
-            
-            return QuotaData(
-                models=models,
-                timestamp=cache_timestamp
-            )
-            
-        except Exception as e:
-            # Parse error hoặc file corrupt
+            return snapshot.quota_data(), age
+        except SnapshotError as e:
+            self.last_error = f"{self.cache_file}: {e}"
+            return self._with_age(self._load_from_history(), max_age)
+    
+    @staticmethod
+    def _with_age(quota_data: Optional[QuotaData],
+                  max_age: Optional[float] = None) -> Tuple[Optional[QuotaData], Optional[float]]:
+        if quota_data is None:
+            return None, None
+        age = time.time() - quota_data.timestamp
+        if max_age is not None and age > max_age:
+            return None, age
+        return quota_data, age
+    
+    def _load_legacy(self) -> Optional[QuotaData]:
+        """cache.json (JSON format cũ) - để lần chạy đầu sau khi upgrade vẫn có cache"""
+        if self.legacy_file == self.cache_file:
             return None
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                quota_data = QuotaData.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return None
+        if (time.time() - quota_data.timestamp) / 3600 > CACHE_MAX_AGE_HOURS:
+            return None
+        return quota_data
+    
+    def _load_from_history(self) -> Optional[QuotaData]:
+        """Fallback: snapshot cuối cùng trong history (nếu chưa quá CACHE_MAX_AGE_HOURS)"""
+        if self.history is None:
+            return None
+        try:
+            quota_data = self.history.latest()
+        except Exception:
+            return None
+        if quota_data is None:
+            return None
+        if (datetime.now().timestamp() - quota_data.timestamp) / 3600 > CACHE_MAX_AGE_HOURS:
+            return None
+        return quota_data
     
     def get_cache_age(self) -> Optional[str]:
         """
         Get cache age string (e.g., "2 hours ago")
         
+        Đọc lại cache file (chỉ header, không decode models) - nếu đã có
+        QuotaData từ load() thì dùng describe_age(quota_data.timestamp).
+        
         Returns:
             Human-readable cache age hoặc None
         """
         try:
-            if not CACHE_FILE.exists():
-                return None
-            
-            with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                cache_obj = json.load(f)
-            
-            cache_timestamp = cache_obj.get("timestamp", 0)
-            cache_datetime = datetime.fromtimestamp(cache_timestamp)
-            
-            delta = datetime.now() - cache_datetime
-            
-            if delta.days > 0:
-                return f"{delta.days} ngày trước"
-            elif delta.seconds >= 3600:
-                hours = delta.seconds // 3600
-                return f"{hours} giờ trước"
-            else:
-                minutes = delta.seconds // 60
-                return f"{minutes} phút trước"
-                
-        except:
+            with open(self.cache_file, 'rb') as f:
+                return self.describe_age(Snapshot(f.read()).timestamp)
+        except (OSError, SnapshotError):
             return None
+    
+    @staticmethod
+    def describe_age(timestamp: float) -> str:
+        """
+        Format tuổi của snapshot (e.g., "2 giờ trước")
+        
+        Args:
+            timestamp: QuotaData.timestamp
+        """
+        delta = datetime.now() - datetime.fromtimestamp(timestamp)
+        
+        if delta.days > 0:
+            return f"{delta.days} ngày trước"
+        elif delta.seconds >= 3600:
+            hours = delta.seconds // 3600
+            return f"{hours} giờ trước"
+        else:
+            minutes = delta.seconds // 60
+            return f"{minutes} phút trước"
@@ -2,14 +2,20 @@
 CLI Module - Command line interface entry point
 """
 
+import os
 import sys
+import time
 import argparse
-from colorama import Fore, Style
+import subprocess
 
-from .port_detector import PortDetector
-from .api_client import APIClient
-from .formatter import QuotaFormatter
-from .cache_manager import CacheManager
+# Các modules nặng (requests, psutil, colorama, sqlite3) được import lazy
+# trong từng code path để `agcheck --version` và cache-only runs khởi động nhanh
+from .timings import NULL_TIMINGS, Timings
+from .utils import (
+    WATCH_DEFAULT_INTERVAL, DAEMON_SOCKET_FILE, STATS_DEFAULT_DAYS,
+    EXPORTER_DEFAULT_LISTEN, EXPORTER_REFRESH_INTERVAL,
+    SWR_MAX_AGE_SECONDS, SWR_REFRESH_MARKER, SWR_REFRESH_MIN_INTERVAL, ensure_cache_dir, supports_color,
+)
 
 
 def parse_args():
@@ -22,12 +28,65 @@ Examples:
   agcheck              Kiểm tra quota (default)
   agcheck --verbose    Hiển thị debug logs
   agcheck --no-cache   Không sử dụng cache
+  agcheck --watch 10   Live mode, refresh mỗi 10 giây
+  agcheck --json       Một JSON document compact (cho scripts)
+  agcheck --ndjson     Mỗi model một dòng JSON (--watch: mỗi snapshot một dòng)
+  agcheck daemon       Chạy daemon, các lần gọi agcheck sau query qua socket
+  agcheck --swr        In cache ngay nếu còn mới, refresh ở background
+  agcheck stats --model claude   Heat map, p95 daily consumption, top hours
+  agcheck stats --export history.csv
+  agcheck exporter --listen 127.0.0.1:9877   Prometheus /metrics
   
 Author: ntd237 (ntd237.work@gmail.com)
 GitHub: https://github.com/ntd237/antigravity_usage_checker_07012026
         """
     )
     
+    parser.add_argument(
+        'command',
+        nargs='?',
+        choices=['check', 'daemon', 'refresh', 'stats', 'exporter'],
+        default='check',
+        help='check: kiểm tra quota (default), daemon: chạy local quota daemon, '
+             'refresh: fetch và ghi cache, không in gì, stats: analytics trên quota history, '
+             'exporter: serve Prometheus /metrics'
+    )
+    
+    parser.add_argument(
+        '--listen',
+        default=EXPORTER_DEFAULT_LISTEN,
+        metavar='HOST:PORT',
+        help=f'exporter: địa chỉ serve /metrics (default: {EXPORTER_DEFAULT_LISTEN})'
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=EXPORTER_REFRESH_INTERVAL,
+        metavar='SECONDS',
+        help=f'exporter: refresh quota mỗi SECONDS, độc lập với scrape interval (default: {EXPORTER_REFRESH_INTERVAL})'
+    )
+    
+    parser.add_argument(
+        '--days',
+        type=float,
+        default=STATS_DEFAULT_DAYS,
+        help=f'stats: khoảng history tính bằng ngày (default: {STATS_DEFAULT_DAYS})'
+    )
+    
+    parser.add_argument(
+        '--model',
+        default=None,
+        help='stats: chỉ xét pools có model chứa chuỗi này khi xếp hạng giờ (e.g. claude)'
+    )
+    
+    parser.add_argument(
+        '--export',
+        default=None,
+        metavar='FILE',
+        help='stats: export history ra FILE (.csv hoặc .parquet) thay vì in report'
+    )
+    
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
@@ -37,7 +96,73 @@ GitHub: https://github.com/ntd237/antigravity_usage_checker_07012026
     parser.add_argument(
         '--no-cache',
         action='store_true',
-        help='Không sử dụng cached data, luôn fetch từ server'
+        help='Không sử dụng cached data (quota và discovery), luôn scan và fetch từ server'
+    )
+    
+    parser.add_argument(
+        '--no-daemon',
+        action='store_true',
+        help='Không query daemon, luôn detect và fetch trong process'
+    )
+    
+    parser.add_argument(
+        '--hedge',
+        action='store_true',
+        help='Chạy các phương pháp detect server song song (lệch nhau một chút), '
+             'kết quả đầu tiên trả lời API được dùng'
+    )
+    
+    parser.add_argument(
+        '--mock-fallback',
+        action='store_true',
+        help='Hiển thị mock data nếu không fetch được từ server (chỉ dùng khi dev/test)'
+    )
+    
+    parser.add_argument(
+        '--swr',
+        nargs='?',
+        type=float,
+        const=SWR_MAX_AGE_SECONDS,
+        default=None,
+        metavar='MAX_AGE',
+        help=f'Stale-while-revalidate: nếu cache mới hơn MAX_AGE giây (default: {SWR_MAX_AGE_SECONDS}) '
+             'thì in ngay rồi refresh cache ở background'
+    )
+    
+    parser.add_argument(
+        '--watch', '-w',
+        nargs='?',
+        type=float,
+        const=WATCH_DEFAULT_INTERVAL,
+        default=None,
+        metavar='SECONDS',
+        help=f'Live mode: giữ kết nối và refresh định kỳ (default: {WATCH_DEFAULT_INTERVAL}s)'
+    )
+    
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument(
+        '--json',
+        dest='output',
+        action='store_const',
+        const='json',
+        default=None,
+        help='In một JSON document compact ra stdout (không màu, không progress messages)'
+    )
+    output.add_argument(
+        '--ndjson',
+        dest='output',
+        action='store_const',
+        const='ndjson',
+        help='In mỗi model một dòng JSON; với --watch mỗi snapshot một dòng'
+    )
+    
+    parser.add_argument(
+        '--timings',
+        nargs='?',
+        const='table',
+        default=None,
+        choices=['table', 'json'],
+        help='In thời gian từng phase (detect, fetch, parse, render) ra stderr dạng table hoặc json'
     )
     
     parser.add_argument(
@@ -46,69 +171,378 @@ GitHub: https://github.com/ntd237/antigravity_usage_checker_07012026
         version='agcheck 1.0.0'
     )
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.watch is not None and args.watch <= 0:
+        parser.error("--watch interval phải > 0")
+    if args.days <= 0:
+        parser.error("--days phải > 0")
+    if args.interval <= 0:
+        parser.error("--interval phải > 0")
+    return args
+
+
+def run_watch(client, render, cache_mgr: "CacheManager",
+              estimator: "BurnRateEstimator", interval: float, use_cache: bool) -> int:
+    """
+    Watch mode: giữ client (và connection) sống, fetch lại mỗi interval giây
+    
+    Args:
+        client: ServerWatcher (detect lại khi IDE reload) hoặc client bất kỳ có fetch_quota()
+        render: Callable(quota_data) - QuotaFormatter.redraw (chỉ vẽ lại rows thay đổi)
+            hoặc một JSON line mỗi snapshot
+    """
+    try:
+        while True:
+            quota_data = client.fetch_quota(fallback_to_mock=False)
+            if quota_data:
+                estimator.update(quota_data)
+                render(quota_data)
+                if use_cache:
+                    cache_mgr.save(quota_data)
+                    estimator.save()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        client.close()
+
+
+def refresh_cache(args) -> int:
+    """
+    Detect + fetch + ghi cache mà không in gì (dùng cho background refresh)
+    
+    Nếu process khác đang refresh (giữ refresh lock) thì thoát ngay - cache
+    sắp được ghi mới.
+    """
+    from .cache_manager import CacheManager
+    
+    cache_mgr = CacheManager()
+    with cache_mgr.refresh_lock(timeout=0) as contended:
+        if contended:
+            return 0
+        
+        from .port_detector import PortDetector
+        from .api_client import create_client
+        from .forecast import BurnRateEstimator
+        
+        servers = PortDetector(verbose=args.verbose).detect_all()
+        if not servers:
+            return 1
+        
+        client = create_client(servers, verbose=args.verbose)
+        try:
+            quota_data = client.fetch_quota(fallback_to_mock=False)
+        finally:
+            client.close()
+        if not quota_data:
+            return 1
+        
+        estimator = BurnRateEstimator().load()
+        estimator.update(quota_data)
+        estimator.save()
+        cache_mgr.save(quota_data)
+    return 0
+
+
+def spawn_background_refresh():
+    """
+    Chạy `agcheck refresh` trong một process tách rời để lần gọi sau có cache mới
+    
+    Bỏ qua nếu vừa có refresh được spawn gần đây (tránh stampede khi nhiều
+    status bars gọi cùng lúc).
+    """
+    try:
+        if time.time() - os.path.getmtime(SWR_REFRESH_MARKER) < SWR_REFRESH_MIN_INTERVAL:
+            return
+    except OSError:
+        pass
+    
+    try:
+        ensure_cache_dir()
+        with open(SWR_REFRESH_MARKER, 'w'):
+            pass
+        
+        if sys.platform == 'win32':
+            detach = {'creationflags': subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            detach = {'start_new_session': True}
+        
+        subprocess.Popen(
+            [sys.executable, '-m', 'src.cli', 'refresh'],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            close_fds=True,
+            **detach
+        )
+    except OSError:
+        # Không spawn được thì lần sau sẽ fetch bình thường
+        pass
+
+
+def run_daemon(args) -> int:
+    """Chạy local quota daemon cho đến khi Ctrl+C"""
+    from .daemon import QuotaDaemon, is_supported
+    from .service import QuotaService
+    
+    status = _status_printer(machine=False)
+    if not is_supported():
+        status("RED", "❌ Daemon cần Unix domain sockets (không hỗ trợ trên platform này)")
+        return 1
+    
+    daemon = QuotaDaemon(QuotaService(verbose=args.verbose))
+    status("CYAN", f"🛰️  agcheck daemon listening on {DAEMON_SOCKET_FILE}")
+    try:
+        daemon.serve_forever()
+    except RuntimeError as e:
+        status("RED", f"❌ {e}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run_exporter(args) -> int:
+    """Serve Prometheus /metrics cho đến khi Ctrl+C"""
+    from .exporter import QuotaExporter, parse_listen
+    
+    status = _status_printer(machine=False)
+    try:
+        host, port = parse_listen(args.listen)
+    except ValueError:
+        status("RED", f"❌ --listen không hợp lệ: {args.listen} (cần HOST:PORT)")
+        return 1
+    
+    exporter = QuotaExporter(host, port, interval=args.interval, verbose=args.verbose)
+    status("CYAN", f"📈 agcheck exporter serving http://{host}:{port}/metrics (refresh mỗi {args.interval:g}s)")
+    try:
+        exporter.serve_forever()
+    except OSError as e:
+        status("RED", f"❌ {e}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run_stats(args) -> int:
+    """agcheck stats: report analytics hoặc export history"""
+    from .history_store import HistoryStore
+    from . import stats
+    
+    status = _status_printer(machine=False)
+    store = HistoryStore()
+    try:
+        if args.export:
+            rows = stats.export_history(store, args.export, time.time() - args.days * 86400)
+            status("GREEN", f"✅ Exported {rows} rows to {args.export}")
+        else:
+            stats.print_report(stats.QuotaStats(store, days=args.days), model_filter=args.model)
+    except RuntimeError as e:
+        status("RED", f"❌ {e}")
+        return 1
+    finally:
+        store.close()
+    return 0
+
+
+def _status_printer(machine: bool):
+    """
+    print() cho progress messages: no-op khi output là JSON, không màu khi stdout
+    không phải TTY hoặc NO_COLOR (cả hai trường hợp không load colorama)
+    """
+    if machine:
+        return lambda color, message: None
+    if not supports_color(sys.stdout):
+        return lambda color, message: print(message)
+    from colorama import Fore, Style, just_fix_windows_console
+    just_fix_windows_console()
+    return lambda color, message: print(f"{getattr(Fore, color)}{message}{Style.RESET_ALL}")
+
+
+def _quota_renderer(args):
+    """
+    Callable(quota_data, source, cache_age=None) in một snapshot
+    
+    --json/--ndjson ghi thẳng ra stdout qua json_output; mặc định là QuotaFormatter.
+    """
+    if args.output:
+        from . import json_output
+        write = json_output.write_json if args.output == 'json' else json_output.write_ndjson
+        return lambda quota_data, source, cache_age=None: write(quota_data, source)
+    
+    from .formatter import QuotaFormatter
+    formatter = QuotaFormatter()
+    return lambda quota_data, source, cache_age=None: formatter.format_and_print(
+        quota_data, source == 'cache', cache_age
+    )
 
 
 def main():
     """Main entry point"""
     args = parse_args()
     
+    if args.command == 'daemon':
+        return run_daemon(args)
+    if args.command == 'refresh':
+        return refresh_cache(args)
+    if args.command == 'stats':
+        return run_stats(args)
+    if args.command == 'exporter':
+        return run_exporter(args)
+    
+    timings = Timings() if args.timings else NULL_TIMINGS
+    try:
+        return run_check(args, timings)
+    finally:
+        if args.timings:
+            timings.report(args.timings)
+
+
+def _fetch_or_join_refresh(client, cache_mgr, estimator, args, timings):
+    """
+    Fetch và ghi cache dưới refresh lock
+    
+    Nếu process khác đang refresh (nhiều panes chạy agcheck cùng lúc) thì đợi
+    nó xong và dùng snapshot nó vừa ghi thay vì fetch thêm một lần.
+    
+    Returns:
+        (quota_data, source) - source là 'live' hoặc 'cache'
+    """
+    started = time.time()
+    with cache_mgr.refresh_lock() as contended:
+        if contended:
+            quota_data = cache_mgr.load()
+            if quota_data and quota_data.timestamp >= started:
+                estimator.forecast(quota_data)
+                return quota_data, 'cache'
+        
+        with timings.span("fetch"):
+            quota_data = client.fetch_quota(fallback_to_mock=args.mock_fallback)
+        
+        # Save to cache (nếu fetch thành công)
+        if quota_data:
+            with timings.span("cache.save"):
+                estimator.update(quota_data)
+                estimator.save()
+                cache_mgr.save(quota_data)
+    return quota_data, 'live'
+
+
+def run_check(args, timings) -> int:
+    """agcheck check: detect + fetch + hiển thị quota"""
+    machine = args.output is not None
+    
+    # Stale-while-revalidate: một lần đọc file là có output
+    if args.swr is not None and not args.no_cache and args.watch is None:
+        from .cache_manager import CacheManager
+        with timings.span("swr.cache_load"):
+            cache_mgr = CacheManager()
+            # Cache cũ hơn --swr thì không decode, đi tiếp đường fetch bình thường
+            quota_data, _ = cache_mgr.load_with_age(max_age=args.swr)
+        if quota_data:
+            from .forecast import BurnRateEstimator
+            with timings.span("render"):
+                BurnRateEstimator().load().forecast(quota_data)
+                _quota_renderer(args)(quota_data, 'cache', cache_mgr.describe_age(quota_data.timestamp))
+            spawn_background_refresh()
+            return 0
+    
+    status = _status_printer(machine)
+    render = _quota_renderer(args)
+    
+    # Thin client: daemon đang chạy thì dùng data của daemon. Daemon tự lưu mỗi
+    # snapshot (cache.bin + history), nên ở đây không ghi cache
+    if not (args.no_daemon or args.no_cache or args.watch is not None):
+        from .daemon import query_daemon
+        with timings.span("daemon.query"):
+            quota_data = query_daemon()
+        if quota_data:
+            with timings.span("render"):
+                render(quota_data, 'daemon')
+            return 0
+    
+    with timings.span("imports"):
+        from .port_detector import PortDetector
+        from .api_client import create_client
+        from .cache_manager import CacheManager
+        from .forecast import BurnRateEstimator
+    
     # Initialize components
-    detector = PortDetector(verbose=args.verbose)
+    detector = PortDetector(verbose=args.verbose, use_cache=not args.no_cache, timings=timings, hedged=args.hedge)
     cache_mgr = CacheManager()
-    formatter = QuotaFormatter()
+    estimator = BurnRateEstimator().load()
     
     quota_data = None
-    from_cache = False
+    source = 'live'
     cache_age = None
     
     # Step 1: Scan cho Antigravity server
-    print(f"{Fore.CYAN}🔍 Scanning for Antigravity server...{Style.RESET_ALL}")
+    status("CYAN", "🔍 Scanning for Antigravity server...")
     
-    server_info = detector.detect()
+    with timings.span("detect"):
+        servers = detector.detect_all()
     
-    if server_info:
-        print(f"{Fore.GREEN}✅ Found server on port {server_info.port} (PID: {server_info.pid}){Style.RESET_ALL}")
-        
+    if servers:
+        if len(servers) == 1:
+            status("GREEN", f"✅ Found server on port {servers[0].port} (PID: {servers[0].pid})")
+        else:
+            ports = ", ".join(str(s.port) for s in servers)
+            status("GREEN", f"✅ Found {len(servers)} servers on ports {ports}")
         # Step 2: Fetch quota data
-        print(f"{Fore.CYAN}📡 Fetching quota data...{Style.RESET_ALL}")
+        status("CYAN", "📡 Fetching quota data...")
         
-        client = APIClient(
-            port=server_info.port,
-            csrf_token=server_info.csrf_token,
-            http_port=server_info.http_port,
-            verbose=args.verbose
-        )
-        
-        quota_data = client.fetch_quota()
+        if args.watch is not None:
+            if machine:
+                from functools import partial
+                from .json_output import write_json
+                watch_render = partial(write_json, source='live')
+            else:
+                from .formatter import QuotaFormatter
+                watch_render = QuotaFormatter().redraw
+            from .service import ServerWatcher
+            watcher = ServerWatcher(detector, servers, verbose=args.verbose, timings=timings)
+            return run_watch(watcher, watch_render, cache_mgr, estimator, args.watch, use_cache=not args.no_cache)
         
-        # Save to cache (nếu fetch thành công)
-        if quota_data and not args.no_cache:
-            cache_mgr.save(quota_data)
+        client = create_client(servers, verbose=args.verbose, timings=timings, persist_transport=not args.no_cache)
+        if args.no_cache:
+            with timings.span("fetch"):
+                quota_data = client.fetch_quota(fallback_to_mock=args.mock_fallback)
+        else:
+            quota_data, source = _fetch_or_join_refresh(client, cache_mgr, estimator, args, timings)
     
     else:
-        print(f"{Fore.YELLOW}⚠️  Server not found{Style.RESET_ALL}")
+        status("YELLOW", "⚠️  Server not found")
         
         # Try load từ cache nếu không có --no-cache
         if not args.no_cache:
-            print(f"{Fore.CYAN}💾 Trying to load from cache...{Style.RESET_ALL}")
-            quota_data = cache_mgr.load()
+            status("CYAN", "💾 Trying to load from cache...")
+            with timings.span("cache.load"):
+                quota_data, _ = cache_mgr.load_with_age()
             
+            if cache_mgr.last_error:
+                status("YELLOW", f"⚠️  Ignoring corrupt cache: {cache_mgr.last_error}")
             if quota_data:
-                from_cache = True
-                cache_age = cache_mgr.get_cache_age()
+                source = 'cache'
+                cache_age = cache_mgr.describe_age(quota_data.timestamp)
+                estimator.forecast(quota_data)
             else:
-                print(f"{Fore.RED}❌ No valid cache found{Style.RESET_ALL}")
+                status("RED", "❌ No valid cache found")
         else:
-            print(f"{Fore.RED}❌ Cannot proceed without server (--no-cache flag is set){Style.RESET_ALL}")
+            status("RED", "❌ Cannot proceed without server (--no-cache flag is set)")
     
     # Step 3: Display results
     if quota_data:
-        formatter.format_and_print(quota_data, from_cache, cache_age)
+        with timings.span("render"):
+            render(quota_data, source, cache_age)
         return 0
+    elif machine:
+        # stdout chỉ chứa JSON - lỗi đi stderr
+        print("agcheck: không thể lấy quota data (thử lại với --verbose)", file=sys.stderr)
+        return 1
     else:
-        print()
-        print(f"{Fore.RED}❌ Không thể lấy quota data{Style.RESET_ALL}")
+        status("RED", "\n❌ Không thể lấy quota data")
         print()
         print("Vui lòng:")
         print("  1. Đảm bảo Antigravity IDE đang chạy")
@@ -121,8 +555,10 @@ if __name__ == "__main__":
     try:
         sys.exit(main())
     except KeyboardInterrupt:
+        from colorama import Fore, Style
         print(f"\n{Fore.YELLOW}⚠️  Cancelled by user{Style.RESET_ALL}")
         sys.exit(130)
     except Exception as e:
+        from colorama import Fore, Style
         print(f"\n{Fore.RED}❌ Error: {e}{Style.RESET_ALL}")
         sys.exit(1)
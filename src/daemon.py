@@ -0,0 +1,128 @@
+"""
+Daemon Module - Serve QuotaData qua Unix domain socket (agcheck daemon)
+
+Protocol: mỗi connection gửi một dòng JSON request và nhận một dòng JSON response
+    -> {"op": "get", "max_age": 30}
+    <- {"ok": true, "data": {...QuotaData.to_dict()...}}
+    <- {"ok": false, "error": "..."}
+"""
+
+import json
+import os
+import socket
+import socketserver
+from typing import Optional
+from .api_client import QuotaData
+from .service import QuotaService
+from .utils import DAEMON_SOCKET_FILE, DAEMON_CLIENT_TIMEOUT, ensure_cache_dir
+
+
+def is_supported() -> bool:
+    """Unix domain socket server chỉ có trên POSIX"""
+    return hasattr(socketserver, "ThreadingUnixStreamServer")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Handle một query từ client"""
+    
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline() or b"{}")
+            if request.get("op", "get") != "get":
+                response = {"ok": False, "error": f"unknown op: {request.get('op')}"}
+            else:
+                quota_data = self.server.service.get(request.get("max_age"))
+                if quota_data:
+                    response = {"ok": True, "data": quota_data.to_dict()}
+                else:
+                    response = {"ok": False, "error": "server not found"}
+        except (ValueError, AttributeError, TypeError) as e:
+            response = {"ok": False, "error": f"bad request: {e}"}
+        
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class QuotaDaemon:
+    """Daemon sở hữu detection/fetching, nhiều consumers query qua socket"""
+    
+    def __init__(self, service: QuotaService, socket_path=DAEMON_SOCKET_FILE):
+        self.service = service
+        self.socket_path = str(socket_path)
+        self.server = None
+    
+    def serve_forever(self):
+        """
+        Bind socket và serve cho đến khi bị interrupt
+        
+        Raises:
+            RuntimeError: Nếu đã có daemon khác đang chạy trên socket
+        """
+        ensure_cache_dir()
+        self._remove_stale_socket()
+        
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, _RequestHandler)
+        self.server.daemon_threads = True
+        self.server.service = self.service
+        os.chmod(self.socket_path, 0o600)
+        
+        try:
+            self.server.serve_forever()
+        finally:
+            self.shutdown()
+    
+    def shutdown(self):
+        """Đóng server và xóa socket file"""
+        if self.server is not None:
+            self.server.server_close()
+            self.server = None
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+        self.service.close()
+    
+    def _remove_stale_socket(self):
+        """Xóa socket file còn sót lại nếu không có daemon nào đang listen"""
+        if not os.path.exists(self.socket_path):
+            return
+        
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.remove(self.socket_path)
+        else:
+            raise RuntimeError(f"Daemon đã chạy trên {self.socket_path}")
+        finally:
+            probe.close()
+
+
+def query_daemon(max_age: Optional[float] = None, socket_path=DAEMON_SOCKET_FILE,
+                 timeout: float = DAEMON_CLIENT_TIMEOUT) -> Optional[QuotaData]:
+    """
+    Thin client: hỏi daemon QuotaData mới nhất
+    
+    Returns:
+        QuotaData nếu daemon đang chạy và có data, None nếu không (caller tự fallback)
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(str(socket_path))
+        request = {"op": "get"}
+        if max_age is not None:
+            request["max_age"] = max_age
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        
+        with sock.makefile("rb") as f:
+            response = json.loads(f.readline())
+        if response.get("ok"):
+            return QuotaData.from_dict(response["data"])
+        return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    finally:
+        sock.close()
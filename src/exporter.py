@@ -0,0 +1,251 @@
+"""
+Exporter Module - Prometheus /metrics endpoint (agcheck exporter)
+
+Một background thread refresh QuotaService theo lịch cố định; mỗi scrape chỉ
+render snapshot trong memory, nên nhiều scrapers với interval ngắn không tạo
+thêm GetUserStatus calls.
+
+Metrics:
+    agcheck_model_{used,limit,remaining,reset_seconds}{model,pool}
+    agcheck_pool_{used,limit,remaining,reset_seconds,burn_rate_per_hour,eta_seconds}{pool}
+    agcheck_total_{used,limit}, agcheck_snapshot_timestamp_seconds, agcheck_up
+    agcheck_upstream_calls_total, agcheck_upstream_failures_total
+    agcheck_{detect,fetch}_duration_seconds (histograms)
+"""
+
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Tuple
+
+from .service import QuotaService
+from .timings import NULL_TIMINGS
+from .utils import EXPORTER_LATENCY_BUCKETS, EXPORTER_REFRESH_INTERVAL
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def parse_listen(listen: str) -> Tuple[str, int]:
+    """
+    Parse "HOST:PORT" (hoặc chỉ "PORT")
+    
+    Raises:
+        ValueError: Nếu không hợp lệ
+    """
+    host, _, port = listen.rpartition(":")
+    return host.strip("[]") or "127.0.0.1", int(port)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Prometheus histogram tối giản (cumulative buckets + sum + count)"""
+    
+    def __init__(self, name: str, help_text: str, buckets=EXPORTER_LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+    
+    def render(self) -> List[str]:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{_format_value(float(bound))}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {total!r}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+class _ObservedSpan:
+    """Span ghi duration vào histogram khi exit"""
+    __slots__ = ("_histogram", "_start")
+    
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+    
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+class HistogramTimings:
+    """
+    Timings adapter cho QuotaService: spans "detect" và "fetch" được observe
+    vào histograms, các spans khác là no-op
+    """
+    enabled = True
+    
+    def __init__(self):
+        self.histograms = {
+            "detect": Histogram("agcheck_detect_duration_seconds", "Thời gian detect language_server"),
+            "fetch": Histogram("agcheck_fetch_duration_seconds", "Thời gian một lần GetUserStatus (gồm parse)"),
+        }
+    
+    def span(self, name: str):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            return NULL_TIMINGS.span(name)
+        return _ObservedSpan(histogram)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics"""
+    
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.exporter.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        if self.server.exporter.verbose:
+            print(f"[DEBUG EXPORTER] {self.address_string()} {format % args}")
+
+
+class QuotaExporter:
+    """Serve /metrics từ snapshot của QuotaService, refresh theo lịch"""
+    
+    def __init__(self, host: str = "127.0.0.1", port: int = 9877,
+                 interval: float = EXPORTER_REFRESH_INTERVAL, verbose: bool = False):
+        self.timings = HistogramTimings()
+        self.service = QuotaService(verbose=verbose, timings=self.timings)
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.verbose = verbose
+        self.server = None
+        self._stop = threading.Event()
+    
+    def serve_forever(self):
+        """Bind, chạy refresher thread và serve cho đến khi bị interrupt"""
+        self.server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.exporter = self
+        self.port = self.server.server_address[1]
+        
+        refresher = threading.Thread(target=self._refresh_loop, name="agcheck-refresh", daemon=True)
+        refresher.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self._stop.set()
+            self.server.server_close()
+            self.service.close()
+    
+    def shutdown(self):
+        """Dừng serve_forever (gọi từ thread khác)"""
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+    
+    def _refresh_loop(self):
+        """Refresh ngay khi start, sau đó mỗi interval giây"""
+        while not self._stop.is_set():
+            try:
+                self.service.refresh()
+            except Exception as e:
+                # Refresher không được chết - scrape vẫn trả snapshot cũ + agcheck_up 0
+                if self.verbose:
+                    print(f"[DEBUG EXPORTER] refresh failed: {e}")
+            self._stop.wait(self.interval)
+    
+    def render(self) -> str:
+        """Render metrics text format từ snapshot hiện tại (không gọi upstream)"""
+        service = self.service
+        snapshot = service.snapshot
+        lines = []
+        
+        def gauge(name, help_text, samples):
+            if not samples:
+                return
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            seen = set()
+            for labels, value in samples:
+                # Label set trùng (merge nhiều accounts) làm hỏng cả scrape - giữ sample đầu
+                if labels not in seen:
+                    seen.add(labels)
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+        
+        def counter(name, help_text, value):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {value}")
+        
+        gauge("agcheck_up", "1 nếu lần refresh gần nhất thành công", [("", 1 if service.last_success else 0)])
+        counter("agcheck_upstream_calls_total", "Số GetUserStatus calls", service.upstream_calls)
+        counter("agcheck_upstream_failures_total", "Số GetUserStatus calls thất bại", service.failed_calls)
+        
+        if snapshot:
+            # reset_time là số giây còn lại tại thời điểm snapshot
+            elapsed = max(0.0, time.time() - snapshot.timestamp)
+            
+            def reset_in(reset_time):
+                return max(0, int(reset_time - elapsed))
+            
+            gauge("agcheck_snapshot_timestamp_seconds", "Thời điểm fetch snapshot",
+                  [("", snapshot.timestamp)])
+            
+            models = [
+                (f'{{model="{_escape_label(m.model_name)}",pool="{_escape_label(pool.key)}"}}', m)
+                for pool in snapshot.pools for m in pool.models
+            ]
+            gauge("agcheck_model_used", "Quota đã dùng của model", [(l, m.used) for l, m in models])
+            gauge("agcheck_model_limit", "Quota limit của model", [(l, m.limit) for l, m in models])
+            gauge("agcheck_model_remaining", "Quota còn lại của model", [(l, m.remaining) for l, m in models])
+            gauge("agcheck_model_reset_seconds", "Số giây đến khi quota của model reset",
+                  [(l, reset_in(m.reset_time)) for l, m in models])
+            
+            pools = [(f'{{pool="{_escape_label(p.key)}"}}', p) for p in snapshot.pools]
+            gauge("agcheck_pool_used", "Quota đã dùng của pool", [(l, p.used) for l, p in pools])
+            gauge("agcheck_pool_limit", "Quota limit của pool", [(l, p.limit) for l, p in pools])
+            gauge("agcheck_pool_remaining", "Quota còn lại của pool", [(l, p.remaining) for l, p in pools])
+            gauge("agcheck_pool_reset_seconds", "Số giây đến khi pool reset",
+                  [(l, reset_in(p.reset_time)) for l, p in pools])
+            
+            forecasts = [(l, snapshot.forecasts[p.key]) for l, p in pools if p.key in snapshot.forecasts]
+            gauge("agcheck_pool_burn_rate_per_hour", "Burn rate (EWMA) của pool, quota units/giờ",
+                  [(l, f.burn_rate) for l, f in forecasts])
+            gauge("agcheck_pool_eta_seconds", "Dự báo số giây đến khi pool hết quota",
+                  [(l, max(0, int(f.eta_seconds - elapsed))) for l, f in forecasts if f.eta_seconds is not None])
+            
+            gauge("agcheck_total_used", "Tổng quota đã dùng (shared pools tính một lần)",
+                  [("", snapshot.total_used)])
+            gauge("agcheck_total_limit", "Tổng quota limit (shared pools tính một lần)",
+                  [("", snapshot.total_limit)])
+        
+        for histogram in self.timings.histograms.values():
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
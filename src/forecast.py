@@ -0,0 +1,114 @@
+"""
+Forecast Module - Burn rate (EWMA) và dự báo thời điểm hết quota cho từng pool
+
+Mỗi pool chỉ giữ state (timestamp, used, rate) của sample cuối, nên update
+là O(1) mỗi sample và không cần đọc lại history.
+"""
+
+import json
+from typing import Dict, Optional
+from .api_client import QuotaData, PoolForecast
+from .utils import (
+    FORECAST_STATE_FILE, FORECAST_HALF_LIFE_SECONDS, FORECAST_MIN_INTERVAL_SECONDS,
+    FORECAST_STATE_MAX_AGE_SECONDS, ensure_cache_dir, write_atomic,
+)
+
+
+class BurnRateEstimator:
+    """
+    EWMA burn rate theo thời gian thực cho mỗi quota pool
+    
+    Sampling không đều (CLI chạy lúc có lúc không) nên hệ số làm mượt tính theo
+    khoảng cách giữa hai samples: alpha = 1 - 0.5 ** (dt / half_life).
+    """
+    
+    def __init__(self, path=FORECAST_STATE_FILE, half_life: float = FORECAST_HALF_LIFE_SECONDS):
+        self.path = path
+        self.half_life = half_life
+        self.state: Dict[str, Dict] = {}  # pool key -> {"ts", "used", "rate"}
+    
+    def load(self) -> "BurnRateEstimator":
+        """Load state từ disk (state hỏng/không có thì bắt đầu lại)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if isinstance(state, dict):
+                self.state = state
+        except (OSError, ValueError):
+            self.state = {}
+        return self
+    
+    def save(self):
+        """Ghi state ra disk (atomic: file tạm + fsync + rename, không bao giờ để lại file dở)"""
+        try:
+            ensure_cache_dir()
+            write_atomic(self.path, json.dumps(self.state).encode('utf-8'))
+        except OSError:
+            pass
+    
+    def update(self, quota_data: QuotaData) -> Dict[str, PoolForecast]:
+        """
+        Đưa snapshot mới vào estimator và gắn forecasts vào quota_data
+        
+        Args:
+            quota_data: Snapshot mới nhất
+            
+        Returns:
+            Dict pool key -> PoolForecast
+        """
+        ts = quota_data.timestamp
+        for pool in quota_data.pools:
+            entry = self.state.get(pool.key)
+            if entry is None:
+                self.state[pool.key] = {"ts": ts, "used": pool.used, "rate": None}
+                continue
+            
+            dt = ts - entry["ts"]
+            if dt < FORECAST_MIN_INTERVAL_SECONDS:
+                continue
+            
+            if pool.used >= entry["used"]:
+                sample_rate = (pool.used - entry["used"]) / dt * 3600
+                if entry["rate"] is None:
+                    entry["rate"] = sample_rate
+                else:
+                    alpha = 1 - 0.5 ** (dt / self.half_life)
+                    entry["rate"] += alpha * (sample_rate - entry["rate"])
+            # used giảm = quota vừa reset: giữ rate cũ, chỉ dời mốc
+            
+            entry["ts"] = ts
+            entry["used"] = pool.used
+        
+        # Bỏ state của pools đã biến mất (đổi membership, model bị gỡ...)
+        for key in [k for k, e in self.state.items() if ts - e["ts"] > FORECAST_STATE_MAX_AGE_SECONDS]:
+            del self.state[key]
+        
+        return self.forecast(quota_data)
+    
+    def forecast(self, quota_data: QuotaData) -> Dict[str, PoolForecast]:
+        """
+        Tính forecasts từ state hiện tại mà không update (dùng cho cached data)
+        
+        Returns:
+            Dict pool key -> PoolForecast (chỉ pools đã có burn rate)
+        """
+        forecasts = {}
+        for pool in quota_data.pools:
+            entry = self.state.get(pool.key)
+            if not entry or entry["rate"] is None:
+                continue
+            forecasts[pool.key] = PoolForecast(
+                burn_rate=entry["rate"],
+                eta_seconds=self._eta_seconds(pool.remaining, entry["rate"]),
+                reset_time=pool.reset_time
+            )
+        
+        quota_data.forecasts = forecasts
+        return forecasts
+    
+    @staticmethod
+    def _eta_seconds(remaining: int, rate_per_hour: float) -> Optional[int]:
+        """Số giây đến khi remaining về 0 với rate hiện tại"""
+        if rate_per_hour <= 1e-9:
+            return None
+        return int(remaining / rate_per_hour * 3600)
@@ -2,62 +2,171 @@
 Formatter Module - Format và display quota data với colors & progress bars
 """
 
-from colorama import Fore, Back, Style, init
-from .api_client import QuotaData, QuotaModel
-from .utils import format_time_remaining
+import sys
+from typing import List, NamedTuple, Optional
+from .api_client import QuotaData, QuotaModel, PoolForecast
+from .utils import format_time_remaining, supports_color
 
-# Initialize colorama cho cross-platform color support
-init(autoreset=True)
+
+class _Palette(NamedTuple):
+    """ANSI codes dùng khi render (toàn chuỗi rỗng khi không có màu)"""
+    green: str = ""
+    yellow: str = ""
+    red: str = ""
+    cyan: str = ""
+    reset: str = ""
+    bright: str = ""
+
+
+_NO_COLOR = _Palette()
+_ansi_palette: Optional[_Palette] = None
+
+
+def _color_palette() -> _Palette:
+    """Import colorama và bật ANSI trên Windows console một lần duy nhất"""
+    global _ansi_palette
+    if _ansi_palette is None:
+        from colorama import Fore, Style, just_fix_windows_console
+        just_fix_windows_console()
+        _ansi_palette = _Palette(Fore.GREEN, Fore.YELLOW, Fore.RED, Fore.CYAN, Style.RESET_ALL, Style.BRIGHT)
+    return _ansi_palette
+
+
+def palette_for(stream) -> _Palette:
+    """Palette cho stream: ANSI khi là TTY và NO_COLOR không được set, ngược lại chuỗi rỗng"""
+    return _color_palette() if supports_color(stream) else _NO_COLOR
 
 
 class QuotaFormatter:
     """Formatter để display quota data đẹp mắt"""
     
-    def __init__(self):
+    MIN_NAME_WIDTH = len("Model")
+    
+    def __init__(self, stream=None, color: Optional[bool] = None):
+        """
+        Args:
+            stream: Output stream (default: sys.stdout tại thời điểm write)
+            color: Bật/tắt ANSI colors (default: chỉ khi stream là TTY và NO_COLOR không được set)
+        """
         # Unicode characters cho progress bar
         self.filled_char = "█"
         self.empty_char = "░"
         self.bar_length = 10
+        
+        self.stream = stream
+        if color is None:
+            color = supports_color(self._out())
+        # Không màu thì không load colorama, không wrap stdout
+        self.palette = _color_palette() if color else _NO_COLOR
+        
+        # Watch mode: rows đã vẽ lần trước để chỉ redraw phần thay đổi
+        self._drawn_rows: Optional[List[str]] = None
+        self._drawn_total: Optional[str] = None
+        self._drawn_width: Optional[int] = None
+    
+    def _out(self):
+        return self.stream if self.stream is not None else sys.stdout
+    
+    def _write(self, text: str):
+        out = self._out()
+        out.write(text)
+        out.flush()
     
     def format_and_print(self, quota_data: QuotaData, from_cache: bool = False, cache_age: str = None):
         """
-        Format và print quota data
+        Format và print quota data (render cả table vào một buffer, một lần write)
         
         Args:
             quota_data: QuotaData object
             from_cache: Có phải từ cache không
             cache_age: Cache age string nếu from_cache
         """
-        print()
-        print(f"{Fore.CYAN}🚀 Antigravity Usage Monitor{Style.RESET_ALL}")
+        p = self.palette
+        width = self._name_width(quota_data)
+        lines = ["", f"{p.cyan}🚀 Antigravity Usage Monitor{p.reset}"]
         
         if from_cache and cache_age:
-            print(f"{Fore.YELLOW}⚠️  Using cached data from {cache_age}{Style.RESET_ALL}")
+            lines.append(f"{p.yellow}⚠️  Using cached data from {cache_age}{p.reset}")
         
-        # Separator và header với fixed width
-        separator = "─" * 90
-        print(separator)
+        # Cột model name rộng bằng tên dài nhất, các cột còn lại cố định 60 chars
+        separator = "─" * (width + 60)
+        lines.append(separator)
+        lines.append(
+            f"{'Model':<{width}}  {'Used':>4}  {'Limit':>5}  {'Left':>4}   {'Progress':<10}      {'Reset':>6}  {'ETA':>7}"
+        )
+        lines.append(separator)
+        
+        rows = self._format_rows(quota_data, width)
+        lines.extend(rows)
+        lines.append(separator)
         
-        # Header với căn chỉnh fixed - 30 chars cho model name
-        print(f"{'Model':<30}  {'Used':>4}  {'Limit':>5}  {'Left':>4}   {'Progress':<10}      {'Reset':>6}")
-        print(separator)
+        total = self._format_total(quota_data)
+        lines.append(total)
+        lines.append(separator)
+        lines.append("")
         
-        # Print từng model
-        for model in quota_data.models:
-            self._print_model_row(model)
+        self._write("\n".join(lines) + "\n")
         
-        print(separator)
+        self._drawn_rows = rows
+        self._drawn_total = total
+        self._drawn_width = width
+    
+    def redraw(self, quota_data: QuotaData):
+        """
+        Watch mode: lần đầu print full table, các lần sau chỉ viết lại
+        các rows có used/remaining/reset thay đổi bằng cursor positioning
         
-        # Total
-        self._print_total(quota_data)
+        Nếu số models hoặc độ rộng cột model thay đổi thì print lại full table. Khi stdout không phải
+        TTY thì không dùng cursor codes, chỉ print full table khi có thay đổi.
         
-        print(separator)
-        print()
+        Args:
+            quota_data: QuotaData mới nhất
+        """
+        width = self._name_width(quota_data)
+        rows = self._format_rows(quota_data, width)
+        total = self._format_total(quota_data)
+        
+        if rows == self._drawn_rows and total == self._drawn_total:
+            return
+        
+        if (self._drawn_rows is None or len(rows) != len(self._drawn_rows)
+                or width != self._drawn_width or not self._out().isatty()):
+            self.format_and_print(quota_data)
+            return
+        
+        # Cursor đang ở dòng ngay dưới table: blank, separator, total, separator, rows...
+        updates = []
+        for i, row in enumerate(rows):
+            if row != self._drawn_rows[i]:
+                updates.append((5 + len(rows) - 1 - i, row))
+        if total != self._drawn_total:
+            updates.append((3, total))
+        
+        self._write("".join(f"\x1b[{up}A\r{line}\x1b[K\x1b[{up}B\r" for up, line in updates))
+        
+        self._drawn_rows = rows
+        self._drawn_total = total
     
-    def _print_model_row(self, model: QuotaModel):
-        """Print một row cho model"""
-        # Hiển thị full model name với fixed width 30 chars
-        display_name = model.model_name[:30] if len(model.model_name) > 30 else model.model_name
+    def _name_width(self, quota_data: QuotaData) -> int:
+        """Độ rộng cột model name = tên dài nhất"""
+        return max([self.MIN_NAME_WIDTH] + [len(m.model_name) for m in quota_data.models])
+    
+    def _format_rows(self, quota_data: QuotaData, width: int) -> List[str]:
+        """Format rows cho tất cả models"""
+        # Map model -> forecast một lần thay vì forecast_for() quét pools cho từng row
+        forecasts = {}
+        for pool in quota_data.pools:
+            forecast = quota_data.forecasts.get(pool.key)
+            for model in pool.models:
+                forecasts[id(model)] = forecast
+        return [
+            self._format_model_row(model, width, forecasts.get(id(model)))
+            for model in quota_data.models
+        ]
+    
+    def _format_model_row(self, model: QuotaModel, width: int, forecast: Optional[PoolForecast] = None) -> str:
+        """Format một row cho model"""
+        p = self.palette
         
         # Progress bar
         progress_bar = self._create_progress_bar(model.percentage_used)
@@ -69,14 +178,22 @@ class QuotaFormatter:
         # Reset time
         reset_str = format_time_remaining(model.reset_time)
         
+        # ETA hết quota theo burn rate - đỏ nếu hết trước khi reset
+        eta_str, eta_color = "—", ""
+        if forecast and forecast.eta_seconds is not None:
+            eta_str = format_time_remaining(forecast.eta_seconds)
+            if forecast.exhausts_before_reset:
+                eta_color = p.red
+        
         # Format row với fixed column widths - căn chỉnh đều
-        print(
-            f"{display_name:<30}  "
-            f"{color}{model.used:>4}{Style.RESET_ALL}  "
+        return (
+            f"{model.model_name:<{width}}  "
+            f"{color}{model.used:>4}{p.reset}  "
             f"{model.limit:>5}  "
-            f"{color}{model.remaining:>4}{Style.RESET_ALL}   "
-            f"{color}{progress_bar:<10}{Style.RESET_ALL} {color}{model.percentage_used:>3}%{Style.RESET_ALL}  "
-            f"{reset_str:>6}"
+            f"{color}{model.remaining:>4}{p.reset}   "
+            f"{color}{progress_bar:<10}{p.reset} {color}{model.percentage_used:>3}%{p.reset}  "
+            f"{reset_str:>6}  "
+            f"{eta_color}{eta_str:>7}{p.reset}"
         )
     
     def _create_progress_bar(self, percentage: int) -> str:
@@ -103,25 +220,26 @@ class QuotaFormatter:
             remaining_pct: % còn lại (0-100)
             
         Returns:
-            Colorama color code
+            ANSI color code ("" khi không có màu)
         """
         if remaining_pct > 50:
-            return Fore.GREEN
+            return self.palette.green
         elif remaining_pct > 20:
-            return Fore.YELLOW
+            return self.palette.yellow
         else:
-            return Fore.RED
+            return self.palette.red
     
-    def _print_total(self, quota_data: QuotaData):
-        """Print total row"""
+    def _format_total(self, quota_data: QuotaData) -> str:
+        """Format total row"""
         total_remaining_pct = 0
         if quota_data.total_limit > 0:
             total_remaining_pct = int((quota_data.total_limit - quota_data.total_used) / quota_data.total_limit * 100)
         
         color = self._get_color_for_percentage(total_remaining_pct)
+        p = self.palette
         
-        print(
-            f"{Fore.CYAN}📊 Total:{Style.RESET_ALL} "
+        return (
+            f"{p.cyan}📊 Total:{p.reset} "
             f"{color}{quota_data.total_used}/{quota_data.total_limit} used "
-            f"({total_remaining_pct}% remaining){Style.RESET_ALL}"
+            f"({total_remaining_pct}% remaining){p.reset}"
         )
@@ -0,0 +1,241 @@
+"""
+History Store Module - Lưu lịch sử QuotaData snapshots (SQLite, WAL mode)
+
+Mỗi snapshot được append thành các rows raw (một row / model). Rows cũ được
+downsample dần: raw -> hourly -> daily, rồi bị xóa sau retention cuối cùng,
+nên file không phình ra sau nhiều tháng polling mỗi phút.
+
+Mỗi row có cột `consumed` = lượng quota đã dùng kể từ sample trước của cùng model
+(tính lúc append), nên rollups chỉ cần SUM và analytics không phải scan lại raw.
+CLI (sau live fetch) và daemon/exporter (QuotaService._fetch) cùng append vào một
+DB qua CacheManager.save(), nên used trước đó được đọc từ DB trong chính write
+transaction (BEGIN IMMEDIATE), không cache trong process.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+from .api_client import QuotaData, QuotaModel
+from .utils import (
+    HISTORY_DB_FILE, HISTORY_RAW_RETENTION_DAYS, HISTORY_HOURLY_RETENTION_DAYS,
+    HISTORY_DAILY_RETENTION_DAYS, HISTORY_COMPACT_INTERVAL, ensure_cache_dir,
+)
+
+RESOLUTION_RAW = 0
+RESOLUTION_HOURLY = 3600
+RESOLUTION_DAILY = 86400
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    last_used INTEGER
+);
+CREATE TABLE IF NOT EXISTS samples (
+    resolution INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    model_id INTEGER NOT NULL,
+    used INTEGER NOT NULL,
+    quota_limit INTEGER NOT NULL,
+    remaining INTEGER NOT NULL,
+    reset_time INTEGER NOT NULL,
+    is_shared_pool INTEGER NOT NULL,
+    consumed INTEGER NOT NULL,
+    samples INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS samples_by_time ON samples (resolution, ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL
+);
+"""
+
+_SAMPLE_COLUMNS = "ts, name, used, quota_limit, remaining, reset_time, is_shared_pool"
+
+
+class HistoryStore:
+    """Append-only store cho quota snapshots với time-range lookup và rollups"""
+    
+    def __init__(self, path=HISTORY_DB_FILE,
+                 raw_retention_days: float = HISTORY_RAW_RETENTION_DAYS,
+                 hourly_retention_days: float = HISTORY_HOURLY_RETENTION_DAYS,
+                 daily_retention_days: float = HISTORY_DAILY_RETENTION_DAYS,
+                 compact_interval: float = HISTORY_COMPACT_INTERVAL):
+        self.path = str(path)
+        self.retention = {
+            RESOLUTION_RAW: raw_retention_days * 86400,
+            RESOLUTION_HOURLY: hourly_retention_days * 86400,
+            RESOLUTION_DAILY: daily_retention_days * 86400,
+        }
+        self.compact_interval = compact_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._last_compaction = 0.0
+        # Daemon/exporter append từ request handler threads khác nhau
+        self._write_lock = threading.Lock()
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Lazy connect (chỉ mở DB khi thực sự cần), dùng được từ mọi thread"""
+        if self._conn is None:
+            ensure_cache_dir()
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            row = conn.execute("SELECT value FROM meta WHERE key = 'last_compaction'").fetchone()
+            self._last_compaction = row[0] if row else 0.0
+            self._conn = conn
+        return self._conn
+    
+    def close(self):
+        """Đóng connection"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def append(self, quota_data: QuotaData):
+        """
+        Append một snapshot - O(số models), không phụ thuộc kích thước history
+        
+        Downsample chạy tối đa một lần mỗi compact_interval (amortized).
+        """
+        with self._write_lock:
+            self._append(quota_data)
+    
+    def _append(self, quota_data: QuotaData):
+        conn = self.conn
+        with conn:
+            # Lấy write lock trước khi đọc last_used: process khác append cùng lúc
+            # phải đợi, nên consumed không bị tính trùng hoặc bỏ sót
+            conn.execute("BEGIN IMMEDIATE")
+            for m in quota_data.models:
+                model_id, last_used = self._model_entry(m.model_name)
+                if last_used is None:
+                    consumed = 0
+                elif m.used >= last_used:
+                    consumed = m.used - last_used
+                else:
+                    # used giảm = quota đã reset, phần dùng sau reset là used hiện tại
+                    consumed = m.used
+                
+                conn.execute(
+                    "INSERT INTO samples (resolution, ts, model_id, used, quota_limit, remaining,"
+                    " reset_time, is_shared_pool, consumed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (RESOLUTION_RAW, quota_data.timestamp, model_id, m.used, m.limit, m.remaining,
+                     m.reset_time, int(m.is_shared_pool), consumed)
+                )
+                conn.execute("UPDATE models SET last_used = ? WHERE id = ?", (m.used, model_id))
+        
+        if quota_data.timestamp - self._last_compaction >= self.compact_interval:
+            self.compact(now=quota_data.timestamp)
+    
+    def _model_entry(self, name: str) -> Tuple[int, Optional[int]]:
+        """(id, last_used) của model đọc từ DB, tạo mới nếu chưa có (gọi trong write transaction)"""
+        row = self.conn.execute("SELECT id, last_used FROM models WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            cursor = self.conn.execute("INSERT INTO models (name) VALUES (?)", (name,))
+            return cursor.lastrowid, None
+        return row
+    
+    def latest(self) -> Optional[QuotaData]:
+        """Snapshot mới nhất (index lookup từ cuối, không scan history)"""
+        row = self.conn.execute(
+            "SELECT MAX(ts) FROM samples WHERE resolution = ?", (RESOLUTION_RAW,)
+        ).fetchone()
+        if not row or row[0] is None:
+            return None
+        snapshots = list(self.query(row[0], row[0]))
+        return snapshots[-1] if snapshots else None
+    
+    def query(self, start: float, end: Optional[float] = None,
+              resolution: int = RESOLUTION_RAW) -> Iterator[QuotaData]:
+        """
+        Lấy các snapshots trong khoảng [start, end] theo thứ tự thời gian
+        
+        Args:
+            start: Unix timestamp bắt đầu
+            end: Unix timestamp kết thúc (default: now)
+            resolution: RESOLUTION_RAW, RESOLUTION_HOURLY hoặc RESOLUTION_DAILY
+            
+        Yields:
+            QuotaData cho từng timestamp (rollup bucket nếu resolution > 0)
+        """
+        if end is None:
+            end = time.time()
+        
+        cursor = self.conn.execute(
+            f"SELECT {_SAMPLE_COLUMNS} FROM samples JOIN models ON models.id = samples.model_id"
+            " WHERE resolution = ? AND ts BETWEEN ? AND ? ORDER BY ts, samples.rowid",
+            (resolution, start, end)
+        )
+        
+        current_ts = None
+        models = []
+        for ts, name, used, limit, remaining, reset_time, is_shared in cursor:
+            if ts != current_ts and models:
+                yield QuotaData(models=models, timestamp=current_ts)
+                models = []
+            current_ts = ts
+            models.append(QuotaModel(name, used, limit, remaining, reset_time, bool(is_shared)))
+        if models:
+            yield QuotaData(models=models, timestamp=current_ts)
+    
+    def iter_rows(self, start: float, end: Optional[float] = None,
+                  batch_size: int = 10000) -> Iterator[List[Tuple]]:
+        """
+        Stream rows của mọi resolution theo batches, dùng cho analytics/export
+        
+        Yields:
+            List tuples (ts, model_id, used, quota_limit, remaining, reset_time,
+            is_shared_pool, consumed, resolution)
+        """
+        if end is None:
+            end = time.time()
+        
+        cursor = self.conn.execute(
+            "SELECT ts, model_id, used, quota_limit, remaining, reset_time, is_shared_pool,"
+            " consumed, resolution FROM samples WHERE ts BETWEEN ? AND ? ORDER BY ts",
+            (start, end)
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+    
+    def model_names(self) -> Dict[int, str]:
+        """Map model_id -> model name"""
+        return dict(self.conn.execute("SELECT id, name FROM models"))
+    
+    def compact(self, now: Optional[float] = None):
+        """
+        Downsample rows quá retention lên resolution kế tiếp và xóa rows hết hạn
+        
+        Cutoff được align theo bucket đích nên mỗi bucket chỉ được tạo một lần.
+        """
+        if now is None:
+            now = time.time()
+        
+        conn = self.conn
+        with conn:
+            for source, target in ((RESOLUTION_RAW, RESOLUTION_HOURLY), (RESOLUTION_HOURLY, RESOLUTION_DAILY)):
+                cutoff = int(now - self.retention[source]) // target * target
+                conn.execute(
+                    "INSERT INTO samples (resolution, ts, model_id, used, quota_limit, remaining,"
+                    " reset_time, is_shared_pool, consumed, samples)"
+                    " SELECT ?, CAST(ts / ? AS INTEGER) * ?, model_id, MAX(used), MAX(quota_limit),"
+                    " MIN(remaining), MIN(reset_time), MAX(is_shared_pool), SUM(consumed), SUM(samples)"
+                    " FROM samples WHERE resolution = ? AND ts < ?"
+                    " GROUP BY CAST(ts / ? AS INTEGER), model_id",
+                    (target, target, target, source, cutoff, target)
+                )
+                conn.execute("DELETE FROM samples WHERE resolution = ? AND ts < ?", (source, cutoff))
+            
+            conn.execute(
+                "DELETE FROM samples WHERE resolution = ? AND ts < ?",
+                (RESOLUTION_DAILY, now - self.retention[RESOLUTION_DAILY])
+            )
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_compaction', ?)", (now,))
+        
+        self._last_compaction = now
@@ -0,0 +1,122 @@
+"""
+JSON Output Module - Machine-readable output cho --json / --ndjson
+
+Ghi thẳng ra stdout bằng json.dumps compact, không qua colorama hay
+QuotaFormatter. Mỗi record tự đủ thông tin (reset tuyệt đối, pool, nguồn
+data) để consumers không cần gọi thêm lần nữa.
+
+Sources:
+    live    - vừa fetch từ language_server
+    daemon  - snapshot của agcheck daemon
+    cache   - cache file / history (server không chạy hoặc --swr)
+"""
+
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+
+from .api_client import QuotaData
+
+SOURCE_LIVE = "live"
+SOURCE_DAEMON = "daemon"
+SOURCE_CACHE = "cache"
+
+
+def _iso(timestamp: float) -> str:
+    """Unix timestamp -> ISO 8601 UTC (e.g. 2026-01-07T14:30:00Z)"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _provenance(quota_data: QuotaData, source: str, now: float) -> Dict:
+    return {
+        "source": source,
+        "fetched_at": _iso(quota_data.timestamp),
+        "age_seconds": round(max(0.0, now - quota_data.timestamp), 1),
+    }
+
+
+def model_records(quota_data: QuotaData, source: str, now: Optional[float] = None) -> Iterator[Dict]:
+    """
+    Một dict cho mỗi model, kèm pool và provenance
+    
+    Yields:
+        {"model", "used", "limit", "remaining", "percentage_used", "reset_at",
+         "reset_in_seconds", "pool", "shared_pool", "source", "fetched_at", "age_seconds"}
+    """
+    now = time.time() if now is None else now
+    provenance = _provenance(quota_data, source, now)
+    for pool in quota_data.pools:
+        for model in pool.models:
+            reset_at = quota_data.timestamp + model.reset_time
+            record = {
+                "model": model.model_name,
+                "used": model.used,
+                "limit": model.limit,
+                "remaining": model.remaining,
+                "percentage_used": model.percentage_used,
+                "reset_at": _iso(reset_at),
+                "reset_in_seconds": max(0, int(reset_at - now)),
+                "pool": pool.key,
+                "shared_pool": model.is_shared_pool,
+            }
+            record.update(provenance)
+            yield record
+
+
+def snapshot_document(quota_data: QuotaData, source: str, now: Optional[float] = None) -> Dict:
+    """Toàn bộ snapshot: provenance, models, pools (kèm forecast nếu có), totals"""
+    now = time.time() if now is None else now
+    models = []
+    for record in model_records(quota_data, source, now):
+        for key in ("source", "fetched_at", "age_seconds"):
+            del record[key]
+        models.append(record)
+    
+    pools = []
+    for pool in quota_data.pools:
+        reset_at = quota_data.timestamp + pool.reset_time
+        entry = {
+            "key": pool.key,
+            "models": [m.model_name for m in pool.models],
+            "used": pool.used,
+            "limit": pool.limit,
+            "remaining": pool.remaining,
+            "reset_at": _iso(reset_at),
+            "reset_in_seconds": max(0, int(reset_at - now)),
+        }
+        forecast = quota_data.forecasts.get(pool.key)
+        if forecast:
+            entry["burn_rate_per_hour"] = round(forecast.burn_rate, 3)
+            entry["exhausts_at"] = (
+                _iso(quota_data.timestamp + forecast.eta_seconds) if forecast.eta_seconds is not None else None
+            )
+            entry["exhausts_before_reset"] = forecast.exhausts_before_reset
+        pools.append(entry)
+    
+    document = _provenance(quota_data, source, now)
+    document.update({
+        "models": models,
+        "pools": pools,
+        "total": {"used": quota_data.total_used, "limit": quota_data.total_limit},
+    })
+    return document
+
+
+def _dumps(obj: Dict) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def write_json(quota_data: QuotaData, source: str, stream=None):
+    """--json: một document compact trên một dòng"""
+    stream = stream or sys.stdout
+    stream.write(_dumps(snapshot_document(quota_data, source)) + "\n")
+    stream.flush()
+
+
+def write_ndjson(quota_data: QuotaData, source: str, stream=None):
+    """--ndjson: một dòng cho mỗi model"""
+    stream = stream or sys.stdout
+    stream.write("".join(_dumps(record) + "\n" for record in model_records(quota_data, source)))
+    stream.flush()
@@ -2,62 +2,369 @@
 Port Detector Module - Detect Antigravity server port và authentication info
 """
 
-import psutil
+import errno
+import json
+import os
+import queue
 import re
+import socket
 import sys
-from typing import Optional, Tuple
-from .utils import PORT_RANGE_START, PORT_RANGE_END, ANTIGRAVITY_PROCESS_NAMES
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+from .utils import (
+    PORT_RANGE_START, PORT_RANGE_END, ANTIGRAVITY_PROCESS_NAMES,
+    DISCOVERY_CACHE_FILE, DISCOVERY_NEGATIVE_TTL_SECONDS, ensure_cache_dir, write_atomic,
+    PORT_CONNECT_TIMEOUT, PORT_CONNECT_BATCH_SIZE, API_PROBE_TIMEOUT, DETECT_HEDGE_STAGGER_SECONDS,
+    first_match, parse_server_args,
+)
+from .proc_scanner import ProcScanner
+from .timings import NULL_TIMINGS
+from .transport import TransportMemory, is_usable_status, server_transports
 
 
 class ServerInfo:
     """Class chứa thông tin server"""
-    def __init__(self, port: int, csrf_token: str = "", pid: int = 0, http_port: int = 0):
+    def __init__(self, port: int, csrf_token: str = "", pid: int = 0, http_port: int = 0,
+                 create_time: float = 0.0, transport: Optional[TransportMemory] = None):
         self.port = port
         self.csrf_token = csrf_token
         self.pid = pid
         self.http_port = http_port or port
+        self.create_time = create_time
+        # Transport (HTTPS/HTTP) hoạt động lần trước + circuit breakers, APIClient cập nhật
+        self.transport = transport or TransportMemory()
+    
+    def to_dict(self) -> dict:
+        """Serialize thành dict (dùng cho discovery cache)"""
+        return {
+            "port": self.port,
+            "http_port": self.http_port,
+            "csrf_token": self.csrf_token,
+            "pid": self.pid,
+            "create_time": self.create_time,
+            "transport": self.transport.to_dict(),
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "ServerInfo":
+        """Tạo ServerInfo từ dict đã serialize"""
+        return cls(
+            port=data["port"],
+            csrf_token=data.get("csrf_token", ""),
+            pid=data.get("pid", 0),
+            http_port=data.get("http_port", 0),
+            create_time=data.get("create_time", 0.0),
+            transport=TransportMemory.from_dict(data.get("transport") or {}),
+        )
+
+
+def _get_create_time(pid: int, proc_scanner: Optional[ProcScanner] = None) -> float:
+    """Lấy create_time của process, 0.0 nếu không đọc được (process đã exit)"""
+    if not pid:
+        return 0.0
+    
+    # Linux: đọc thẳng /proc, không cần import psutil (giữ cache-hit path nhẹ)
+    if proc_scanner is not None:
+        return proc_scanner.create_time(pid)
+    if ProcScanner.is_available():
+        return ProcScanner().create_time(pid)
+    
+    import psutil
+    try:
+        return psutil.Process(pid).create_time()
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+        return 0.0
+
+
+def _is_port_listening(port: int, timeout: float = 0.2) -> bool:
+    """Check nhanh xem port trên localhost còn accept connection không"""
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+class DiscoveryCache:
+    """
+    Cache kết quả detect trên disk (~/.agusage/discovery.json)
+    
+    - Positive entry: các ServerInfo detect được lần cuối, validate O(1) mỗi
+      instance bằng pid còn sống + cùng create_time + port còn listen
+    - Negative entry: "không có server", chỉ valid trong DISCOVERY_NEGATIVE_TTL_SECONDS
+    """
+    
+    # update() là read-modify-write, MultiInstanceClient gọi từ nhiều threads
+    _update_lock = threading.Lock()
+    
+    def __init__(self, path=DISCOVERY_CACHE_FILE, negative_ttl: float = DISCOVERY_NEGATIVE_TTL_SECONDS):
+        self.path = path
+        self.negative_ttl = negative_ttl
+    
+    def lookup(self) -> Tuple[bool, List[ServerInfo]]:
+        """
+        Check cache trước khi scan
+        
+        Returns:
+            (hit, servers) - hit=False nghĩa là phải scan lại.
+            hit=True với servers rỗng là negative cache còn hạn.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            servers = [ServerInfo.from_dict(s) for s in entry["servers"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return False, []
+        
+        if not servers:
+            age = time.time() - entry.get("checked_at", 0)
+            return (0 <= age < self.negative_ttl), []
+        
+        # Một instance đã chết/restart thì scan lại để thấy cả instances mới
+        if all(self._is_still_valid(s) for s in servers):
+            return True, servers
+        return False, []
+    
+    def _is_still_valid(self, server_info: ServerInfo) -> bool:
+        """Validate entry: pid còn sống, cùng create_time, port còn listen"""
+        if server_info.pid:
+            create_time = _get_create_time(server_info.pid)
+            if not create_time or abs(create_time - server_info.create_time) > 0.01:
+                return False
+        return _is_port_listening(server_info.port)
+    
+    def save(self, servers: List[ServerInfo]):
+        """Lưu kết quả detect (list rỗng = negative entry)"""
+        self._write({
+            "servers": [s.to_dict() for s in servers],
+            "checked_at": time.time(),
+        })
+    
+    def update(self, server_info: ServerInfo):
+        """
+        Ghi lại entry của một instance (transport state thay đổi), giữ nguyên
+        các instances khác và checked_at. Không có entry khớp thì bỏ qua.
+        """
+        with self._update_lock:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                servers = entry["servers"]
+                for i, data in enumerate(servers):
+                    if data.get("port") == server_info.port and data.get("pid", 0) == server_info.pid:
+                        servers[i] = server_info.to_dict()
+                        break
+                else:
+                    return
+            except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                return
+            self._write(entry)
+    
+    def _write(self, entry: dict):
+        try:
+            ensure_cache_dir()
+            # Atomic để daemon/exporter/SWR refresh đọc cùng lúc không thấy file ghi dở;
+            # file tạm tạo với mode 0600 vì chứa CSRF token
+            write_atomic(self.path, json.dumps(entry).encode('utf-8'))
+        except OSError:
+            # Silent fail - cache chỉ để tăng tốc
+            pass
+    
+    def invalidate(self):
+        """Xóa cache entry"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
 
 
 class PortDetector:
     """Detector để tìm Antigravity server port"""
     
-    def __init__(self, verbose: bool = False):
+    def __init__(self, verbose: bool = False, use_cache: bool = True, timings=NULL_TIMINGS,
+                 hedged: bool = False, hedge_stagger: float = DETECT_HEDGE_STAGGER_SECONDS):
+        """
+        Args:
+            hedged: Chạy các phương pháp detect song song (lệch nhau hedge_stagger giây),
+                kết quả đầu tiên trả lời GetUserStatus thắng
+        """
         self.verbose = verbose
+        self.use_cache = use_cache
+        self.timings = timings
+        self.hedged = hedged
+        self.hedge_stagger = hedge_stagger
+        self.cache = DiscoveryCache()
+        self.proc_scanner = ProcScanner() if ProcScanner.is_available() else None
     
-    def _log(self, message: str):
-        """Log message nếu verbose mode"""
+    def _log(self, message: str, *args):
+        """Log message nếu verbose mode (format %-style lazy, chỉ khi verbose)"""
         if self.verbose:
-            print(f"[DEBUG] {message}")
+            print("[DEBUG] " + (message % args if args else message))
     
     def detect(self) -> Optional[ServerInfo]:
         """
         Detect Antigravity server port và authentication info
         
         Returns:
-            ServerInfo nếu tìm thấy, None nếu không
+            ServerInfo có khả năng cao nhất nếu tìm thấy, None nếu không
+        """
+        servers = self.detect_all()
+        return servers[0] if servers else None
+    
+    def detect_all(self) -> List[ServerInfo]:
+        """
+        Detect tất cả language_server instances (mỗi IDE window một instance)
+        
+        Returns:
+            List ServerInfo đã rank theo khả năng (language_server có CSRF token trước),
+            list rỗng nếu không tìm thấy
         """
+        if self.use_cache:
+            with self.timings.span("detect.cache_lookup"):
+                hit, servers = self.cache.lookup()
+            if hit:
+                if servers:
+                    self._log("Discovery cache hit: ports %s", [s.port for s in servers])
+                else:
+                    self._log("Discovery cache hit: server not found gần đây, bỏ qua scan")
+                return servers
+        
+        servers = self._detect_uncached()
+        if self.use_cache:
+            with self.timings.span("detect.cache_save"):
+                self.cache.save(servers)
+        return servers
+    
+    def _detect_uncached(self) -> List[ServerInfo]:
+        """Chạy các phương pháp detect (không dùng cache), lần lượt hoặc hedged"""
         self._log("Bắt đầu scan processes...")
+        if self.hedged:
+            return self._detect_hedged()
         
         # Phương pháp 1: Dùng PowerShell để tìm language_server (chính xác nhất trên Windows)
         if sys.platform == 'win32':
-            server_info = self._detect_with_powershell()
-            if server_info and server_info.csrf_token:
-                return server_info
+            with self.timings.span("detect.powershell"):
+                servers = self._detect_with_powershell()
+            if any(s.csrf_token for s in servers):
+                return servers
         
-        # Phương pháp 2: Tìm từ process names với psutil
-        server_info = self._detect_from_process_name()
-        if server_info:
-            return server_info
+        # Phương pháp 2: Tìm từ process names (procfs trên Linux, psutil trên các OS khác)
+        with self.timings.span("detect.process_scan"):
+            servers = self._detect_from_process_name()
+        if servers:
+            return servers
         
         # Phương pháp 3: Scan ports trong range
         self._log("Không tìm thấy từ process name, scanning port range...")
-        server_info = self._scan_port_range()
+        with self.timings.span("detect.port_scan"):
+            server_info = self._scan_port_range()
         if server_info:
-            return server_info
+            return [server_info]
         
-        return None
+        return []
+    
+    def _strategies(self, cancel: threading.Event) -> List[Tuple[str, Callable[[], List[ServerInfo]]]]:
+        """Các phương pháp detect theo thứ tự ưu tiên: (span name, function)"""
+        def process_scan():
+            return self._detect_from_process_name(cancel)
+        
+        def port_scan():
+            server_info = self._scan_port_range(cancel)
+            return [server_info] if server_info else []
+        
+        strategies = []
+        if sys.platform == 'win32':
+            strategies.append(("detect.powershell", self._detect_with_powershell))
+        strategies.append(("detect.process_scan", process_scan))
+        strategies.append(("detect.port_scan", port_scan))
+        return strategies
+    
+    def _detect_hedged(self) -> List[ServerInfo]:
+        """
+        Chạy các phương pháp detect song song, phương pháp thứ n start sau n x hedge_stagger
+        
+        Kết quả đầu tiên có server trả lời GetUserStatus (qua HTTPS hoặc HTTP
+        fallback, xem _validate_server) thắng: phương pháp chưa start bị bỏ,
+        process/port scan và validate đang chạy dừng ở bước kế tiếp, kết quả đến
+        muộn bị bỏ qua. Khi mọi phương pháp đã start đều xong mà chưa có kết quả thì start
+        ngay phương pháp kế tiếp. Không có kết quả nào validate thì trả về kết quả
+        không rỗng có ưu tiên cao nhất (như mode tuần tự).
+        """
+        cancel = threading.Event()
+        strategies = self._strategies(cancel)
+        results = queue.Queue()
+        
+        def run(index, name, strategy):
+            servers, winner = [], None
+            try:
+                with self.timings.span(name):
+                    servers = strategy()
+                if servers and not cancel.is_set():
+                    with self.timings.span(f"{name}.validate"):
+                        winner = first_match(servers, lambda s: self._validate_server(s, cancel))
+            except Exception as e:
+                self._log("%s failed: %s", name, e)
+            results.put((index, servers, winner))
+        
+        def launch(index):
+            name, strategy = strategies[index]
+            self._log("Hedged detect: start %s", name)
+            threading.Thread(target=run, args=(index, name, strategy), name=f"hedge-{name}", daemon=True).start()
+        
+        outcomes = [[] for _ in strategies]
+        started = finished = 0
+        origin = time.monotonic()
+        try:
+            while finished < len(strategies):
+                if started == finished:
+                    launch(started)
+                    started += 1
+                timeout = None
+                if started < len(strategies):
+                    timeout = max(0.0, origin + started * self.hedge_stagger - time.monotonic())
+                try:
+                    index, servers, winner = results.get(timeout=timeout)
+                except queue.Empty:
+                    launch(started)
+                    started += 1
+                    continue
+                
+                finished += 1
+                outcomes[index] = servers
+                if winner:
+                    self._log("Hedged detect: %s thắng (port %s)", strategies[index][0], winner.port)
+                    return servers
+        finally:
+            cancel.set()
+        
+        return next((servers for servers in outcomes if servers), [])
+    
+    @staticmethod
+    def _rank_servers(candidates: List[Tuple[str, ServerInfo]]) -> List[ServerInfo]:
+        """
+        Sắp xếp candidates theo khả năng là language_server thật
+        
+        Thứ tự: language_server có CSRF token > language_server > process khác có
+        CSRF token > còn lại. Trùng port thì chỉ giữ candidate rank cao nhất.
+        
+        Args:
+            candidates: List (process_name, ServerInfo)
+        """
+        def rank(candidate):
+            name, server_info = candidate
+            is_language_server = "language_server" in name
+            return (not is_language_server, not server_info.csrf_token)
+        
+        servers = []
+        seen_ports = set()
+        for _, server_info in sorted(candidates, key=rank):
+            if server_info.port not in seen_ports:
+                seen_ports.add(server_info.port)
+                servers.append(server_info)
+        return servers
     
-    def _detect_with_powershell(self) -> Optional[ServerInfo]:
+    def _detect_with_powershell(self) -> List[ServerInfo]:
         """
         Dùng PowerShell để tìm language_server process (Windows only)
         Theo cách của tungcorn/antigravity-usage-checker
@@ -70,7 +377,7 @@ class PortDetector:
             ps_cmd = '''
             Get-CimInstance Win32_Process | Where-Object { 
                 $_.CommandLine -like "*extension_server_port*" -and $_.Name -like "*language_server*" 
-            } | Select-Object -First 1 ProcessId, CommandLine | ConvertTo-Json -Compress
+            } | Select-Object ProcessId, CommandLine | ConvertTo-Json -Compress
             '''
             
             self._log("Running PowerShell to find language_server...")
@@ -84,51 +391,61 @@ class PortDetector:
             output = result.stdout.strip()
             if not output or output == 'null':
                 self._log("PowerShell: language_server not found")
-                return None
+                return []
             
-            # Parse JSON output
+            # Parse JSON output (object nếu 1 process, array nếu nhiều)
             data = json.loads(output)
-            pid = data.get('ProcessId', 0)
-            cmdline = data.get('CommandLine', '')
-            
-            self._log(f"PowerShell found process PID: {pid}")
-            
-            # Extract extension_server_port
-            http_port_match = re.search(r'--extension_server_port\s+(\d+)', cmdline)
-            http_port = int(http_port_match.group(1)) if http_port_match else 0
-            
-            # Extract csrf_token (có thể là --csrf_token hoặc variations)
-            csrf_patterns = [
-                r'--csrf_token\s+([a-zA-Z0-9_-]+)',
-                r'--[a-z_]*csrf[a-z_]*\s+([a-zA-Z0-9_-]{20,})',
-            ]
-            
-            csrf_token = ""
-            for pattern in csrf_patterns:
-                match = re.search(pattern, cmdline)
-                if match:
-                    csrf_token = match.group(1)
-                    break
-            
-            if not http_port:
-                self._log("PowerShell: Could not extract port")
-                return None
-            
-            # Tìm API port bằng cách test các listening ports của process
-            connect_port = self._find_api_port_for_pid(pid, csrf_token) or http_port
-            
-            self._log(f"PowerShell detected: connect={connect_port}, http={http_port}, csrf={'YES' if csrf_token else 'NO'}")
+            if isinstance(data, dict):
+                data = [data]
             
-            return ServerInfo(
-                port=connect_port,
-                http_port=http_port,
-                csrf_token=csrf_token,
-                pid=pid
-            )
+            candidates = []
+            for proc in data:
+                server_info = self._server_from_powershell(proc.get('ProcessId', 0), proc.get('CommandLine') or '')
+                if server_info:
+                    candidates.append(("language_server", server_info))
+            return self._rank_servers(candidates)
             
         except Exception as e:
-            self._log(f"PowerShell detection failed: {e}")
+            self._log("PowerShell detection failed: %s", e)
+            return []
+    
+    def _server_from_powershell(self, pid: int, cmdline: str) -> Optional[ServerInfo]:
+        """Build ServerInfo từ một process PowerShell trả về"""
+        self._log("PowerShell found process PID: %s", pid)
+        
+        # Extract extension_server_port
+        http_port_match = re.search(r'--extension_server_port\s+(\d+)', cmdline)
+        http_port = int(http_port_match.group(1)) if http_port_match else 0
+        
+        # Extract csrf_token (có thể là --csrf_token hoặc variations)
+        csrf_patterns = [
+            r'--csrf_token\s+([a-zA-Z0-9_-]+)',
+            r'--[a-z_]*csrf[a-z_]*\s+([a-zA-Z0-9_-]{20,})',
+        ]
+        
+        csrf_token = ""
+        for pattern in csrf_patterns:
+            match = re.search(pattern, cmdline)
+            if match:
+                csrf_token = match.group(1)
+                break
+        
+        if not http_port:
+            self._log("PowerShell: Could not extract port")
             return None
+        
+        # Tìm API port bằng cách test các listening ports của process
+        connect_port = self._find_api_port_for_pid(pid, csrf_token) or http_port
+        
+        self._log("PowerShell detected: connect=%s, http=%s, csrf=%s", connect_port, http_port, 'YES' if csrf_token else 'NO')
+        
+        return ServerInfo(
+            port=connect_port,
+            http_port=http_port,
+            csrf_token=csrf_token,
+            pid=pid,
+            create_time=_get_create_time(pid)
+        )
     
     def _find_api_port_for_pid(self, pid: int, csrf_token: str) -> Optional[int]:
         """Tìm port API cho một PID bằng cách test các listening ports"""
@@ -136,12 +453,13 @@ class PortDetector:
         
         try:
             # Dùng netstat để lấy các port đang listen của process
-            result = subprocess.run(
-                ['netstat', '-ano'],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
+            with self.timings.span("detect.netstat"):
+                result = subprocess.run(
+                    ['netstat', '-ano'],
+                    capture_output=True,
+                    text=True,
+                    timeout=5
+                )
             
             ports = []
             pid_str = str(pid)
@@ -152,40 +470,86 @@ class PortDetector:
                     if match:
                         ports.append(int(match.group(1)))
             
-            self._log(f"Found {len(ports)} listening ports for PID {pid}: {ports}")
+            self._log("Found %s listening ports for PID %s: %s", len(ports), pid, ports)
             
-            # Test từng port để tìm API port
-            for port in ports:
-                if self._test_api_port(port, csrf_token):
-                    return port
+            # Test song song, port đầu tiên respond thắng
+            with self.timings.span("detect.probe_api_ports"):
+                api_port = first_match(ports, lambda port: self._test_api_port(port, csrf_token))
+            if api_port:
+                return api_port
             
             return ports[0] if ports else None
             
         except Exception as e:
-            self._log(f"Error finding API port: {e}")
+            self._log("Error finding API port: %s", e)
             return None
     
     def _test_api_port(self, port: int, csrf_token: str) -> bool:
         """Test xem port có respond với API không"""
-        import requests
-        
         try:
-            url = f"https://127.0.0.1:{port}/exa.language_server_pb.LanguageServerService/GetUserStatus"
-            headers = {
-                'Content-Type': 'application/json',
-                'Connect-Protocol-Version': '1',
-            }
-            if csrf_token:
-                headers['X-Codeium-Csrf-Token'] = csrf_token
-            
-            response = requests.post(url, json={}, headers=headers, timeout=2, verify=False)
-            return response.status_code == 200
+            return self._probe_status("https", port, csrf_token) == 200
         except:
             return False
     
-    def _detect_from_process_name(self) -> Optional[ServerInfo]:
-        """Đetếct từ process names"""
+    def _validate_server(self, server_info: ServerInfo, cancel: Optional[threading.Event] = None) -> bool:
+        """
+        Test server như APIClient sẽ fetch: HTTPS trên port, rồi HTTP trên http_port
+        
+        Thứ tự lấy từ server_info.transport và kết quả được ghi lại vào đó, nên
+        client tạo từ ServerInfo thắng thử transport hoạt động trước.
+        
+        Args:
+            cancel: Không thử transport kế tiếp khi event được set
+        """
+        import requests
+        
+        for scheme, port in server_info.transport.order(server_transports(server_info.port, server_info.http_port)):
+            if cancel is not None and cancel.is_set():
+                return False
+            try:
+                status = self._probe_status(scheme, port, server_info.csrf_token)
+            except requests.exceptions.ConnectionError as e:
+                self._log("Validate %s:%s failed: %s", scheme, port, e)
+                server_info.transport.record_failure((scheme, port))
+                continue
+            if is_usable_status(status):
+                server_info.transport.record_success((scheme, port))
+            return status == 200
+        return False
+    
+    def _probe_status(self, scheme: str, port: int, csrf_token: str) -> int:
+        """POST GetUserStatus với API_PROBE_TIMEOUT, trả về HTTP status"""
+        import requests
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        
+        url = f"{scheme}://127.0.0.1:{port}/exa.language_server_pb.LanguageServerService/GetUserStatus"
+        headers = {
+            'Content-Type': 'application/json',
+            'Connect-Protocol-Version': '1',
+        }
+        if csrf_token:
+            headers['X-Codeium-Csrf-Token'] = csrf_token
+        
+        response = requests.post(url, json={}, headers=headers, timeout=API_PROBE_TIMEOUT, verify=False)
+        return response.status_code
+    
+    def _detect_from_process_name(self, cancel: Optional[threading.Event] = None) -> List[ServerInfo]:
+        """
+        Đetếct từ process names, trả về tất cả candidates đã rank
+        
+        Args:
+            cancel: Dừng trước process kế tiếp khi event được set (hedged detect đã có kết quả)
+        """
+        if self.proc_scanner:
+            return self._rank_servers(self._detect_from_proc(cancel))
+        
+        import psutil
+        
+        candidates = []
         for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+            if cancel is not None and cancel.is_set():
+                return []
             try:
                 proc_name = proc.info['name'].lower()
                 
@@ -199,151 +563,172 @@ class PortDetector:
                 if not (is_language_server or is_antigravity):
                     continue
                 
-                self._log(f"Tìm thấy process: {proc_name} (PID: {proc.info['pid']})")
+                self._log("Tìm thấy process: %s (PID: %s)", proc_name, proc.info['pid'])
                 
                 # Parse command line để extract port và CSRF
                 cmdline = proc.info.get('cmdline', [])
                 if not cmdline:
                     continue
                 
-                # Extract CSRF token first
-                csrf_token = self._get_csrf_token(proc)
+                args = parse_server_args(cmdline)
+                self._log_csrf_token(args.csrf_token)
                 
-                # Extract ports
-                port = self._extract_port_from_cmdline(cmdline)
-                http_port = self._extract_http_port_from_cmdline(cmdline)
-                
-                if port:  # We must have at least the main port
-                    self._log(f"Extracted port: {port}, http: {http_port or port}, csrf: {'YES' if csrf_token else 'NO'}")
+                if args.port:  # We must have at least the main port
+                    self._log("Extracted port: %s, http: %s, csrf: %s", args.port, args.http_port or args.port, 'YES' if args.csrf_token else 'NO')
                     
-                    return ServerInfo(
-                        port=port,
-                        csrf_token=csrf_token,
+                    candidates.append((proc_name, ServerInfo(
+                        port=args.port,
+                        csrf_token=args.csrf_token,
                         pid=proc.info['pid'],
-                        http_port=http_port or port
-                    )
+                        http_port=args.http_port or args.port,
+                        create_time=_get_create_time(proc.info['pid'])
+                    )))
                     
             except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
                 continue
         
-        return None
+        return self._rank_servers(candidates)
     
-    def _extract_port_from_cmdline(self, cmdline: list) -> Optional[int]:
-        """
-        Extract connect port từ command line arguments
-        Tìm --api_server_port hoặc tương tự
+    def _detect_from_proc(self, cancel: Optional[threading.Event] = None) -> List[Tuple[str, ServerInfo]]:
         """
-        cmd_str = ' '.join(cmdline)
+        Linux backend: lọc /proc/*/comm, chỉ đọc cmdline cho candidates
         
-        # Patterns để tìm port (prioritize api_server_port for connect)
-        patterns = [
-            r'--api_server_port[=\s]+(\d+)',
-            r'--port[=\s]+(\d+)',
-            r'--connect-port[=\s]+(\d+)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, cmd_str)
-            if match:
-                port = int(match.group(1))
-                if PORT_RANGE_START <= port <= PORT_RANGE_END:
-                    return port
-        
-        return None
-    
-    def _extract_http_port_from_cmdline(self, cmdline: list) -> Optional[int]:
-        """
-        Extract HTTP fallback port (extension_server_port)
-        """
-        cmd_str = ' '.join(cmdline)
-        
-        # Tìm extension_server_port
-        match = re.search(r'--extension_server_port[=\s]+(\d+)', cmd_str)
-        if match:
-            return int(match.group(1))
-        
-        return None
-    
-    def _get_csrf_token(self, proc: psutil.Process) -> str:
-        """
-        Lấy CSRF token từ process command line arguments
+        Nếu cmdline không có --api_server_port, dùng listening ports
+        của chính PID đó (map qua socket inodes) để tìm API port.
         
         Args:
-            proc: psutil Process object
+            cancel: Dừng trước process kế tiếp khi event được set
             
         Returns:
-            CSRF token string hoặc empty string
+            List (process_name, ServerInfo) chưa rank
         """
-        try:
-            cmdline = proc.info.get('cmdline', [])
-            if not cmdline:
-                return ""
+        candidates = []
+        for pid, comm, argv in self.proc_scanner.iter_candidates():
+            if cancel is not None and cancel.is_set():
+                return []
+            self._log("Tìm thấy process: %s (PID: %s)", comm, pid)
             
-            # Join cmdline thành string để parse
-            cmd_str = ' '.join(cmdline)
+            args = parse_server_args(argv)
+            self._log_csrf_token(args.csrf_token)
             
-            # Tìm --api_server_csrf_token flag
-            # Format: --api_server_csrf_token=TOKEN hoặc --api_server_csrf_token TOKEN
-            patterns = [
-                r'--api_server_csrf_token[=\s]+([a-zA-Z0-9\-_]+)',
-                r'--api-server-csrf-token[=\s]+([a-zA-Z0-9\-_]+)',
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, cmd_str)
-                if match:
-                    token = match.group(1).strip()
-                    self._log(f"Found CSRF token: {token[:6]}...{token[-4:]}")
-                    return token
+            port = args.port
+            if not port:
+                ports = [
+                    p for p in self.proc_scanner.listening_ports(pid)
+                    if PORT_RANGE_START <= p <= PORT_RANGE_END
+                ]
+                self._log("Found %s listening ports for PID %s: %s", len(ports), pid, ports)
+                port = first_match(ports, lambda p: self._test_api_port(p, args.csrf_token))
             
+            if port:
+                self._log("Extracted port: %s, http: %s, csrf: %s", port, args.http_port or port, 'YES' if args.csrf_token else 'NO')
+                
+                candidates.append((comm, ServerInfo(
+                    port=port,
+                    csrf_token=args.csrf_token,
+                    pid=pid,
+                    http_port=args.http_port or port,
+                    create_time=_get_create_time(pid)
+                )))
+        
+        return candidates
+    
+    def _log_csrf_token(self, token: str):
+        """Log CSRF token (đã che) nếu tìm thấy"""
+        if token:
+            self._log("Found CSRF token: %s...%s", token[:6], token[-4:])
+        else:
             self._log("CSRF token not found in command line")
-            return ""
-            
-        except Exception as e:
-            self._log(f"Error extracting CSRF token: {e}")
-            return ""
     
-    def _scan_port_range(self) -> Optional[ServerInfo]:
+    def _scan_port_range(self, cancel: Optional[threading.Event] = None) -> Optional[ServerInfo]:
         """
         Scan port range để tìm server đang listen
         (Fallback method - chậm hơn)
-        """
-        import socket
         
-        self._log(f"Scanning port range {PORT_RANGE_START}-{PORT_RANGE_END}...")
+        Args:
+            cancel: Dừng trước batch kế tiếp khi event được set (hedged detect đã có kết quả)
+        """
+        self._log("Scanning port range %s-%s...", PORT_RANGE_START, PORT_RANGE_END)
         
         # Lấy danh sách ports đang được sử dụng
-        connections = psutil.net_connections(kind='inet')
         listening_ports = set()
+        if self.proc_scanner:
+            # Chỉ đọc /proc/net/tcp{,6}, không walk fd của mọi process
+            listening_ports.update(
+                port for port in self.proc_scanner.listening_ports()
+                if PORT_RANGE_START <= port <= PORT_RANGE_END
+            )
+        else:
+            import psutil
+            
+            for conn in psutil.net_connections(kind='inet'):
+                if conn.status == 'LISTEN' and conn.laddr:
+                    port = conn.laddr.port
+                    if PORT_RANGE_START <= port <= PORT_RANGE_END:
+                        listening_ports.add(port)
         
-        for conn in connections:
-            if conn.status == 'LISTEN' and conn.laddr:
-                port = conn.laddr.port
-                if PORT_RANGE_START <= port <= PORT_RANGE_END:
-                    listening_ports.add(port)
-        
-        self._log(f"Tìm thấy {len(listening_ports)} ports đang listen trong range")
+        self._log("Tìm thấy %s ports đang listen trong range", len(listening_ports))
         
-        # Test từng port
-        for port in sorted(listening_ports):
-            if self._test_port_is_antigravity(port):
-                self._log(f"Port {port} có vẻ là Antigravity server")
+        # Connect tới các ports cùng lúc theo batch
+        ports = sorted(listening_ports)
+        for i in range(0, len(ports), PORT_CONNECT_BATCH_SIZE):
+            if cancel is not None and cancel.is_set():
+                return None
+            port = self._probe_ports_connectable(ports[i:i + PORT_CONNECT_BATCH_SIZE])
+            if port:
+                self._log("Port %s có vẻ là Antigravity server", port)
                 return ServerInfo(port=port)
         
         return None
     
-    def _test_port_is_antigravity(self, port: int) -> bool:
+    def _probe_ports_connectable(self, ports: list, timeout: float = PORT_CONNECT_TIMEOUT) -> Optional[int]:
         """
-        Test xem port có phải là Antigravity server không
+        Non-blocking connect tới tất cả ports cùng lúc
         (Simplified - chỉ check xem có connectable không)
+        
+        Thời gian bị chặn bởi một timeout duy nhất thay vì timeout x số ports.
+        
+        Returns:
+            Port connect thành công sớm nhất (port nhỏ nhất nếu cùng lượt), None nếu không có
         """
-        import socket
+        import selectors
         
+        selector = selectors.DefaultSelector()
+        pending = {}
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(0.5)
-            result = sock.connect_ex(('127.0.0.1', port))
-            sock.close()
-            return result == 0
-        except:
-            return False
+            for port in ports:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                err = sock.connect_ex(('127.0.0.1', port))
+                if err == 0:
+                    sock.close()
+                    return port
+                if err not in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+                    sock.close()
+                    continue
+                selector.register(sock, selectors.EVENT_WRITE, port)
+                pending[sock] = port
+            
+            deadline = time.monotonic() + timeout
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                
+                connected = []
+                for key, _ in selector.select(remaining):
+                    sock = key.fileobj
+                    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                        connected.append(key.data)
+                    selector.unregister(sock)
+                    sock.close()
+                    del pending[sock]
+                
+                if connected:
+                    return min(connected)
+            
+            return None
+        finally:
+            for sock in pending:
+                sock.close()
+            selector.close()
@@ -0,0 +1,153 @@
+"""
+Proc Scanner Module - Linux backend đọc trực tiếp /proc thay vì psutil
+
+So với psutil:
+- Chỉ đọc /proc/<pid>/comm (vài bytes) để lọc, cmdline chỉ đọc cho candidates
+- Listening ports lấy từ /proc/net/tcp{,6} (một lần) thay vì walk fd của mọi process
+- Ports của một PID map bằng socket inodes trong /proc/<pid>/fd
+"""
+
+import os
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+from .utils import ANTIGRAVITY_PROCESS_NAMES
+
+# State "0A" trong /proc/net/tcp = TCP_LISTEN
+_TCP_LISTEN = "0A"
+# Index của starttime trong /proc/<pid>/stat, tính từ field ngay sau "(comm)"
+_STAT_STARTTIME_INDEX = 19
+
+
+class ProcScanner:
+    """Scanner process/ports dựa trên procfs"""
+    
+    def __init__(self, proc_root: str = "/proc"):
+        self.proc_root = proc_root
+        self.process_names = ("language_server",) + tuple(ANTIGRAVITY_PROCESS_NAMES)
+        self._boot_time: Optional[float] = None
+    
+    @staticmethod
+    def is_available(proc_root: str = "/proc") -> bool:
+        """Check xem có dùng được procfs không (Linux only)"""
+        return sys.platform.startswith("linux") and os.path.isfile(os.path.join(proc_root, "net", "tcp"))
+    
+    def iter_candidates(self) -> Iterator[Tuple[int, str, List[str]]]:
+        """
+        Yield (pid, comm, argv) cho các process có tên liên quan đến Antigravity
+        
+        Process biến mất hoặc không đọc được trong lúc scan sẽ bị bỏ qua.
+        """
+        try:
+            entries = os.listdir(self.proc_root)
+        except OSError:
+            return
+        
+        for entry in entries:
+            if not entry.isdigit():
+                continue
+            
+            comm = self._read_text(os.path.join(self.proc_root, entry, "comm"))
+            if not comm:
+                continue
+            comm = comm.strip().lower()
+            if not any(name in comm for name in self.process_names):
+                continue
+            
+            argv = self.read_cmdline(int(entry))
+            if argv:
+                yield int(entry), comm, argv
+    
+    def read_cmdline(self, pid: int) -> List[str]:
+        """Đọc argv của process từ /proc/<pid>/cmdline (NUL-separated)"""
+        try:
+            with open(os.path.join(self.proc_root, str(pid), "cmdline"), "rb") as f:
+                raw = f.read()
+        except OSError:
+            return []
+        return raw.decode("utf-8", "replace").rstrip("\0").split("\0") if raw else []
+    
+    def create_time(self, pid: int) -> float:
+        """
+        Thời điểm process start (Unix timestamp), 0.0 nếu không đọc được
+        
+        Cùng công thức với psutil: boot time + starttime / clock ticks.
+        """
+        stat = self._read_text(os.path.join(self.proc_root, str(pid), "stat"))
+        try:
+            # comm có thể chứa space/ngoặc nên tách từ dấu ")" cuối cùng
+            starttime = int(stat.rsplit(")", 1)[1].split()[_STAT_STARTTIME_INDEX])
+        except (IndexError, ValueError):
+            return 0.0
+        return self._get_boot_time() + starttime / os.sysconf("SC_CLK_TCK")
+    
+    def _get_boot_time(self) -> float:
+        """Đọc btime từ /proc/stat (cache lại vì không đổi)"""
+        if self._boot_time is None:
+            self._boot_time = 0.0
+            for line in self._read_text(os.path.join(self.proc_root, "stat")).splitlines():
+                if line.startswith("btime "):
+                    self._boot_time = float(line.split()[1])
+                    break
+        return self._boot_time
+    
+    def listening_ports(self, pid: Optional[int] = None) -> List[int]:
+        """
+        Lấy các TCP ports đang LISTEN (IPv4 + IPv6)
+        
+        Args:
+            pid: Nếu có, chỉ trả về ports mà process này sở hữu
+            
+        Returns:
+            List ports đã sort
+        """
+        inode_ports = self._listening_inodes()
+        if pid is None:
+            return sorted(set(inode_ports.values()))
+        
+        ports = set()
+        for inode in self._socket_inodes(pid):
+            port = inode_ports.get(inode)
+            if port is not None:
+                ports.add(port)
+        return sorted(ports)
+    
+    def _listening_inodes(self) -> Dict[str, int]:
+        """Parse /proc/net/tcp và tcp6 thành map inode -> port"""
+        inode_ports = {}
+        for table in ("tcp", "tcp6"):
+            try:
+                with open(os.path.join(self.proc_root, "net", table), "r") as f:
+                    next(f, None)  # Header line
+                    for line in f:
+                        fields = line.split()
+                        if len(fields) < 10 or fields[3] != _TCP_LISTEN:
+                            continue
+                        port = int(fields[1].rsplit(":", 1)[1], 16)
+                        inode_ports[fields[9]] = port
+            except (OSError, ValueError, IndexError):
+                continue
+        return inode_ports
+    
+    def _socket_inodes(self, pid: int) -> Iterator[str]:
+        """Yield socket inodes từ các fd links "socket:[inode]" của process"""
+        fd_dir = os.path.join(self.proc_root, str(pid), "fd")
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            return
+        
+        for fd in fds:
+            try:
+                target = os.readlink(os.path.join(fd_dir, fd))
+            except OSError:
+                continue
+            if target.startswith("socket:["):
+                yield target[8:-1]
+    
+    @staticmethod
+    def _read_text(path: str) -> str:
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                return f.read()
+        except OSError:
+            return ""
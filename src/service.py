@@ -0,0 +1,218 @@
+"""
+Service Module - Giữ detection + API client cho long-running modes (daemon, exporter, watch)
+"""
+
+import threading
+import time
+from typing import List, Optional
+from .port_detector import PortDetector, ServerInfo, _get_create_time, _is_port_listening
+from .api_client import APIClient, QuotaData, _Flight, create_client
+from .cache_manager import CacheManager
+from .forecast import BurnRateEstimator
+from .timings import NULL_TIMINGS
+from .utils import DAEMON_MAX_AGE_SECONDS
+
+
+class ServerWatcher:
+    """
+    Giữ ServerInfo + client, chỉ detect lại khi language_server đã đổi
+    
+    IDE reload thì language_server restart với port và CSRF token mới. Thay vì
+    detect trước mỗi fetch, watcher nhớ PID + create_time của từng instance:
+    
+    - Trước fetch: đọc create_time của PID đã biết (/proc/<pid>/stat hoặc
+      psutil.Process), không scan process table
+    - Detect lại khi process đã exit/restart, hoặc fetch bị 401/403 (CSRF
+      token cũ), rồi retry fetch một lần với ServerInfo mới
+    
+    Steady state mỗi fetch_quota() chỉ tốn một GetUserStatus call.
+    
+    Example:
+        watcher = ServerWatcher()
+        while True:
+            quota_data = watcher.fetch_quota()
+            time.sleep(30)
+    """
+    
+    def __init__(self, detector: Optional[PortDetector] = None, servers: Optional[List[ServerInfo]] = None,
+                 verbose: bool = False, timings=NULL_TIMINGS):
+        """
+        Args:
+            servers: Kết quả detect_all() đã có (bỏ qua lần detect đầu tiên)
+        """
+        self.verbose = verbose
+        self.timings = timings
+        self.detector = detector or PortDetector(verbose=verbose, timings=timings)
+        self.servers: List[ServerInfo] = servers or []
+        self.client = None
+        self.upstream_calls = 0
+        self.redetections = 0
+    
+    def _log(self, message: str, *args):
+        """Log message nếu verbose mode (format %-style lazy, chỉ khi verbose)"""
+        if self.verbose:
+            print("[DEBUG WATCH] " + (message % args if args else message))
+    
+    def fetch_quota(self, fallback_to_mock: bool = False) -> Optional[QuotaData]:
+        """
+        Fetch quota, detect lại + retry một lần nếu server đã restart
+        
+        Returns:
+            QuotaData nếu thành công, None nếu không tìm thấy server hoặc fetch fail
+        """
+        if self.client is not None and self._server_exited():
+            self._log("language_server đã exit/restart, detect lại")
+            self._forget()
+        
+        quota_data = None
+        if self._ensure_client():
+            quota_data = self._fetch()
+            if quota_data is None and (self.client.auth_failed or self._server_exited(probe_port=True)):
+                self._log("Server từ chối CSRF token hoặc đã exit, detect lại và retry")
+                self._forget()
+                if self._ensure_client():
+                    quota_data = self._fetch()
+        
+        if quota_data is None and fallback_to_mock:
+            return APIClient(port=0)._get_mock_data()
+        return quota_data
+    
+    def _ensure_client(self) -> bool:
+        if self.client is not None:
+            return True
+        if not self.servers:
+            with self.timings.span("detect"):
+                self.servers = self.detector.detect_all()
+            if not self.servers:
+                return False
+        self.client = create_client(self.servers, verbose=self.verbose, timings=self.timings,
+                                    persist_transport=self.detector.use_cache)
+        return True
+    
+    def _fetch(self) -> Optional[QuotaData]:
+        self.upstream_calls += 1
+        with self.timings.span("fetch"):
+            return self.client.fetch_quota(fallback_to_mock=False)
+    
+    def _server_exited(self, probe_port: bool = False) -> bool:
+        """
+        Có instance nào đã exit hoặc bị thay bằng process khác cùng PID
+        
+        Args:
+            probe_port: Instance không biết PID (từ port scan) thì check port còn listen
+        """
+        scanner = self.detector.proc_scanner
+        for server in self.servers:
+            if server.pid and server.create_time:
+                create_time = _get_create_time(server.pid, scanner)
+                if not create_time or abs(create_time - server.create_time) > 0.01:
+                    return True
+            elif probe_port and not _is_port_listening(server.port):
+                return True
+        return False
+    
+    def _forget(self):
+        """Bỏ client + ServerInfo hiện tại, lần detect sau bỏ qua discovery cache"""
+        self.close()
+        self.servers = []
+        self.detector.cache.invalidate()
+        self.redetections += 1
+    
+    def close(self):
+        """Đóng client"""
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
+
+class QuotaService:
+    """
+    Owner của detection và fetching cho các consumers cùng process
+    
+    - Detect một lần, giữ client; ServerWatcher detect lại khi server restart
+    - get() trả về snapshot nếu còn đủ mới, ngược lại refresh
+    - Nhiều callers refresh cùng lúc được coalesce thành một GetUserStatus call
+    - Mỗi snapshot fetch được được lưu qua CacheManager (cache.bin + history),
+      như CLI làm sau mỗi live fetch
+    """
+    
+    def __init__(self, verbose: bool = False, max_age: float = DAEMON_MAX_AGE_SECONDS, timings=NULL_TIMINGS,
+                 cache_mgr: Optional[CacheManager] = None):
+        self.verbose = verbose
+        self.max_age = max_age
+        self.timings = timings
+        self.watcher = ServerWatcher(verbose=verbose, timings=timings)
+        self.snapshot: Optional[QuotaData] = None
+        self.estimator = BurnRateEstimator().load()
+        self.cache_mgr = cache_mgr or CacheManager()
+        self.failed_calls = 0
+        self.last_success: Optional[bool] = None
+        self._lock = threading.Lock()
+        self._flight: Optional[_Flight] = None
+    
+    @property
+    def upstream_calls(self) -> int:
+        """Số GetUserStatus calls (gồm retry sau khi detect lại)"""
+        return self.watcher.upstream_calls
+    
+    def get(self, max_age: Optional[float] = None) -> Optional[QuotaData]:
+        """
+        Lấy QuotaData mới nhất
+        
+        Args:
+            max_age: Tuổi tối đa (giây) của snapshot được chấp nhận, default self.max_age
+            
+        Returns:
+            QuotaData, None nếu chưa từng fetch thành công
+        """
+        if max_age is None:
+            max_age = self.max_age
+        snapshot = self.snapshot
+        if snapshot and time.time() - snapshot.timestamp <= max_age:
+            return snapshot
+        return self.refresh()
+    
+    def refresh(self) -> Optional[QuotaData]:
+        """
+        Fetch snapshot mới; nếu đang có refresh chạy thì đợi kết quả của nó
+        
+        Returns:
+            Snapshot mới, hoặc snapshot cũ nếu fetch fail
+        """
+        with self._lock:
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+        
+        if not leader:
+            flight.event.wait()
+            return flight.result
+        
+        try:
+            flight.result = self._fetch() or self.snapshot
+        finally:
+            with self._lock:
+                self._flight = None
+            flight.event.set()
+        return flight.result
+    
+    def _fetch(self) -> Optional[QuotaData]:
+        """Detect (nếu cần), gọi GetUserStatus và lưu snapshot"""
+        calls = self.watcher.upstream_calls
+        quota_data = self.watcher.fetch_quota()
+        self.last_success = quota_data is not None
+        if quota_data is None:
+            if self.watcher.upstream_calls > calls:
+                self.failed_calls += 1
+            return None
+        
+        self.estimator.update(quota_data)
+        self.estimator.save()
+        self.cache_mgr.save(quota_data)
+        self.snapshot = quota_data
+        return quota_data
+    
+    def close(self):
+        """Đóng client"""
+        self.watcher.close()
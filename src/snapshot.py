@@ -0,0 +1,126 @@
+"""
+Snapshot Module - Binary format cho offline cache (~/.agusage/cache.bin)
+
+Layout (little-endian):
+
+    header   magic "AGQS" | version u16 | flags u16 | payload_len u32 | crc32(payload) u32
+    payload  timestamp f64 | n_models u32 | n_forecasts u32
+             n_models    x (name_off u32, name_len u16, shared u8, pad, used i32, limit i32,
+                            remaining i32, reset_time i32)
+             n_forecasts x (key_off u32, key_len u16, has_eta u8, pad, burn_rate f64,
+                            eta_seconds i64, reset_time i32)
+             strings     UTF-8 model names / pool keys, tham chiếu bằng (offset, length)
+
+Records có kích thước cố định nên Snapshot chỉ verify header + checksum khi
+mở; models được decode (struct.unpack_from trên memoryview) khi cần render.
+JSON (QuotaData.to_dict) vẫn là format của daemon protocol và --json export.
+"""
+
+import struct
+import zlib
+from typing import Iterator
+
+from .api_client import PoolForecast, QuotaData, QuotaModel
+
+MAGIC = b"AGQS"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHHII")
+_COUNTS = struct.Struct("<dII")
+_MODEL = struct.Struct("<IHBxiiii")
+_FORECAST = struct.Struct("<IHBxdqi")
+
+
+class SnapshotError(ValueError):
+    """Snapshot hỏng (magic, version, độ dài hoặc checksum không khớp)"""
+
+
+def encode(quota_data: QuotaData) -> bytes:
+    """
+    Serialize QuotaData (models + forecasts)
+    
+    Raises:
+        struct.error: Nếu giá trị vượt kích thước field (e.g. tên model > 64KB)
+    """
+    strings = bytearray()
+    
+    def intern(text: str):
+        data = text.encode("utf-8")
+        offset = len(strings)
+        strings.extend(data)
+        return offset, len(data)
+    
+    parts = [_COUNTS.pack(quota_data.timestamp, len(quota_data.models), len(quota_data.forecasts))]
+    for m in quota_data.models:
+        parts.append(_MODEL.pack(*intern(m.model_name), m.is_shared_pool,
+                                 m.used, m.limit, m.remaining, m.reset_time))
+    for key, f in quota_data.forecasts.items():
+        parts.append(_FORECAST.pack(*intern(key), f.eta_seconds is not None, f.burn_rate,
+                                    f.eta_seconds or 0, f.reset_time))
+    parts.append(bytes(strings))
+    
+    payload = b"".join(parts)
+    return _HEADER.pack(MAGIC, VERSION, 0, len(payload), zlib.crc32(payload)) + payload
+
+
+class Snapshot:
+    """
+    View read-only trên một snapshot đã verify, decode lazy
+    
+    Example:
+        snapshot = Snapshot(data)            # verify header + crc32
+        if now - snapshot.timestamp < ttl:   # chưa decode model nào
+            quota_data = snapshot.quota_data()
+    """
+    
+    def __init__(self, data: bytes):
+        """
+        Raises:
+            SnapshotError: Nếu data không phải snapshot hợp lệ
+        """
+        view = memoryview(data)
+        if len(view) < _HEADER.size + _COUNTS.size:
+            raise SnapshotError("snapshot quá ngắn")
+        magic, version, _flags, length, crc = _HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise SnapshotError("không phải agcheck snapshot")
+        if version != VERSION:
+            raise SnapshotError(f"snapshot version {version} không được hỗ trợ (cần {VERSION})")
+        payload = view[_HEADER.size:]
+        if len(payload) != length:
+            raise SnapshotError(f"snapshot bị cắt ({len(payload)}/{length} bytes)")
+        if zlib.crc32(payload) != crc:
+            raise SnapshotError("snapshot checksum không khớp")
+        
+        self.timestamp, self.model_count, self.forecast_count = _COUNTS.unpack_from(payload)
+        self._models_at = _COUNTS.size
+        self._forecasts_at = self._models_at + self.model_count * _MODEL.size
+        strings_at = self._forecasts_at + self.forecast_count * _FORECAST.size
+        if strings_at > len(payload):
+            raise SnapshotError("snapshot tables vượt quá payload")
+        self._payload = payload
+        self._strings = payload[strings_at:]
+    
+    def _string(self, offset: int, length: int) -> str:
+        if offset + length > len(self._strings):
+            raise SnapshotError("string offset vượt quá string table")
+        return str(self._strings[offset:offset + length], "utf-8")
+    
+    def iter_models(self) -> Iterator[QuotaModel]:
+        """Decode từng QuotaModel theo thứ tự đã lưu"""
+        for offset in range(self._models_at, self._forecasts_at, _MODEL.size):
+            name_off, name_len, shared, used, limit, remaining, reset_time = _MODEL.unpack_from(self._payload, offset)
+            yield QuotaModel(self._string(name_off, name_len), used, limit, remaining, reset_time, bool(shared))
+    
+    def quota_data(self) -> QuotaData:
+        """Decode toàn bộ thành QuotaData (pools được tính lại, forecasts được restore)"""
+        quota_data = QuotaData(models=list(self.iter_models()), timestamp=self.timestamp)
+        end = self._forecasts_at + self.forecast_count * _FORECAST.size
+        for offset in range(self._forecasts_at, end, _FORECAST.size):
+            key_off, key_len, has_eta, burn_rate, eta, reset_time = _FORECAST.unpack_from(self._payload, offset)
+            quota_data.forecasts[self._string(key_off, key_len)] = PoolForecast(
+                burn_rate=burn_rate,
+                eta_seconds=eta if has_eta else None,
+                reset_time=reset_time
+            )
+        return quota_data
@@ -0,0 +1,310 @@
+"""
+Stats Module - Vectorized analytics trên quota history (agcheck stats)
+
+History được đọc theo batches từ HistoryStore.iter_rows vào các NumPy arrays
+dạng cột (ts, model_id, used, limit, reset_time, consumed, resolution); mọi
+aggregate là group-by bằng bincount/unique, không loop qua QuotaModel objects.
+
+NumPy là optional dependency (`pip install antigravity-usage-checker[stats]`),
+export Parquet cần thêm pyarrow (`[parquet]`). Export CSV chỉ dùng stdlib.
+"""
+
+import csv
+import sys
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .history_store import HistoryStore, RESOLUTION_DAILY
+from .utils import STATS_DEFAULT_DAYS
+
+EXPORT_COLUMNS = (
+    "timestamp", "model", "used", "limit", "remaining", "reset_time",
+    "is_shared_pool", "consumed", "resolution",
+)
+
+_HEAT_SHADES = " ░▒▓█"
+
+
+def _require_numpy():
+    """Import numpy hoặc raise RuntimeError với hướng dẫn cài đặt"""
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError(
+            "agcheck stats cần NumPy: pip install 'antigravity-usage-checker[stats]'"
+        ) from None
+    return numpy
+
+
+def _local_offset(now: float) -> int:
+    """UTC offset (giây) của local timezone, để bucket giờ/ngày theo giờ địa phương"""
+    return time.localtime(now).tm_gmtoff
+
+
+@dataclass
+class HistoryArrays:
+    """History dạng cột, mỗi field là một NumPy array cùng độ dài"""
+    ts: "numpy.ndarray"
+    model_id: "numpy.ndarray"
+    used: "numpy.ndarray"
+    limit: "numpy.ndarray"
+    reset_time: "numpy.ndarray"
+    consumed: "numpy.ndarray"
+    resolution: "numpy.ndarray"
+    
+    def __len__(self) -> int:
+        return len(self.ts)
+    
+    @classmethod
+    def from_store(cls, store: HistoryStore, start: float, end: Optional[float] = None,
+                   batch_size: int = 50000) -> "HistoryArrays":
+        """Đọc rows theo batches, mỗi batch chuyển ngay sang array (không giữ tuples)"""
+        np = _require_numpy()
+        
+        blocks = [
+            np.array(rows, dtype=np.float64)
+            for rows in store.iter_rows(start, end, batch_size=batch_size)
+        ]
+        table = np.concatenate(blocks) if blocks else np.empty((0, 9))
+        
+        # Thứ tự cột theo HistoryStore.iter_rows
+        return cls(
+            ts=table[:, 0],
+            model_id=table[:, 1].astype(np.int64),
+            used=table[:, 2].astype(np.int64),
+            limit=table[:, 3].astype(np.int64),
+            reset_time=table[:, 5].astype(np.int64),
+            consumed=table[:, 7],
+            resolution=table[:, 8].astype(np.int64),
+        )
+
+
+class QuotaStats:
+    """Các aggregates cho `agcheck stats` trên một khoảng history"""
+    
+    def __init__(self, store: Optional[HistoryStore] = None, days: float = STATS_DEFAULT_DAYS,
+                 now: Optional[float] = None):
+        self.store = store or HistoryStore()
+        self.now = now if now is not None else time.time()
+        self.days = days
+        self.offset = _local_offset(self.now)
+        self.names = self.store.model_names()
+        self.data = HistoryArrays.from_store(self.store, self.now - days * 86400, self.now)
+        self._pool_rows = None
+        self._pool_members = None
+    
+    def heat_map(self) -> Tuple[List[str], "numpy.ndarray"]:
+        """
+        Consumption theo giờ trong ngày (local time) cho từng model
+        
+        Daily rollups không còn thông tin giờ nên bị bỏ qua.
+        
+        Returns:
+            (model names, matrix shape [n_models, 24])
+        """
+        np = _require_numpy()
+        mask = self.data.resolution < RESOLUTION_DAILY
+        ids, index = np.unique(self.data.model_id[mask], return_inverse=True)
+        hours = ((self.data.ts[mask] + self.offset) // 3600 % 24).astype(np.int64)
+        
+        matrix = np.bincount(
+            index * 24 + hours,
+            weights=self.data.consumed[mask],
+            minlength=len(ids) * 24
+        ).reshape(len(ids), 24)
+        return [self.names.get(i, f"#{i}") for i in ids.tolist()], matrix
+    
+    def _pools(self) -> Tuple["numpy.ndarray", "numpy.ndarray", "numpy.ndarray", "numpy.ndarray"]:
+        """
+        Gom rows thành pools như QuotaData._calculate_totals (cùng ts + reset_time)
+        
+        Pool được đại diện bằng model id nhỏ nhất, ổn định giữa các snapshots.
+        
+        Returns:
+            (pool representative, ts, consumed, resolution) cho mỗi pool-snapshot;
+            shared pool chỉ tính một lần
+        """
+        if self._pool_rows is None:
+            np = _require_numpy()
+            keys = np.stack([self.data.ts, self.data.reset_time.astype(np.float64)], axis=1)
+            groups, group_of_row = np.unique(keys, axis=0, return_inverse=True)
+            group_of_row = group_of_row.ravel()
+            
+            representative = np.full(len(groups), np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(representative, group_of_row, self.data.model_id)
+            consumed = np.zeros(len(groups))
+            np.maximum.at(consumed, group_of_row, self.data.consumed)
+            resolution = np.zeros(len(groups), dtype=np.int64)
+            np.maximum.at(resolution, group_of_row, self.data.resolution)
+            self._pool_rows = (representative, groups[:, 0], consumed, resolution)
+            self._pool_members = np.unique(
+                np.stack([representative[group_of_row], self.data.model_id], axis=1), axis=0
+            )
+        return self._pool_rows
+    
+    def pool_names(self) -> Dict[int, str]:
+        """Map pool representative -> tên các models trong pool"""
+        self._pools()
+        members: Dict[int, List[str]] = {}
+        for rep, model_id in self._pool_members.tolist():
+            members.setdefault(rep, []).append(self.names.get(model_id, f"#{model_id}"))
+        return {rep: " + ".join(sorted(names)) for rep, names in members.items()}
+    
+    def pool_daily_percentile(self, percentile: float = 95) -> Dict[int, Tuple[float, int]]:
+        """
+        Percentile consumption mỗi ngày (local time) của từng pool
+        
+        Returns:
+            Map pool representative -> (percentile value, số ngày có data)
+        """
+        np = _require_numpy()
+        representative, ts, consumed, _ = self._pools()
+        if not len(ts):
+            return {}
+        
+        days = ((ts + self.offset) // 86400).astype(np.int64)
+        pair, index = np.unique(np.stack([representative, days], axis=1), axis=0, return_inverse=True)
+        daily = np.bincount(index.ravel(), weights=consumed, minlength=len(pair))
+        
+        # pair đã sort theo representative nên mỗi pool là một đoạn liên tiếp
+        reps, starts, counts = np.unique(pair[:, 0], return_index=True, return_counts=True)
+        return {
+            rep: (float(np.percentile(daily[start:start + count], percentile)), int(count))
+            for rep, start, count in zip(reps.tolist(), starts.tolist(), counts.tolist())
+        }
+    
+    def top_hours(self, model_filter: Optional[str] = None, limit: int = 5) -> List[Tuple[int, float]]:
+        """
+        Giờ trong ngày tiêu thụ quota nhanh nhất
+        
+        Args:
+            model_filter: Chỉ tính pools có model chứa chuỗi này (không phân biệt hoa thường)
+            limit: Số giờ trả về
+        
+        Returns:
+            List (hour, consumption trung bình mỗi ngày trong giờ đó), giảm dần
+        """
+        np = _require_numpy()
+        representative, ts, consumed, resolution = self._pools()
+        
+        # Daily rollups không còn thông tin giờ
+        mask = resolution < RESOLUTION_DAILY
+        if model_filter:
+            needle = model_filter.lower()
+            matching = [
+                model_id for model_id, name in self.names.items() if needle in name.lower()
+            ]
+            member_match = np.isin(self._pool_members[:, 1], matching)
+            mask &= np.isin(representative, self._pool_members[member_match, 0])
+        
+        local = ts[mask] + self.offset
+        if not len(local):
+            return []
+        hours = (local // 3600 % 24).astype(np.int64)
+        totals = np.bincount(hours, weights=consumed[mask], minlength=24)
+        
+        # Số ngày có data của mỗi giờ, để so sánh công bằng giữa các giờ
+        day_hour = np.unique((local // 86400).astype(np.int64) * 24 + hours)
+        observed = np.bincount(day_hour % 24, minlength=24)
+        rate = np.divide(totals, observed, out=np.zeros(24), where=observed > 0)
+        
+        order = np.argsort(-rate, kind="stable")[:limit]
+        return [(int(h), float(rate[h])) for h in order if rate[h] > 0]
+
+
+def export_history(store: HistoryStore, path: str, start: float, end: Optional[float] = None,
+                   batch_size: int = 10000) -> int:
+    """
+    Export history ra CSV hoặc Parquet (theo extension), ghi từng batch
+    
+    Returns:
+        Số rows đã ghi
+    """
+    names = store.model_names()
+    batches = store.iter_rows(start, end, batch_size=batch_size)
+    
+    def records():
+        for rows in batches:
+            yield [
+                (ts, names.get(model_id, f"#{model_id}"), used, limit, remaining, reset_time,
+                 bool(is_shared), consumed, resolution)
+                for ts, model_id, used, limit, remaining, reset_time, is_shared, consumed, resolution in rows
+            ]
+    
+    if str(path).endswith(".parquet"):
+        return _write_parquet(path, records())
+    
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_COLUMNS)
+        for batch in records():
+            writer.writerows(batch)
+            written += len(batch)
+    return written
+
+
+def _write_parquet(path: str, batches) -> int:
+    """Ghi batches bằng pyarrow ParquetWriter (một row group mỗi batch)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError(
+            "Export Parquet cần pyarrow: pip install 'antigravity-usage-checker[parquet]'"
+        ) from None
+    
+    schema = pa.schema([
+        ("timestamp", pa.float64()), ("model", pa.string()), ("used", pa.int64()),
+        ("limit", pa.int64()), ("remaining", pa.int64()), ("reset_time", pa.int64()),
+        ("is_shared_pool", pa.bool_()), ("consumed", pa.int64()), ("resolution", pa.int64()),
+    ])
+    written = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema
+            ))
+            written += len(batch)
+    return written
+
+
+def print_report(stats: QuotaStats, model_filter: Optional[str] = None):
+    """In heat map, p95 daily consumption và top hours (màu chỉ khi stdout là TTY, không NO_COLOR)"""
+    from .formatter import palette_for
+    
+    p = palette_for(sys.stdout)
+    print(f"{p.cyan}📊 Quota history - {stats.days:g} ngày gần nhất ({len(stats.data)} rows){p.reset}")
+    if not len(stats.data):
+        print(f"{p.yellow}⚠️  Chưa có history{p.reset}")
+        return
+    
+    names, matrix = stats.heat_map()
+    print()
+    print(f"{p.bright}Hourly heat map (consumption theo giờ local){p.reset}")
+    print(f"{'':<30} " + "".join(f"{h:<3}" for h in range(0, 24, 3)).ljust(24))
+    peak = matrix.max() if matrix.size else 0
+    for name, row in zip(names, matrix):
+        if peak > 0:
+            cells = "".join(_HEAT_SHADES[int(round(v / peak * (len(_HEAT_SHADES) - 1)))] for v in row)
+        else:
+            cells = " " * 24
+        print(f"{name[:30]:<30} {cells} {int(row.sum()):>6}")
+    
+    pool_names = stats.pool_names()
+    print()
+    print(f"{p.bright}P95 daily consumption per pool{p.reset}")
+    for rep, (value, days) in sorted(stats.pool_daily_percentile().items(), key=lambda item: -item[1][0]):
+        print(f"{pool_names.get(rep, rep)[:60]:<60} {value:>8.1f}  ({days} ngày)")
+    
+    label = f" (pools có '{model_filter}')" if model_filter else ""
+    print()
+    print(f"{p.bright}Top hours drain quota nhanh nhất{label}{p.reset}")
+    top = stats.top_hours(model_filter)
+    if not top:
+        print("  Không có consumption")
+    for hour, rate in top:
+        print(f"  {hour:02d}:00-{hour:02d}:59  {rate:>8.1f} / ngày")
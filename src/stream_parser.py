@@ -0,0 +1,254 @@
+"""
+Stream Parser Module - Parse GetUserStatus response theo kiểu streaming
+
+Response chứa rất nhiều user/config data không dùng tới. Parser này đọc body
+theo từng chunk, chỉ materialize
+userStatus.cascadeModelConfigData.clientModelConfigs[*].{label, quotaInfo}
+và skip các subtrees khác bằng cách scan bracket/string mà không build objects.
+Buffer chỉ giữ phần chưa consume nên memory không phụ thuộc kích thước body.
+"""
+
+import codecs
+import json
+import re
+from typing import Dict, Iterable, Iterator, List, Optional
+
+MODEL_CONFIGS_PATH = ("userStatus", "cascadeModelConfigData", "clientModelConfigs")
+MODEL_CONFIG_FIELDS = ("label", "quotaInfo")
+
+_NON_WHITESPACE_RE = re.compile(r"\S")
+_STRING_SPECIAL_RE = re.compile(r'["\\]')
+# Một lần match nuốt cả đoạn không có bracket (kể cả strings hoàn chỉnh) trong C,
+# nên Python loop chỉ chạy trên brackets
+_CONTAINER_RUN_RE = re.compile(r'(?:[^"{}\[\]]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+_PRIMITIVE_END_RE = re.compile(r"[,}\]\s]")
+
+
+class JSONStreamScanner:
+    """
+    Pull scanner tối giản trên một iterator các bytes chunks
+    
+    Caller điều hướng bằng iter_object()/iter_array(), rồi với mỗi value gọi
+    read_value() (materialize) hoặc skip_value() (bỏ qua, không allocate objects).
+    """
+    
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._mark: Optional[int] = None  # Đầu value đang capture, buffer phải giữ từ đây
+        self._eof = False
+    
+    def _fill(self) -> bool:
+        """Đọc thêm chunk vào buffer, bỏ phần đã consume. False nếu hết input."""
+        keep = self._pos if self._mark is None else self._mark
+        keep = min(keep, len(self._buf))
+        if keep:
+            self._buf = self._buf[keep:]
+            self._pos -= keep
+            if self._mark is not None:
+                self._mark -= keep
+        
+        while not self._eof:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self._eof = True
+                text = self._decoder.decode(b"", final=True)
+            else:
+                text = self._decoder.decode(chunk)
+            if text:
+                self._buf += text
+                return True
+        return False
+    
+    def _search(self, pattern) -> Optional["re.Match"]:
+        """Tìm pattern từ vị trí hiện tại, đọc thêm chunks nếu cần"""
+        while True:
+            match = pattern.search(self._buf, self._pos)
+            if match:
+                return match
+            self._pos = max(self._pos, len(self._buf))
+            if not self._fill():
+                return None
+    
+    def peek(self) -> str:
+        """Ký tự non-whitespace kế tiếp (không consume), "" nếu hết input"""
+        match = self._search(_NON_WHITESPACE_RE)
+        if not match:
+            return ""
+        self._pos = match.start()
+        return match.group()
+    
+    def _expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self._pos}")
+        self._pos += 1
+    
+    def _skip_string(self):
+        """Skip một string (vị trí hiện tại là dấu nháy mở)"""
+        self._pos += 1
+        while True:
+            match = self._search(_STRING_SPECIAL_RE)
+            if not match:
+                raise ValueError("Unterminated string")
+            if match.group() == '"':
+                self._pos = match.end()
+                return
+            # Backslash: bỏ qua ký tự được escape (có thể nằm ở chunk sau)
+            self._pos = match.start() + 2
+    
+    def _skip_container(self):
+        """Skip object/array bằng cách đếm độ sâu brackets ngoài strings"""
+        depth = 0
+        while True:
+            self._pos = _CONTAINER_RUN_RE.match(self._buf, self._pos).end()
+            if self._pos >= len(self._buf):
+                if not self._fill():
+                    raise ValueError("Unterminated container")
+                continue
+            
+            char = self._buf[self._pos]
+            if char == '"':
+                # String bị cắt ở cuối buffer
+                self._skip_string()
+            elif char in "{[":
+                depth += 1
+                self._pos += 1
+            else:
+                depth -= 1
+                self._pos += 1
+                if depth == 0:
+                    return
+    
+    def skip_value(self):
+        """Skip value kế tiếp mà không build Python objects"""
+        char = self.peek()
+        if char == '"':
+            self._skip_string()
+        elif char in ("{", "["):
+            self._skip_container()
+        elif char:
+            match = self._search(_PRIMITIVE_END_RE)
+            self._pos = match.start() if match else len(self._buf)
+        else:
+            raise ValueError("Unexpected end of input")
+    
+    def read_value(self):
+        """Materialize value kế tiếp (dùng cho subtrees nhỏ)"""
+        self.peek()
+        self._mark = self._pos
+        try:
+            self.skip_value()
+            raw = self._buf[self._mark:self._pos]
+        finally:
+            self._mark = None
+        return json.loads(raw)
+    
+    def iter_object(self) -> Iterator[str]:
+        """
+        Yield từng key của object kế tiếp
+        
+        Sau mỗi key, caller phải consume value bằng read_value() hoặc skip_value().
+        Nếu value kế tiếp không phải object thì skip nó và không yield gì.
+        """
+        if self.peek() != "{":
+            self.skip_value()
+            return
+        self._pos += 1
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        
+        while True:
+            if self.peek() != '"':
+                raise ValueError(f"Expected object key at offset {self._pos}")
+            key = self.read_value()
+            self._expect(":")
+            yield key
+            
+            char = self.peek()
+            self._pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or '}}' at offset {self._pos - 1}")
+    
+    def iter_array(self) -> Iterator[None]:
+        """
+        Yield một lần cho mỗi phần tử của array kế tiếp (caller consume phần tử)
+        
+        Nếu value kế tiếp không phải array thì skip nó và không yield gì.
+        """
+        if self.peek() != "[":
+            self.skip_value()
+            return
+        self._pos += 1
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        
+        while True:
+            yield None
+            char = self.peek()
+            self._pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' at offset {self._pos - 1}")
+    
+    def drain(self):
+        """Đọc hết input còn lại mà không parse (để connection được reuse)"""
+        self._mark = None
+        self._buf = ""
+        self._pos = 0
+        for _ in self._chunks:
+            pass
+        self._eof = True
+    
+    def descend(self, path) -> bool:
+        """
+        Đi xuống theo path các object keys, skip các siblings
+        
+        Returns:
+            True nếu đã đứng ở value của key cuối, False nếu path không tồn tại
+        """
+        for key in path:
+            for current in self.iter_object():
+                if current == key:
+                    break
+                self.skip_value()
+            else:
+                return False
+        return True
+
+
+def extract_model_configs(chunks: Iterable[bytes]) -> List[Dict]:
+    """
+    Stream-parse GetUserStatus body, chỉ lấy label và quotaInfo của mỗi model config
+    
+    Args:
+        chunks: Iterator bytes (e.g. response.iter_content())
+        
+    Returns:
+        List dict {"label": ..., "quotaInfo": ...} (chỉ có các keys xuất hiện)
+        
+    Raises:
+        ValueError: Body không phải JSON hợp lệ
+    """
+    scanner = JSONStreamScanner(chunks)
+    configs = []
+    
+    if scanner.descend(MODEL_CONFIGS_PATH):
+        for _ in scanner.iter_array():
+            config = {}
+            for key in scanner.iter_object():
+                if key in MODEL_CONFIG_FIELDS:
+                    config[key] = scanner.read_value()
+                else:
+                    scanner.skip_value()
+            configs.append(config)
+    
+    scanner.drain()
+    return configs
@@ -0,0 +1,133 @@
+"""
+Timings Module - Spans nhẹ đo thời gian từng phase (agcheck --timings)
+
+Khi không bật --timings, code dùng NULL_TIMINGS: span() trả về một context
+manager no-op dùng chung nên overhead chỉ là một method call.
+"""
+
+import sys
+import threading
+import time
+from typing import Dict, List
+
+
+class _Span:
+    """Context manager ghi lại một span khi exit"""
+    __slots__ = ("_timings", "_name", "_start", "_depth")
+    
+    def __init__(self, timings: "Timings", name: str):
+        self._timings = timings
+        self._name = name
+    
+    def __enter__(self):
+        local = self._timings._local
+        self._depth = getattr(local, "depth", 0)
+        local.depth = self._depth + 1
+        self._start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self._timings._local.depth = self._depth
+        self._timings._record(self._name, self._start, end, self._depth)
+        return False
+
+
+class _NullSpan:
+    """Span không làm gì"""
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class NullTimings:
+    """Timings tắt (default) - không ghi gì"""
+    enabled = False
+    
+    def span(self, name: str) -> _NullSpan:
+        return _NULL_SPAN
+
+
+NULL_TIMINGS = NullTimings()
+
+
+class Timings:
+    """
+    Thu thập spans (tên, thời điểm bắt đầu, duration, độ sâu lồng nhau)
+    
+    Spans từ worker threads (fan-out, probing) được ghi kèm tên thread.
+    """
+    enabled = True
+    
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: List[Dict] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def span(self, name: str) -> _Span:
+        """
+        Đo một phase
+        
+        Example:
+            with timings.span("detect.process_scan"):
+                ...
+        """
+        return _Span(self, name)
+    
+    def _record(self, name: str, start: float, end: float, depth: int):
+        entry = {
+            "name": name,
+            "start_ms": round((start - self.origin) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+            "depth": depth,
+        }
+        thread = threading.current_thread()
+        if thread is not threading.main_thread():
+            entry["thread"] = thread.name
+        with self._lock:
+            self.spans.append(entry)
+    
+    def to_dict(self) -> Dict:
+        """Spans theo thứ tự bắt đầu"""
+        return {
+            "total_ms": round((time.perf_counter() - self.origin) * 1000, 3),
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+    
+    def report(self, output_format: str = "table", stream=None):
+        """
+        In spans ra stream (default: stderr để không lẫn với output chính)
+        
+        Args:
+            output_format: "table" hoặc "json"
+        """
+        stream = stream or sys.stderr
+        data = self.to_dict()
+        
+        if output_format == "json":
+            import json
+            stream.write(json.dumps(data) + "\n")
+            return
+        
+        names = []
+        for span in data["spans"]:
+            name = "  " * span["depth"] + span["name"]
+            if "thread" in span:
+                name += f" [{span['thread']}]"
+            names.append(name)
+        width = max([len(name) for name in names] + [30])
+        
+        stream.write(f"\n{'Phase':<{width}} {'start':>10} {'duration':>10}\n")
+        stream.write("-" * (width + 22) + "\n")
+        for name, span in zip(names, data["spans"]):
+            stream.write(f"{name:<{width}} {span['start_ms']:>8.1f}ms {span['duration_ms']:>8.1f}ms\n")
+        stream.write("-" * (width + 22) + "\n")
+        stream.write(f"{'total':<{width}} {'':>10} {data['total_ms']:>8.1f}ms\n")
@@ -0,0 +1,121 @@
+"""
+Transport Module - Nhớ transport (scheme + port) hoạt động của mỗi language_server
+
+Language server nghe HTTPS trên port chính và HTTP trên extension_server_port.
+Trên một số máy HTTPS port từ chối TLS của requests: nếu mỗi fetch đều thử
+HTTPS trước thì lần nào cũng tốn một TLS handshake thất bại. TransportMemory
+nhớ transport thành công gần nhất (thử trước ở lần sau) và giữ một circuit
+breaker cho mỗi transport: fail thì bị đẩy xuống cuối trong một khoảng backoff
+tăng gấp đôi sau mỗi lần fail liên tiếp.
+
+State được serialize cùng ServerInfo trong discovery cache, nên process sau
+(agcheck chạy lại, background refresh) cũng bỏ qua transport hỏng.
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .utils import AUTH_FAILURE_STATUS_CODES, TRANSPORT_BACKOFF_BASE_SECONDS, TRANSPORT_BACKOFF_MAX_SECONDS
+
+Transport = Tuple[str, int]  # (scheme, port)
+
+
+def is_usable_status(status: int) -> bool:
+    """
+    Response này có chứng minh transport dùng được không (để record_success)
+    
+    401/403 (CSRF token sai) và 5xx không tính: transport không được đánh dấu
+    healthy / preferred chỉ vì server trả lời lỗi.
+    """
+    return status < 500 and status not in AUTH_FAILURE_STATUS_CODES
+
+
+def server_transports(port: int, http_port: int) -> List[Transport]:
+    """Các transports của một server: HTTPS trên port chính, HTTP trên http_port (nếu khác)"""
+    transports = [("https", port)]
+    if http_port != port:
+        transports.append(("http", http_port))
+    return transports
+
+
+def _key(transport: Transport) -> str:
+    return f"{transport[0]}:{transport[1]}"
+
+
+class CircuitBreaker:
+    """Breaker của một transport: open (bị demote) cho đến open_until"""
+    
+    def __init__(self, failures: int = 0, open_until: float = 0.0):
+        self.failures = failures
+        self.open_until = open_until
+    
+    def is_open(self, now: float) -> bool:
+        return now < self.open_until
+    
+    def record_failure(self, now: float):
+        """Fail liên tiếp lần thứ n -> open trong base * 2^(n-1) giây (tối đa max)"""
+        self.failures += 1
+        backoff = TRANSPORT_BACKOFF_BASE_SECONDS * 2 ** min(self.failures - 1, 16)
+        self.open_until = now + min(backoff, TRANSPORT_BACKOFF_MAX_SECONDS)
+    
+    def to_dict(self) -> dict:
+        return {"failures": self.failures, "open_until": self.open_until}
+
+
+class TransportMemory:
+    """Transport ưu tiên + circuit breakers, keyed theo "scheme:port" """
+    
+    def __init__(self, preferred: Optional[str] = None, breakers: Optional[Dict[str, CircuitBreaker]] = None):
+        self.preferred = preferred
+        self.breakers = breakers or {}
+    
+    def order(self, candidates: List[Transport], now: Optional[float] = None) -> List[Transport]:
+        """
+        Thứ tự thử: transport ưu tiên trước, transport đang open cuối cùng
+        
+        Transport open không bị loại hẳn - nếu mọi transport khác fail thì vẫn
+        được thử, nên breaker không bao giờ làm mất một đường đang hoạt động.
+        """
+        now = time.time() if now is None else now
+        
+        def rank(item):
+            index, transport = item
+            breaker = self.breakers.get(_key(transport))
+            return (bool(breaker and breaker.is_open(now)), _key(transport) != self.preferred, index)
+        
+        return [transport for _, transport in sorted(enumerate(candidates), key=rank)]
+    
+    def record_success(self, transport: Transport) -> bool:
+        """Ghi nhận thành công, trả về True nếu state thay đổi (cần persist)"""
+        key = _key(transport)
+        changed = self.preferred != key or key in self.breakers
+        self.preferred = key
+        self.breakers.pop(key, None)
+        return changed
+    
+    def record_failure(self, transport: Transport, now: Optional[float] = None):
+        """Ghi nhận lỗi transport (connect/TLS), mở breaker với backoff"""
+        key = _key(transport)
+        self.breakers.setdefault(key, CircuitBreaker()).record_failure(time.time() if now is None else now)
+        if self.preferred == key:
+            self.preferred = None
+    
+    def to_dict(self) -> dict:
+        return {
+            "preferred": self.preferred,
+            "breakers": {key: breaker.to_dict() for key, breaker in self.breakers.items()},
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> "TransportMemory":
+        """Tạo từ dict đã serialize, state hỏng/thiếu thì bắt đầu lại từ đầu"""
+        try:
+            return cls(
+                preferred=data.get("preferred"),
+                breakers={
+                    key: CircuitBreaker(int(b.get("failures", 0)), float(b.get("open_until", 0.0)))
+                    for key, b in data.get("breakers", {}).items()
+                },
+            )
+        except (AttributeError, TypeError, ValueError):
+            return cls()
@@ -3,6 +3,12 @@ Utils module - Constants và helper functions
 """
 
 import os
+import queue
+import re
+import tempfile
+import threading
+import time
+from collections import namedtuple
 from pathlib import Path
 from datetime import datetime, timedelta
 
@@ -10,8 +16,66 @@ from datetime import datetime, timedelta
 PORT_RANGE_START = 50000
 PORT_RANGE_END = 60000
 CACHE_DIR = Path.home() / ".agusage"
-CACHE_FILE = CACHE_DIR / "cache.json"
+CACHE_FILE = CACHE_DIR / "cache.bin"  # Binary snapshot (src/snapshot.py)
 CACHE_MAX_AGE_HOURS = 24
+CACHE_LOCK_TIMEOUT = 10  # seconds đợi process khác refresh xong trước khi tự fetch
+WATCH_DEFAULT_INTERVAL = 30  # seconds
+SWR_MAX_AGE_SECONDS = 300  # Cache mới hơn thì --swr in ngay rồi refresh ở background
+SWR_REFRESH_MARKER = CACHE_DIR / "refresh.marker"
+SWR_REFRESH_MIN_INTERVAL = 15  # seconds giữa hai lần spawn background refresh
+
+# Discovery cache (kết quả PortDetector.detect_all)
+DISCOVERY_CACHE_FILE = CACHE_DIR / "discovery.json"
+DISCOVERY_NEGATIVE_TTL_SECONDS = 10
+
+# Quota history (append-only, downsample dần theo tuổi)
+HISTORY_DB_FILE = CACHE_DIR / "history.db"
+HISTORY_RAW_RETENTION_DAYS = 7
+HISTORY_HOURLY_RETENTION_DAYS = 90
+HISTORY_DAILY_RETENTION_DAYS = 730
+HISTORY_COMPACT_INTERVAL = 3600  # seconds giữa hai lần downsample
+STATS_DEFAULT_DAYS = 90  # Khoảng history mặc định của agcheck stats
+
+# Burn rate forecasting
+FORECAST_STATE_FILE = CACHE_DIR / "forecast.json"
+FORECAST_HALF_LIFE_SECONDS = 3600  # Sample cũ 1 giờ có trọng số bằng một nửa
+FORECAST_MIN_INTERVAL_SECONDS = 1  # Bỏ qua samples quá sát nhau
+FORECAST_STATE_MAX_AGE_SECONDS = 7 * 86400  # Pool không thấy lại sau 7 ngày thì bỏ state
+
+# Daemon (agcheck daemon)
+DAEMON_SOCKET_FILE = CACHE_DIR / "agcheck.sock"
+DAEMON_MAX_AGE_SECONDS = 30  # Snapshot cũ hơn thì refresh khi có query
+DAEMON_CLIENT_TIMEOUT = 10  # seconds
+
+# Prometheus exporter (agcheck exporter)
+EXPORTER_DEFAULT_LISTEN = "127.0.0.1:9877"
+EXPORTER_REFRESH_INTERVAL = 30  # seconds giữa hai lần fetch, độc lập với scrape interval
+EXPORTER_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Command line flags của language_server (theo thứ tự ưu tiên)
+CONNECT_PORT_FLAGS = ("--api_server_port", "--port", "--connect-port")
+HTTP_PORT_FLAG = "--extension_server_port"
+CSRF_TOKEN_FLAGS = ("--api_server_csrf_token", "--api-server-csrf-token")
+
+# Concurrent probing
+PORT_CONNECT_TIMEOUT = 0.5
+PORT_CONNECT_BATCH_SIZE = 256  # Giữ dưới giới hạn FD_SETSIZE của select() trên Windows
+API_PROBE_TIMEOUT = 2
+API_PROBE_WORKERS = 8
+
+# Hedged detection (PortDetector(hedged=True))
+DETECT_HEDGE_STAGGER_SECONDS = 0.3  # Độ lệch giữa các phương pháp detect khi chạy hedged
+
+# GetUserStatus fetch
+API_FETCH_TIMEOUT = 5  # seconds cho một GetUserStatus call
+AUTH_FAILURE_STATUS_CODES = (401, 403)  # CSRF token không còn đúng (server đã restart)
+STREAM_CHUNK_SIZE = 64 * 1024  # bytes mỗi lần đọc response body khi stream-parse
+STREAM_PARSE_MIN_BYTES = 256 * 1024  # Body nhỏ hơn thì json.loads (nhanh hơn ~3x), lớn hơn thì stream-parse
+ASYNC_POOL_MAX_IDLE = 8  # Connections keep-alive idle tối đa mỗi transport (AsyncAPIClient)
+
+# Transport memory (HTTPS/HTTP circuit breaker)
+TRANSPORT_BACKOFF_BASE_SECONDS = 60  # Transport fail bị demote 60s, gấp đôi mỗi lần fail liên tiếp
+TRANSPORT_BACKOFF_MAX_SECONDS = 3600
 
 # Process names liên quan đến Antigravity
 ANTIGRAVITY_PROCESS_NAMES = [
@@ -27,6 +91,189 @@ def ensure_cache_dir():
     CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def write_atomic(path, content: bytes):
+    """
+    Ghi file atomic: file tạm cùng thư mục (mode 0600), fsync rồi os.replace
+    
+    Readers đồng thời luôn thấy bản cũ hoặc bản mới hoàn chỉnh, crash giữa
+    chừng chỉ để lại file tạm (bị xóa nếu còn cơ hội).
+    
+    Raises:
+        OSError: Nếu không ghi/rename được
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.stem}-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        for attempt in range(5):
+            try:
+                os.replace(tmp_path, path)
+                break
+            except PermissionError:
+                # Windows: reader đang mở file đích, thử lại sau chốc lát
+                if attempt == 4:
+                    raise
+                time.sleep(0.01)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+ServerArgs = namedtuple("ServerArgs", ["port", "http_port", "csrf_token"])
+
+_SERVER_FLAGS = frozenset(CONNECT_PORT_FLAGS + (HTTP_PORT_FLAG,) + CSRF_TOKEN_FLAGS)
+_DIGITS_RE = re.compile(r'\d+')
+_TOKEN_RE = re.compile(r'[a-zA-Z0-9\-_]+')
+
+
+def _split_joined_args(argv):
+    """
+    Tách các elements chứa nhiều args nối bằng space thành từng token
+    
+    CommandLine của PowerShell/WMI và một số wrapper launchers đưa cả command
+    line vào một argv element duy nhất.
+    """
+    if not any(" " in arg and "--" in arg for arg in argv):
+        return argv
+    
+    import shlex
+    expanded = []
+    for arg in argv:
+        if " " in arg and "--" in arg:
+            try:
+                expanded.extend(shlex.split(arg))
+            except ValueError:
+                # Quote không cân bằng: tách theo whitespace
+                expanded.extend(arg.split())
+        else:
+            expanded.append(arg)
+    return expanded
+
+
+def parse_server_args(argv):
+    """
+    Extract connect port, HTTP port và CSRF token trong một lượt duyệt argv
+    
+    Hỗ trợ cả "--flag=value" và "--flag value". Nếu flag xuất hiện nhiều lần,
+    lấy giá trị đầu tiên. Connect port phải nằm trong PORT_RANGE.
+    
+    Args:
+        argv: List command line arguments; element chứa cả command line nối
+            bằng space (e.g. từ PowerShell/WMI) được tách bằng shlex
+        
+    Returns:
+        ServerArgs(port, http_port, csrf_token) - port/http_port là 0 nếu không có
+    """
+    argv = _split_joined_args(argv)
+    values = {}
+    i = 0
+    n = len(argv)
+    while i < n:
+        arg = argv[i]
+        i += 1
+        if not arg.startswith("--"):
+            continue
+        flag, sep, value = arg.partition("=")
+        if flag not in _SERVER_FLAGS:
+            continue
+        if not sep:
+            if i >= n or argv[i].startswith("--"):
+                continue
+            value = argv[i]
+            i += 1
+        values.setdefault(flag, value)
+    
+    port = 0
+    for flag in CONNECT_PORT_FLAGS:
+        match = _DIGITS_RE.match(values.get(flag, ""))
+        if match and PORT_RANGE_START <= int(match.group()) <= PORT_RANGE_END:
+            port = int(match.group())
+            break
+    
+    match = _DIGITS_RE.match(values.get(HTTP_PORT_FLAG, ""))
+    http_port = int(match.group()) if match else 0
+    
+    csrf_token = ""
+    for flag in CSRF_TOKEN_FLAGS:
+        match = _TOKEN_RE.match(values.get(flag, ""))
+        if match:
+            csrf_token = match.group()
+            break
+    
+    return ServerArgs(port, http_port, csrf_token)
+
+
+def first_match(items, predicate, max_workers=API_PROBE_WORKERS):
+    """
+    Chạy predicate(item) song song trên một bounded pool daemon threads
+    
+    Trả về item đầu tiên có predicate True, các item còn trong queue bị bỏ.
+    Workers là daemon threads nên request đang chạy dở không block exit.
+    
+    Args:
+        items: Danh sách items cần test
+        predicate: Function item -> bool (exception được coi là False)
+        max_workers: Số threads tối đa
+        
+    Returns:
+        Item đầu tiên match, None nếu không có
+    """
+    items = list(items)
+    if not items:
+        return None
+    
+    tasks = queue.Queue()
+    for item in items:
+        tasks.put(item)
+    results = queue.Queue()
+    stop = threading.Event()
+    
+    def worker():
+        while not stop.is_set():
+            try:
+                item = tasks.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                ok = bool(predicate(item))
+            except Exception:
+                ok = False
+            results.put((item, ok))
+    
+    for _ in range(min(max_workers, len(items))):
+        threading.Thread(target=worker, daemon=True).start()
+    
+    for _ in range(len(items)):
+        item, ok = results.get()
+        if ok:
+            stop.set()
+            return item
+    return None
+
+
+def supports_color(stream) -> bool:
+    """
+    Stream có nên nhận ANSI color codes không
+    
+    False khi stream không phải TTY (pipe, file) hoặc NO_COLOR được set
+    (https://no-color.org - bất kỳ giá trị non-empty nào).
+    """
+    if os.environ.get("NO_COLOR"):
+        return False
+    isatty = getattr(stream, "isatty", None)
+    try:
+        return bool(isatty and isatty())
+    except ValueError:
+        # Stream đã đóng
+        return False
+
+
 def format_time_remaining(seconds):
     """
     Format số giây thành human-readable string (e.g., "4h 56m")